@@ -11,7 +11,7 @@ Purpose: Simple publish & subscribe pattern in pure python (object designed).
          (see test case tests/test_pubsub_load.py for example)
 
 Reference:    https://en.wikipedia.org/wiki/Publish–subscribe_pattern
-Requirement:  Python >= 3.6, [pytest, pylint, flake8, coverage]
+Requirement:  Python >= 3.8, [pytest, pylint, flake8, coverage]
 Use pubsub version <= 0.3 for Python 2 compatibility
 
 Author:       Zhen Wang
@@ -97,9 +97,37 @@ SOFTWARE.
 ==============================================================================
 """
 
+import os
+import sys
+import zlib
+import heapq
+import pickle
+import struct
+import bisect
 import warnings
-from threading import Lock
-from queue import Queue, PriorityQueue, Empty
+import weakref
+import functools
+import itertools
+from concurrent.futures import Future, InvalidStateError
+from time import monotonic, perf_counter, sleep, thread_time, time
+from threading import Lock, Condition, Event, Thread, current_thread
+from queue import Queue, PriorityQueue, Empty, Full
+import collections
+
+# First bytes of snapshot files, see PubSubBase.snapshot()
+SNAPSHOT_MAGIC = b'PUBSUB-SNAPSHOT-1\n'
+
+try:
+    import numpy
+except ImportError:
+    # Optional : only needed by typed channels, see set_schema()
+    numpy = None
+
+try:
+    import lzma
+except ImportError:
+    # Python built without liblzma : only zlib codecs, see Codec
+    lzma = None
 
 
 class PubSubBase():
@@ -115,9 +143,32 @@ class PubSubBase():
 
     This class is based on thread-safe FIFO queue Python
     implementation and was designed thread-safe by Zhen Wang.
+
+    Subscriber queues are tracked with weak references : a queue
+    dropped by its subscriber without unsubscribe() is removed
+    from its channel and costs nothing more to publishers.
+
+    Thread safety doesn't rely on the GIL, communicators can be used
+    with free-threaded Python builds (3.13t and later) : subscriber
+    tuples are replaced and never modified so publishers read them
+    without lock, a channel is serialized by its striped publish lock,
+    each subscriber queue has its own mutex and the id counter of a
+    channel is updated under its publish lock : publishers of different
+    channels only share count_lock when a counter is created or, with
+    max_channels, to keep counters in LRU order.
+    Scaling without the GIL was not measured yet : run
+    tests/bench_pubsub_threads.py on a free-threaded build and several
+    CPUs to check it.
     """
 
-    def __init__(self, max_queue_in_a_channel=100, max_id_4_a_channel=2**31):
+    # Kind of the queues created by subscribe() : see subscribe_()
+    is_priority_queue = False
+
+    def __init__(self, max_queue_in_a_channel=100, max_id_4_a_channel=2**31,
+                 max_channels=None, keep_channel_ids=True,
+                 dispatch_threads=0, dispatch_queue_size=10000,
+                 dispatch_policy='block', max_bytes=None,
+                 size_estimator=None):
         """
         Create an object to be used as a communicator in a project
         between publishers and subscribers
@@ -137,18 +188,194 @@ class PubSubBase():
               to appear when number of messages broadcasted by
               this channel is very big.
             - Default value: 2**31
+        - max_channels :
+            - Maximum number of channels whose message id counter
+              is kept. When exceeded, the counters of the least recently
+              used channels without subscriber are forgotten :
+              ids restart at 0 if these channels are used again.
+            - Default value: None, no limit.
+        - keep_channel_ids :
+            - True (default) : message id counter of a channel is kept
+              when its last subscriber leaves, so ids keep growing
+              when the channel is used again.
+            - False : channel counter is forgotten as soon as the
+              channel has no more subscriber and messages published on
+              a channel without subscriber are not counted.
+              Use it when channel names are used once (per request,
+              per session).
+        - dispatch_threads :
+            - 0 (default value) : publish() puts the message in all
+              subscriber queues before returning.
+            - Else number of dispatcher threads : publish() only puts
+              the message in a dispatcher inbox and returns, dispatcher
+              threads put it in subscriber queues. A channel is always
+              served by the same thread so its messages stay in order.
+              Use join() to wait for dispatch and close() at the end.
+        - dispatch_queue_size :
+            - Maximum number of messages waiting in a dispatcher inbox.
+            - Default value: 10000
+        - dispatch_policy : behaviour of publish() when a dispatcher
+              inbox is full :
+            - 'block' (default value) : wait
+            - 'reject' : raise queue.Full exception
+            - 'drop' : warn and ignore message
+        - max_bytes :
+            - Maximum size in bytes of the messages waiting in all
+              subscriber queues, checked like max_queue_in_a_channel.
+              See also set_byte_budget() and max_bytes option of
+              subscribe_() for channel and subscription limits.
+            - Default value: None, no limit.
+        - size_estimator : function(message) returning the size in bytes
+              of a message, called once per publication when a byte
+              limit is set. Default value : estimate_size().
         """
 
+        if max_channels is not None and max_channels <= 0:
+            raise ValueError('max_channels must be > 0')
+        if dispatch_threads < 0:
+            raise ValueError('dispatch_threads must be >= 0')
+
         self.max_queue_in_a_channel = max_queue_in_a_channel
         self.max_id_4_a_channel = max_id_4_a_channel
+        self.max_channels = max_channels
+        self.keep_channel_ids = keep_channel_ids
 
+        # channel -> tuple of SubscriberRef, replaced (never modified)
+        # under channels_lock so that publishers can iterate it
+        # without lock. Channels without subscriber are removed.
         self.channels = {}
-        self.count = {}
+        # channel -> last message id, least recently used first
+        self.count = collections.OrderedDict()
+        # Incremented when subscribers or rate limits change,
+        # used by Publisher objects to refresh their cached channel
+        self.channels_version = 0
+        # SubscriberRef whose queue was garbage collected,
+        # filled by weakref callbacks, see prune_()
+        self.dead_refs = collections.deque()
+
+        # channel -> TokenBucket, see set_rate_limit()
+        self.rate_limits = {}
+        # channel -> DedupWindow, see set_dedup_window()
+        self.dedup_windows = {}
+        # channel -> numpy dtype of messages, see set_schema()
+        self.schemas = {}
+        # channel -> Codec compressing message batches, see set_codec()
+        self.codecs = {}
+        # channel -> Watermark, see set_watermarks()
+        self.watermarks = {}
+        # None or DeadLetterChannel, see set_dead_letter_channel_()
+        self.dead_letters = None
+        # None or Profiler, see set_profiler()
+        self.profiler = None
+        # Byte budgets : communicator one and channel -> ByteBudget,
+        # sizes are estimated only once a budget exists
+        self.size_estimator = size_estimator or estimate_size
+        self.byte_budget = None
+        self.byte_budgets = {}
+        self.bytes_limited = False
+        if max_bytes is not None:
+            self.byte_budget = ByteBudget(max_bytes)
+            self.bytes_limited = True
+        # TimerScheduler for delayed messages, created when needed
+        self.scheduler = None
+        # Thread publishing delayed messages for the scheduler thread,
+        # which must never block, created when needed
+        self.delayed_dispatcher = None
+        # Reply inbox : correlation id -> (Future, WheelTimer or None)
+        self.pending_requests = {}
+        self.correlation_ids = itertools.count()
 
         self.channels_lock = Lock()
         self.count_lock = Lock()
+        # Held while a message gets its id and is put in subscriber
+        # queues so that they receive messages of a channel in id order,
+        # a channel uses the lock of index hash(channel) % 64.
+        self.publish_locks = tuple(Lock() for _ in range(64))
+        self.scheduler_lock = Lock()
+        self.requests_lock = Lock()
+
+        # Dispatcher for asynchronous fan out, None if synchronous
+        self.dispatcher = None
+        if dispatch_threads:
+            self.dispatcher = Dispatcher(dispatch_threads,
+                                         dispatch_queue_size,
+                                         dispatch_policy)
+            weakref.finalize(self, self.dispatcher.close, False)
+
+    def get_scheduler_(self):
+        """
+        Return the TimerScheduler of this communicator, start it
+        when called for the first time.
+        Its thread stops when close() is called or when the
+        communicator is garbage collected.
+        """
+        if self.scheduler is None:
+            with self.scheduler_lock:
+                if self.scheduler is None:
+                    scheduler = TimerScheduler()
+                    weakref.finalize(self, scheduler.close)
+                    self.scheduler = scheduler
+        return self.scheduler
+
+    def publish_later_(self, delay, channel, function, *args, **kwargs):
+        """
+        Call function(*args, **kwargs) publishing on channel after delay
+        seconds in the thread of delayed publications : a rate limit
+        or a dispatcher with policy 'block' may block it but not the
+        scheduler thread, other timers (request timeouts, lease
+        expirations...) are still on time.
+        Return a WheelTimer object to cancel the call.
+        """
+        return self.get_scheduler_().call_later(
+            delay, self.submit_delayed_, channel,
+            functools.partial(function, *args, **kwargs))
+
+    def submit_delayed_(self, channel, function):
+        """
+        Called by the scheduler thread : give a due publication to
+        the thread of delayed publications, start it when called
+        for the first time. Never blocks, its inbox is not limited.
+        """
+        with self.scheduler_lock:
+            if self.delayed_dispatcher is None:
+                self.delayed_dispatcher = Dispatcher(1, 0, 'block',
+                                                     'pubsub-delayed')
+                weakref.finalize(self, self.delayed_dispatcher.close, False)
+            delayed_dispatcher = self.delayed_dispatcher
+        delayed_dispatcher.submit(channel, function, ())
+
+    def close(self):
+        """
+        Stop the thread used for delayed messages :
+        messages not published yet are lost.
+        Stop dispatcher threads after they dispatched waiting messages.
+        Dead letters waiting are published.
+        """
+        if self.dead_letters is not None:
+            self.dead_letters.flush()
+        with self.scheduler_lock:
+            if self.scheduler is not None:
+                self.scheduler.close()
+                self.scheduler = None
+            if self.delayed_dispatcher is not None:
+                self.delayed_dispatcher.close(False)
+                self.delayed_dispatcher = None
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+
+    def join(self):
+        """
+        Wait until all messages published are put in subscriber
+        queues by dispatcher threads (see dispatch_threads parameter).
+        Return immediately without dispatcher.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.join()
 
-    def subscribe_(self, channel, is_priority_queue):
+    def subscribe_(self, channel, is_priority_queue, pollable=False,
+                   ack_timeout=None, aging_interval=None, lanes=None,
+                   lane_size=None, columnar=False, max_bytes=None,
+                   sample_every=None, max_rate_hz=None):
         """
         Return a synchronised FIFO queue object used by a subscriber
         to listen at messages sent by publishers on a given channel.
@@ -160,26 +387,149 @@ class PubSubBase():
         - is_priority_queue : True if FIFO queue give message according
                             their priority else FIFO queue without
                             priority.
+        - pollable : True if the queue must provide a file descriptor
+                     readable when messages are waiting in it,
+                     see ChanelQueueMixin.fileno().
+        - ack_timeout : None (default) : a message is removed from
+            the queue as soon as listen() returns it.
+            Else at-least-once delivery mode : listen() returns Lease
+            objects that must be acknowledged with their ack() method
+            within ack_timeout seconds, else the message is put back
+            in the queue by the scheduler thread, waking up selectors
+            and fileno(), and delivered again, see ChanelQueueMixin.ack().
+        - aging_interval : None (default) : messages with the lowest
+            priority number are always given first.
+            Else number of seconds for a waiting message to gain one
+            priority level (PubSubPriority only), so that low priority
+            messages are not starved by urgent ones,
+            see ChanelAgingPriorityQueue.
+        - lanes : None (default) : one FIFO for all messages.
+            Else dictionary lane name -> weight (PubSub only) :
+            messages published with a lane option are stored in one
+            FIFO per lane and listen() serves lanes in weighted round
+            robin (deficit round robin), a lane with weight 2 gets
+            twice as many messages as a lane with weight 1 when both
+            have messages waiting. Lanes not in dictionary and
+            messages without lane (lane None) have a weight of 1.
+            See ChanelFairQueue.
+        - lane_size : maximum number of messages waiting in each lane,
+            default value : max_queue_in_a_channel. The whole queue
+            still holds at most max_queue_in_a_channel messages.
+        - columnar : False (default) or True to get a ChanelArrayQueue
+            (PubSub only) whose drain() method returns waiting
+            messages in a numpy structured array with fields id,
+            timestamp and data. The channel must have a schema,
+            see set_schema(). Its messages are not counted in byte
+            budgets.
+        - max_bytes : None (default) or maximum size in bytes of the
+            messages waiting in this queue, see size_estimator
+            parameter of __init__().
+        - sample_every : None (default) or N to receive only one message
+            of N published on the channel (the first, then the N+1th...)
+        - max_rate_hz : None (default) or maximum number of messages per
+            second received, messages published faster are skipped.
+            Messages skipped by sampling are not queued nor counted
+            as lost.
         """
 
+        self.check_subscribe_options_(channel, ack_timeout, max_bytes,
+                                      sample_every, max_rate_hz)
+        self.check_queue_options_(channel, is_priority_queue, ack_timeout,
+                                  aging_interval, lanes, columnar)
+        message_queue = self.new_queue_(channel, is_priority_queue,
+                                        ack_timeout, aging_interval, lanes,
+                                        lane_size, columnar)
+        if pollable:
+            message_queue.open_fd()
+        if max_bytes is not None:
+            message_queue.byte_budget = ByteBudget(max_bytes)
+            self.bytes_limited = True
+        if sample_every is not None or max_rate_hz is not None:
+            message_queue.set_sampling(sample_every, max_rate_hz)
+        subscriber_ref = SubscriberRef(message_queue, self.dead_refs.append)
+        subscriber_ref.channel = channel
+
+        if self.dead_refs:
+            self.prune_()
+
+        with self.channels_lock:
+            # Version changed first : a publisher seeing the new
+            # subscribers can't keep old ones cached, see Publisher.bind_()
+            self.channels_version += 1
+            self.channels[channel] = (self.channels.get(channel, ()) +
+                                      (subscriber_ref,))
+
+        return message_queue
+
+    @staticmethod
+    def check_subscribe_options_(channel, ack_timeout, max_bytes,
+                                 sample_every, max_rate_hz):
+        """
+        Raise ValueError if a value of subscribe_() options is not valid.
+        """
         if not channel:
             raise ValueError('channel : None value not allowed')
+        if ack_timeout is not None and ack_timeout <= 0:
+            raise ValueError('ack_timeout must be > 0')
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError('max_bytes must be >= 0')
+        if sample_every is not None and sample_every < 1:
+            raise ValueError('sample_every must be >= 1')
+        if max_rate_hz is not None and max_rate_hz <= 0:
+            raise ValueError('max_rate_hz must be > 0')
 
-        if channel not in self.channels:
-            self.channels_lock.acquire()
-            # Need to check again
-            if channel not in self.channels:
-                self.channels[channel] = []
-            self.channels_lock.release()
+    def check_queue_options_(self, channel, is_priority_queue, ack_timeout,
+                             aging_interval, lanes, columnar):
+        """
+        Raise ValueError if subscribe_() options choosing the queue
+        class are not valid or not compatible.
+        """
+        if aging_interval is not None:
+            if not is_priority_queue:
+                raise ValueError('aging_interval : only for PubSubPriority')
+            if aging_interval <= 0:
+                raise ValueError('aging_interval must be > 0')
+        if lanes is not None:
+            if is_priority_queue:
+                raise ValueError('lanes : only for PubSub')
+            if any(weight <= 0 for weight in lanes.values()):
+                raise ValueError('lanes : weights must be > 0')
+        if columnar:
+            self.check_columnar_(channel, is_priority_queue, ack_timeout,
+                                 lanes)
 
-        message_queue = None
+    def check_columnar_(self, channel, is_priority_queue, ack_timeout,
+                        lanes):
+        """
+        Raise ValueError if a columnar queue can't be subscribed
+        with these subscribe_() options.
+        """
         if is_priority_queue:
-            message_queue = ChanelPriorityQueue(self, channel)
-        else:
-            message_queue = ChanelQueue(self, channel)
-        self.channels[channel].append(message_queue)
+            raise ValueError('columnar : only for PubSub')
+        if lanes is not None or ack_timeout is not None:
+            raise ValueError(
+                'columnar : not compatible with lanes and ack_timeout')
+        if channel not in self.schemas:
+            raise ValueError(f'columnar : no schema for channel {channel}'
+                             ', see set_schema()')
 
-        return message_queue
+    def new_queue_(self, channel, is_priority_queue, ack_timeout,
+                   aging_interval, lanes, lane_size, columnar):
+        """
+        Return a new subscriber queue of the class chosen by
+        subscribe_() options.
+        """
+        if aging_interval is not None:
+            return ChanelAgingPriorityQueue(self, channel, ack_timeout,
+                                            aging_interval)
+        if columnar:
+            return ChanelArrayQueue(self, channel, self.schemas[channel])
+        if lanes is not None:
+            return ChanelFairQueue(self, channel, ack_timeout, lanes,
+                                   lane_size or self.max_queue_in_a_channel)
+        if is_priority_queue:
+            return ChanelPriorityQueue(self, channel, ack_timeout)
+        return ChanelQueue(self, channel, ack_timeout)
 
     def unsubscribe(self, channel, message_queue):
         """
@@ -191,15 +541,679 @@ class PubSubBase():
             raise ValueError('channel : None value not allowed')
         if not message_queue:
             raise ValueError('message_queue : None value not allowed')
-        if channel in self.channels:
-            self.channels[channel].remove(message_queue)
+        with self.channels_lock:
+            if channel in self.channels:
+                self.set_subscribers_(channel, tuple(
+                    subscriber_ref
+                    for subscriber_ref in self.channels[channel]
+                    if subscriber_ref() is not message_queue))
+        self.forget_count_(channel)
+        if message_queue.charges:
+            message_queue.release_bytes_()
+        if self.watermarks:
+            # The slowest subscriber may have left
+            self.check_low_watermark_(channel)
+
+    def set_subscribers_(self, channel, subscriber_refs):
+        """
+        Replace the subscribers of a channel, channels_lock must be held.
+        A channel without subscriber is removed from self.channels with
+        its default dedup window, call forget_count_() once
+        channels_lock is released.
+        """
+        self.channels_version += 1
+        if subscriber_refs:
+            self.channels[channel] = subscriber_refs
+            return
+        self.channels.pop(channel, None)
+        window = self.dedup_windows.get(channel)
+        if window is not None and window.is_default:
+            del self.dedup_windows[channel]
+
+    def forget_count_(self, channel):
+        """
+        Remove the message counter of a channel without subscriber
+        if keep_channel_ids is False. Taken under the publish lock of
+        the channel, which serializes counter updates, see next_ids_() :
+        no publisher can update a counter being removed.
+        No publish lock nor channels_lock must be held.
+        """
+        if self.keep_channel_ids or channel in self.channels:
+            return
+        with self.publish_lock_(channel):
+            if channel not in self.channels:
+                with self.count_lock:
+                    self.count.pop(channel, None)
+
+    def prune_(self):
+        """
+        Remove from their channel the references to queues
+        garbage collected because their subscriber dropped them
+        without calling unsubscribe().
+        Weakref callbacks may run in any thread, even one holding
+        channels_lock, so they only record dead references
+        and pruning is done later by subscribers and publishers.
+        """
+        pruned_channels = set()
+        with self.channels_lock:
+            while self.dead_refs:
+                subscriber_ref = self.dead_refs.popleft()
+                channel = subscriber_ref.channel
+                if channel in self.channels:
+                    self.set_subscribers_(channel, tuple(
+                        other_ref for other_ref in self.channels[channel]
+                        if other_ref is not subscriber_ref))
+                    pruned_channels.add(channel)
+        for channel in pruned_channels:
+            self.forget_count_(channel)
+        if self.watermarks:
+            for channel in pruned_channels:
+                self.check_low_watermark_(channel)
+
+    def evict_counts_(self):
+        """
+        Forget message counters of the least recently used channels
+        without subscriber until there are max_channels counters,
+        count_lock must be held.
+        Channels with subscribers are considered as used.
+        """
+        for _ in range(len(self.count)):
+            if len(self.count) <= self.max_channels:
+                return
+            oldest_channel = next(iter(self.count))
+            if oldest_channel in self.channels:
+                self.count.move_to_end(oldest_channel)
+            else:
+                del self.count[oldest_channel]
+
+    def set_rate_limit(self, channel, rate, burst=None, policy='block'):
+        """
+        Limit the rate of messages published on a channel
+        with a token bucket, see TokenBucket class.
+        Parameters :
+        - channel : the channel to limit.
+        - rate : number of messages per second allowed on average,
+            None to remove the limit of the channel.
+        - burst : number of messages that can be published at once,
+            default value : max(rate, 1).
+        - policy : behaviour when the limit is exceeded :
+            - 'block' (default value) : publish() waits
+            - 'reject' : publish() raises RateLimitExceeded
+            - 'drop' : message is ignored
+        Return the TokenBucket object of the channel or None.
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        bucket = None
+        if rate is not None:
+            bucket = TokenBucket(rate, burst, policy)
+        with self.channels_lock:
+            if bucket is None:
+                self.rate_limits.pop(channel, None)
+            else:
+                self.rate_limits[channel] = bucket
+            self.channels_version += 1
+        return bucket
+
+    def set_dedup_window(self, channel, size=1000, ttl=None):
+        """
+        Configure the window of recent dedup keys of a channel,
+        see dedup_key option of publish_(). A window with default
+        parameters is created the first time a dedup_key is used on a
+        channel with subscribers and without window, it is removed
+        with the channel when its last subscriber leaves. Keys of
+        messages published on a channel without subscriber and without
+        window are not remembered : nobody received them.
+        Parameters :
+        - channel : the channel.
+        - size : maximum number of keys remembered, the least recently
+            published are forgotten first. None to remove the window.
+        - ttl : None or number of seconds a key is remembered.
+        Return the DedupWindow object of the channel or None.
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if size is None:
+            self.dedup_windows.pop(channel, None)
+            return None
+        if size < 1:
+            raise ValueError('size must be >= 1')
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be > 0')
+        window = DedupWindow(size, ttl)
+        self.dedup_windows[channel] = window
+        return window
+
+    def is_duplicate_(self, channel, dedup_key):
+        """
+        Return True if dedup_key was seen recently on channel,
+        else remember it.
+        """
+        window = self.dedup_windows.get(channel)
+        if window is None:
+            window = self.default_dedup_window_(channel)
+            if window is None:
+                return False
+        return window.seen(dedup_key)
+
+    def default_dedup_window_(self, channel):
+        """
+        Return the window of a channel without set_dedup_window(),
+        created with default parameters, or None if the channel has
+        no subscriber. Checked with channels_lock held : a channel
+        removed by set_subscribers_() has no default window.
+        """
+        with self.channels_lock:
+            if channel not in self.channels:
+                return None
+            window = self.dedup_windows.get(channel)
+            if window is None:
+                window = DedupWindow()
+                window.is_default = True
+                self.dedup_windows[channel] = window
+        return window
+
+    def forget_dedup_(self, channel, dedup_key):
+        """
+        Forget dedup_key of a message that was not published.
+        """
+        if dedup_key is not None:
+            window = self.dedup_windows.get(channel)
+            if window is not None:
+                window.forget(dedup_key)
+
+    def set_byte_budget(self, channel, max_bytes):
+        """
+        Limit the size in bytes of the messages of a channel waiting in
+        all its subscriber queues : when exceeded, messages are
+        handled like a queue overflow (warning, dead letter).
+        Parameters :
+        - channel : the channel to limit.
+        - max_bytes : maximum size in bytes, None for no limit :
+            sizes are still counted, see stats().
+        Return the ByteBudget object of the channel.
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError('max_bytes must be >= 0')
+        with self.channels_lock:
+            # Kept when limit changes : queued messages release
+            # the budget they were counted in.
+            budget = self.byte_budgets.get(channel)
+            if budget is None:
+                budget = self.byte_budgets[channel] = ByteBudget(max_bytes)
+            else:
+                budget.max_bytes = max_bytes
+        self.bytes_limited = True
+        return budget
+
+    def set_watermarks(self, channel, high, low=None, on_high=None,
+                       on_low=None):
+        """
+        Signal backpressure to the publishers of a channel : its slowest
+        subscriber is the one with most messages waiting.
+        Parameters :
+        - channel : the channel to watch.
+        - high : when a publication makes the slowest subscriber reach
+            high waiting messages, the channel is not writable anymore.
+            None to remove the watermarks of the channel.
+        - low : when subscribers get messages and the slowest one has
+            low waiting messages or less, the channel is writable again.
+            Default value : high // 2.
+        - on_high, on_low : None or function(channel, level) called when
+            the channel becomes not writable or writable again,
+            level is the number of messages waiting in the slowest
+            subscriber queue. Called in the publisher or subscriber
+            thread, no communicator or queue lock is held : callbacks
+            may publish, even on the channel.
+        Return the Watermark object of the channel or None :
+        its writable attribute is a threading.Event set when publishers
+        can publish and wait_writable() waits for it.
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if high is None:
+            self.watermarks.pop(channel, None)
+            return None
+        if low is None:
+            low = high // 2
+        if not 0 <= low < high:
+            raise ValueError('watermarks : 0 <= low < high required')
+        watermark = Watermark(self, channel, high, low, on_high, on_low)
+        self.watermarks[channel] = watermark
+        return watermark
+
+    def set_dead_letter_channel_(self, channel, is_priority_queue, rate=100,
+                                 burst=None, batch_size=100, linger=0.1,
+                                 undeliverable=False):
+        """
+        Publish messages lost by subscribers on a dead letter channel
+        to inspect or replay them. Its messages data are dictionaries :
+        - 'channel' : origin channel
+        - 'id' : message id on origin channel, None if no id was given
+        - 'reason' : 'overflow' (subscriber queue full), 'rate_limited'
+            (rate limit with policy drop), 'overload' (dispatcher inbox
+            full with policy drop), 'expired' (request without reply
+            before its timeout), 'undeliverable' (no subscriber)
+        - 'timestamp' : time.time() value when message was lost
+        - 'data' : the lost message
+        - 'dropped' : number of subscribers who lost it
+        Parameters :
+        - channel : dead letter channel, None to stop recording.
+        - is_priority_queue : see publish_()
+        - rate, burst : dead letters are limited by a TokenBucket with
+            policy 'drop' so that losses can't overload the communicator.
+            Default value : 100 dead letters per second.
+        - batch_size, linger : dead letters are published in batches of
+            batch_size or after linger seconds, see publisher_().
+        - undeliverable : if True, messages published on a channel
+            without subscriber are recorded too. Default value : False.
+        Return the DeadLetterChannel object or None.
+        """
+        if self.dead_letters is not None:
+            self.dead_letters.flush()
+            self.dead_letters = None
+        if channel is None:
+            return None
+        if batch_size < 1:
+            raise ValueError('batch_size must be >= 1')
+        if linger is not None and linger <= 0:
+            raise ValueError('linger must be > 0')
+        self.dead_letters = DeadLetterChannel(
+            self, channel, is_priority_queue, TokenBucket(rate, burst, 'drop'),
+            batch_size, linger, undeliverable)
+        return self.dead_letters
+
+    def dead_letter_(self, channel, message, _id, reason, dropped=0):
+        """
+        Record a lost message on the dead letter channel if any.
+        Must be called without publish locks held.
+        """
+        dead_letters = self.dead_letters
+        if dead_letters is not None and channel != dead_letters.channel:
+            dead_letters.add(channel, message, _id, reason, dropped)
+
+    def check_watermark_(self, channel):
+        """
+        Called after a publication on a channel with watermarks.
+        Must be called without publish locks held : on_high callback
+        may publish on the channel.
+        """
+        watermark = self.watermarks.get(channel)
+        if watermark is not None:
+            watermark.check_high_()
+
+    def check_low_watermark_(self, channel):
+        """
+        Called after messages are taken from a queue of a channel with
+        watermarks or after a subscriber left it.
+        Must be called without communicator or queue locks held :
+        on_low callback may publish on the channel.
+        """
+        watermark = self.watermarks.get(channel)
+        if watermark is not None:
+            watermark.check_low_()
+
+    def check_delivery_(self, channel, message, _id, result):
+        """
+        Record a message lost during its delivery on the dead letter
+        channel. Return result, a DeliveryResult.
+        """
+        if self.dead_letters is not None:
+            if result.dropped:
+                self.dead_letter_(channel, message, _id, 'overflow',
+                                  result.dropped)
+            elif not result.delivered and self.dead_letters.undeliverable \
+                    and not self.channels.get(channel):
+                self.dead_letter_(channel, message, _id, 'undeliverable')
+        return result
+
+    def set_schema(self, channel, dtype):
+        """
+        Declare the type of the messages published on a channel
+        so that subscribers can get them in numpy arrays,
+        see columnar option of subscribe_(). Needs numpy.
+        Parameters :
+        - channel : the typed channel.
+        - dtype : numpy dtype or anything accepted by numpy.dtype()
+            ('f8', [('x', 'f4'), ('y', 'f4')]...), messages must be
+            scalars or tuples convertible to it.
+            None to remove the schema of the channel.
+        Return the numpy dtype of the channel or None.
+        Subscriptions already done are not changed.
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if dtype is None:
+            self.schemas.pop(channel, None)
+            return None
+        if numpy is None:
+            raise ImportError('set_schema : numpy module is required')
+        self.schemas[channel] = numpy.dtype(dtype)
+        return self.schemas[channel]
+
+    def set_codec(self, channel, method='zlib', level=None, zdict=None):
+        """
+        Compress the messages of a channel by batches when they leave
+        the communicator : snapshot() chunks, or logs and transports
+        built around it with the encode() and decode() methods of the
+        codec returned.
+        Parameters :
+        - channel : the channel.
+        - method : 'zlib' or 'lzma', None to remove the codec.
+        - level : None (default level) or compression level,
+            0 to 9 for zlib, lzma preset 0 to 9.
+        - zdict : None or bytes shared dictionary for zlib, made with
+            Codec.train() from sample messages : repetitive small
+            messages compress several times better.
+        Return the Codec object of the channel or None,
+        its stats() compare bytes saved and CPU time spent.
+        Warning : frames are pickled, decoding a frame runs
+        pickle.loads() which can execute arbitrary code. Only decode
+        frames from a trusted source (a transport authenticating its
+        peers, files only writable by this application...).
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if method is None:
+            self.codecs.pop(channel, None)
+            return None
+        codec = Codec(method, level, zdict)
+        self.codecs[channel] = codec
+        return codec
+
+    def set_profiler(self, enabled=True):
+        """
+        Measure where time is spent : wall clock and CPU time of
+        publishers putting messages in subscriber queues of each
+        channel, and time spent by each subscriber between two messages
+        taken with listen() or get_batch() (its processing time).
+        Parameter :
+        - enabled : True to start measures, False to stop them.
+        Return the Profiler object, see Profiler.report(), or None.
+        Measures already done are lost when enabled again.
+        """
+        self.profiler = Profiler() if enabled else None
+        return self.profiler
+
+    def check_schema_(self, channel, message):
+        """
+        Raise ValueError if a message can't be stored in the numpy
+        arrays of a typed channel, see set_schema() : checked before
+        publication so that drain() never fails on a bad message.
+        """
+        dtype = self.schemas.get(channel)
+        if dtype is None:
+            return
+        try:
+            numpy.array([(0, 0., message)], dtype=_array_dtype(dtype))
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f'message : not compatible with schema '
+                             f'of channel {channel} : {exc}') from exc
+
+    def publish_after_(self, delay, channel, message, is_priority_queue,
+                       priority, **options):
+        """
+        Publish a message after delay seconds.
+        A single thread and a hierarchical timing wheel serve all
+        delayed messages of this communicator, see TimerScheduler.
+        Due messages are published by another thread, see
+        publish_later_() : a blocking rate limit can't delay timers.
+        Parameters : delay, then same parameters as publish_()
+        Return a WheelTimer object whose cancel() method cancels
+        the publication.
+        """
+        if priority < 0:
+            raise ValueError('priority must be > 0')
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if not message:
+            raise ValueError('message : None value not allowed')
+        return self.publish_later_(
+            delay, channel, self.publish_, channel, message,
+            is_priority_queue, priority, **options)
+
+    def request_(self, channel, message, timeout, is_priority_queue,
+                 priority, **options):
+        """
+        Publish a request and return a concurrent.futures.Future
+        object giving the reply of a responder.
+        Responders receive a Request object in the 'data' field of
+        the message and answer with its reply() or fail() method.
+        Replies are routed to the future by a correlation id : no reply
+        channel is created.
+        Parameters :
+        - channel, message, is_priority_queue, priority, options :
+            see publish_()
+        - timeout : None or number of seconds after which the future
+            fails with TimeoutError if nobody replied.
+        Use asyncio.wrap_future() to await the reply in a coroutine.
+        """
+        if not message:
+            raise ValueError('message : None value not allowed')
+        future = Future()
+        with self.requests_lock:
+            correlation_id = next(self.correlation_ids)
+            timer = None
+            if timeout is not None:
+                timer = self.get_scheduler_().call_later(
+                    timeout, self.expire_request_, correlation_id, channel,
+                    message)
+            self.pending_requests[correlation_id] = (future, timer)
+        # Forget the request if requester cancels the future
+        future.add_done_callback(
+            lambda _: self.resolve_request_(correlation_id))
+        try:
+            self.publish_(channel, Request(self, correlation_id, message),
+                          is_priority_queue, priority, **options)
+        except Exception:
+            self.resolve_request_(correlation_id)
+            raise
+        return future
+
+    def resolve_request_(self, correlation_id, result=None, exception=None):
+        """
+        Give its reply to the future of a request.
+        Return False if request is unknown : already replied,
+        timed out or canceled.
+        """
+        with self.requests_lock:
+            future, timer = self.pending_requests.pop(correlation_id,
+                                                      (None, None))
+        if future is None:
+            return False
+        if timer is not None:
+            timer.cancel()
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # Future canceled by the requester
+            return False
+        return True
+
+    def expire_request_(self, correlation_id, channel=None, message=None):
+        """
+        Called by scheduler when a request timed out.
+        """
+        with self.requests_lock:
+            future, _ = self.pending_requests.pop(correlation_id,
+                                                  (None, None))
+        if future is not None and not future.done():
+            try:
+                future.set_exception(TimeoutError(
+                    f'No reply for request {correlation_id}'))
+            except InvalidStateError:
+                return
+            if channel is not None:
+                self.dead_letter_(channel, message, None, 'expired')
+
+    def snapshot(self, path, chunk_size=1000):
+        """
+        Save the communicator state in a file to restart quickly
+        with restore() : channel subscriptions and their options,
+        messages waiting in subscriber queues (and not acknowledged
+        ones), message id counters and channel schemas.
+        The file is a sequence of length prefixed pickle records,
+        messages are written in chunks of chunk_size so that restore()
+        reads it lazily, chunks of channels with a codec are compressed
+        (see set_codec()). Messages must be picklable.
+        Requests waiting for a reply (see request_()) are not saved :
+        their futures and timers can't survive a restart.
+        The file is replaced atomically : a crash or an error during
+        snapshot keeps the previous one and removes the temporary file.
+        Return the number of messages saved.
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be >= 1')
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as snapshot_file:
+                message_count = self.write_snapshot_(snapshot_file,
+                                                     chunk_size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        return message_count
+
+    def write_snapshot_(self, snapshot_file, chunk_size):
+        """
+        Write the records of snapshot() in snapshot_file.
+        Return the number of messages saved.
+        """
+        message_count = 0
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        _write_record(snapshot_file, ('schemas', dict(self.schemas)))
+        codecs = dict(self.codecs)
+        _write_record(snapshot_file,
+                      ('codecs', {channel: codec.config_()
+                                  for channel, codec in codecs.items()}))
+        for channel, subscriber_refs in list(self.channels.items()):
+            for subscriber_ref in subscriber_refs:
+                channel_queue = subscriber_ref()
+                if channel_queue is not None:
+                    message_count += self.write_queue_(
+                        snapshot_file, channel, channel_queue,
+                        codecs.get(channel), chunk_size)
+        # Saved after messages : restored ids are always
+        # greater than the ids of restored messages.
+        with self.count_lock:
+            counts = dict(self.count)
+        _write_record(snapshot_file, ('counts', counts))
+        return message_count
+
+    @staticmethod
+    def write_queue_(snapshot_file, channel, channel_queue, codec,
+                     chunk_size):
+        """
+        Write the options and the messages of a subscriber queue,
+        requests are skipped. Return the number of messages saved.
+        """
+        options, items = channel_queue.snapshot_()
+        items = [item for item in items
+                 if not isinstance(channel_queue.unwrap(item)['data'],
+                                   Request)]
+        _write_record(snapshot_file, ('queue', channel, options))
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            if codec is None:
+                _write_record(snapshot_file, ('items', chunk))
+            else:
+                _write_record(snapshot_file, ('frame', codec.encode(chunk)))
+        return len(items)
+
+    def restore(self, path):
+        """
+        Restore a state saved by snapshot() : subscriptions are created
+        again with their waiting messages and message ids continue
+        from the saved counters.
+        Codecs saved replace the codecs of their channels.
+        Return the list of restored queues in snapshot order,
+        they must be kept by their subscribers like queues returned by
+        subscribe().
+        Warning : records are unpickled, which can execute arbitrary
+        code : only restore files written by snapshot() in a trusted
+        place.
+        """
+        restored_queues = []
+        channel_queue = None
+        for record in _read_records(path):
+            kind = record[0]
+            if kind == 'schemas':
+                self.schemas.update(record[1])
+            elif kind == 'codecs':
+                for channel, config in record[1].items():
+                    self.set_codec(channel, *config)
+            elif kind == 'queue':
+                channel_queue = self.subscribe_(
+                    record[1], self.is_priority_queue, **record[2])
+                restored_queues.append(channel_queue)
+            elif kind == 'items':
+                channel_queue.restore_items_(record[1])
+            elif kind == 'frame':
+                channel_queue.restore_items_(
+                    self.codecs[channel_queue.name].decode(record[1]))
+            elif kind == 'counts':
+                with self.count_lock:
+                    self.count.update(record[1])
+        return restored_queues
+
+    def stats(self):
+        """
+        Return a dictionary describing the communicator state :
+        - 'channels' : number of channels with subscribers
+        - 'subscribers' : number of subscriber queues
+        - 'rate_limits' : channel -> TokenBucket.stats() dictionary
+        - 'scheduled' : number of delayed messages not published yet
+        - 'pending_requests' : number of requests waiting for a reply
+        - 'dispatcher' : None or Dispatcher.stats() dictionary
+        - 'watermarks' : channel -> Watermark.stats() dictionary
+        - 'dedup' : channel -> DedupWindow.stats() dictionary
+        - 'dead_letters' : None or DeadLetterChannel.stats() dictionary
+        - 'bytes' : None or ByteBudget.stats() dictionary of the
+            communicator, 'bytes_by_channel' : channel ->
+            ByteBudget.stats() dictionary, see set_byte_budget()
+        - 'profiler' : None or Profiler.report() dictionary
+        - 'codecs' : channel -> Codec.stats() dictionary
+        """
+        scheduler = self.scheduler
+        return {
+            'dispatcher': (self.dispatcher.stats()
+                           if self.dispatcher is not None else None),
+            'pending_requests': len(self.pending_requests),
+            'scheduled': len(scheduler) if scheduler is not None else 0,
+            'channels': len(self.channels),
+            'subscribers': sum(len(subscriber_refs) for subscriber_refs
+                               in list(self.channels.values())),
+            'rate_limits': {channel: bucket.stats() for channel, bucket
+                            in list(self.rate_limits.items())},
+            'watermarks': {channel: watermark.stats() for channel, watermark
+                           in list(self.watermarks.items())},
+            'dedup': {channel: window.stats() for channel, window
+                      in list(self.dedup_windows.items())},
+            'dead_letters': (self.dead_letters.stats()
+                             if self.dead_letters is not None else None),
+            'bytes': (self.byte_budget.stats()
+                      if self.byte_budget is not None else None),
+            'bytes_by_channel': {channel: budget.stats() for channel, budget
+                                 in list(self.byte_budgets.items())},
+            'profiler': (self.profiler.report()
+                         if self.profiler is not None else None),
+            'codecs': {channel: codec.stats() for channel, codec
+                       in list(self.codecs.items())},
+        }
 
-    def publish_(self, channel, message, is_priority_queue, priority):
+    def publish_(self, channel, message, is_priority_queue, priority,
+                 rate_limiter=None, lane=None, dedup_key=None):
         """
         Called by publisher.
         Send a message in a channel, all subscribers registered on this
         communication channel are going to receive the message.
-        If the channel doesn't exists, it is created.
         If Nobody listen to the channel (like often in real life) :
         no matter...
         If channel overflows, ie the actual message number in channel
@@ -217,10 +1231,27 @@ class PubSubBase():
                     - Integer for importance of this message.
                     - Default value: 100
                     - 0 is the higther priority
+            - rate_limiter : None or a TokenBucket object shared by
+                the messages of a publisher, applied before the channel
+                limit given by set_rate_limit().
+            - lane : None or name of the lane of this message for
+                subscribers with lanes, see ChanelFairQueue.
+            - dedup_key : None or hashable idempotency key : a message
+                published again with a key seen recently on the channel
+                is ignored for all subscribers, see set_dedup_window().
+                The key is forgotten if the message is rejected or
+                dropped by a rate limit or by dispatcher overload :
+                the producer can publish it again.
 
         Message received by subscribers using listen() method is a
         python dictionary with 2 keys registered inside, see listen()
         method documentation for more.
+
+        Return a DeliveryResult : number of subscriber queues where the
+        message was put and number of subscribers that won't receive it
+        because their queue overflowed or a rate limit dropped it.
+        A duplicate message gives DeliveryResult(0, 0).
+        Return None with dispatch threads : delivery is done later.
         """
 
         if priority < 0:
@@ -229,208 +1260,2913 @@ class PubSubBase():
             raise ValueError('channel : None value not allowed')
         if not message:
             raise ValueError('message : None value not allowed')
+        if self.schemas:
+            self.check_schema_(channel, message)
 
-        if channel not in self.channels:
-            self.channels_lock.acquire()
-            # Need to check again
-            if channel not in self.channels:
-                self.channels[channel] = []
-            self.channels_lock.release()
+        if dedup_key is not None and self.is_duplicate_(channel, dedup_key):
+            return DeliveryResult(0, 0)
+        if self.dead_refs:
+            self.prune_()
+        return self.send_(channel, message, is_priority_queue, priority,
+                          rate_limiter, self.rate_limits.get(channel), lane,
+                          dedup_key)
 
-        # Update message self.counts
-        self.count_lock.acquire()
-        if channel not in self.count:
-            self.count[channel] = 0
-        else:
-            self.count[channel] = ((self.count[channel] + 1) %
-                                   self.max_id_4_a_channel)
-        self.count_lock.release()
+    def send_(self, channel, message, is_priority_queue, priority,
+              rate_limiter, channel_limiter, lane, dedup_key=None):
+        """
+        Apply rate limits to a checked message then deliver it or give
+        it to dispatcher threads : the publication path shared by
+        publish_() and Publisher, which caches channel_limiter
+        (rate limit of the channel, see set_rate_limit()).
+        dedup_key : None or key recorded by is_duplicate_(), forgotten
+        if the message is rejected or dropped.
+        Return the result of publish_().
+        """
+        try:
+            if not ((rate_limiter is None or rate_limiter.acquire()) and
+                    (channel_limiter is None or
+                     channel_limiter.acquire())):
+                return DeliveryResult(0, self.drop_(channel, message,
+                                                    dedup_key,
+                                                    'rate_limited'))
+            if self.dispatcher is not None:
+                if not self.dispatcher.submit(channel, self.deliver_,
+                                              (channel, message,
+                                               is_priority_queue, priority,
+                                               lane)):
+                    self.drop_(channel, message, dedup_key, 'overload')
+                return None
+        except (RateLimitExceeded, Full):
+            # Producer can publish it again
+            self.forget_dedup_(channel, dedup_key)
+            raise
+        return self.deliver_(channel, message, is_priority_queue, priority,
+                             lane)
+
+    def drop_(self, channel, message, dedup_key, reason):
+        """
+        Record a message dropped by a rate limit or by dispatcher
+        overload before its delivery, its dedup_key is forgotten.
+        Return the number of subscribers who lost it.
+        """
+        self.forget_dedup_(channel, dedup_key)
+        dropped = len(self.channels.get(channel, ()))
+        self.dead_letter_(channel, message, None, reason, dropped)
+        return dropped
+
+    def deliver_(self, channel, message, is_priority_queue, priority,
+                 lane=None):
+        """
+        Give an id to a message checked by publish_() and put it
+        in all subscriber queues of the channel.
+        Return a DeliveryResult.
+        """
+        if not self.keep_channel_ids and channel not in self.channels:
+            return self.check_delivery_(channel, message, None,
+                                        DeliveryResult(0, 0))
 
-        # ID of current message
-        _id = self.count[channel]
+        with self.publish_lock_(channel):
+            # ID of current message
+            _id = self.next_ids_(channel)
+
+            # Push message to all subscribers in channel
+            if _id is None:
+                result = DeliveryResult(0, 0)
+            else:
+                result = self.fan_out_(channel,
+                                       self.channels.get(channel, ()),
+                                       message, _id, is_priority_queue,
+                                       priority, lane)
+        if self.watermarks:
+            self.check_watermark_(channel)
+        if self.dead_letters is not None:
+            self.check_delivery_(channel, message, _id, result)
+        return result
+
+    def publish_lock_(self, channel):
+        """
+        Return the lock serializing publications on a channel.
+        """
+        return self.publish_locks[hash(channel) % len(self.publish_locks)]
 
-        # Push message to all subscribers in channel
-        for channel_queue in self.channels[channel]:
-            # Check if queue overflowed
-            if channel_queue.qsize() >= self.max_queue_in_a_channel:
+    def fan_out_(self, channel, subscriber_refs, message, _id,
+                 is_priority_queue, priority, lane=None):
+        """
+        Put a message in the queues of subscriber_refs.
+        Return a DeliveryResult.
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            start_time, start_cpu = perf_counter(), thread_time()
+        delivered = dropped = 0
+        size = self.size_estimator(message) if self.bytes_limited else None
+        for subscriber_ref in subscriber_refs:
+            channel_queue = subscriber_ref()
+            if channel_queue is None:
+                # Garbage collected, will be pruned
+                continue
+            if channel_queue.sampled and not channel_queue.sample_():
+                # Skipped before building item : costs nothing more
+                continue
+            # Build and send message for this queue,
+            # ignored if queue overflowed
+            if channel_queue.offer(channel_queue.build_item_(
+                    message, _id, is_priority_queue, priority, size),
+                                   self.max_queue_in_a_channel, lane):
+                delivered += 1
+            else:
+                dropped += 1
                 warnings.warn((
                     f"Queue overflow for channel {channel}, "
                     f"> {self.max_queue_in_a_channel} "
                     "(self.max_queue_in_a_channel parameter)"))
-            else:  # No overflow on this channel_queue
-                # Build and send message for this queue
-                if is_priority_queue:
-                    # OrderedDict dictionnary for sorting message
-                    # on their id if they have the same priority.
-                    channel_queue.put((priority,
-                                       OrderedDict(data=message, id=_id)),
-                                      block=False)
-                else:
-                    channel_queue.put({'data': message, 'id': _id},
-                                      block=False)
+        if profiler is not None:
+            profiler.fan_out_(channel, 1, perf_counter() - start_time,
+                              thread_time() - start_cpu)
+        return DeliveryResult(delivered, dropped)
 
+    def next_ids_(self, channel, number=1):
+        """
+        Reserve number consecutive message ids on a channel
+        and return the first one, the publish lock of the channel
+        must be held : it serializes the updates of its counter, so
+        that publishers of different channels don't share a lock.
+        count_lock is only taken to create a counter, or for every
+        update when max_channels is set (LRU order of counters).
+        Return None if keep_channel_ids is False and the channel has
+        no subscriber : counters are removed under the publish lock
+        too (see forget_count_()), a counter is never created after
+        its channel was removed.
+        """
+        if not self.keep_channel_ids and channel not in self.channels:
+            return None
+        if self.max_channels is None:
+            last_id = self.count.get(channel)
+            if last_id is not None:
+                first_id = (last_id + 1) % self.max_id_4_a_channel
+                self.count[channel] = ((first_id + number - 1) %
+                                       self.max_id_4_a_channel)
+                return first_id
+        with self.count_lock:
+            if channel not in self.count:
+                first_id = 0
+                self.count[channel] = (number - 1) % self.max_id_4_a_channel
+                if (self.max_channels is not None and
+                        len(self.count) > self.max_channels):
+                    self.evict_counts_()
+            else:
+                first_id = ((self.count[channel] + 1) %
+                            self.max_id_4_a_channel)
+                self.count[channel] = ((first_id + number - 1) %
+                                       self.max_id_4_a_channel)
+                if self.max_channels is not None:
+                    self.count.move_to_end(channel)
+        return first_id
 
-class ChanelQueue(Queue):
-    """
-    A FIFO queue for a channel.
-    """
+    @staticmethod
+    def build_item_(message, _id, is_priority_queue, priority, size=None):
+        """
+        Return the item put in a subscriber queue for a message.
+        size : None or estimated size in bytes of message, kept in
+        the message dictionary for byte budgets.
+        """
+        if size is not None:
+            sized_message = OrderedDict(data=message, id=_id)
+            sized_message.size = size
+            if is_priority_queue:
+                return (priority, sized_message)
+            return sized_message
+        if is_priority_queue:
+            # OrderedDict dictionnary for sorting message
+            # on their id if they have the same priority.
+            return (priority, OrderedDict(data=message, id=_id))
+        return {'data': message, 'id': _id}
 
-    def __init__(self, parent, channel):
+    def publish_batch_(self, channel, messages, is_priority_queue,
+                       rate_limiter=None, lane=None):
         """
-        Create a new queue for the channel
+        Publish many messages on a channel at once : they get
+        consecutive ids and each subscriber queue receives them
+        with one lock acquisition and one wake up.
+        Used by Publisher.flush().
+
         Parameters :
-        - parent : communicator parent
-        - channel : string for the name of the channel
+            - channel, is_priority_queue, rate_limiter, lane :
+                see publish_()
+            - messages : list of (message, priority) tuples
+        Return a DeliveryResult counting messages put in each queue
+        or None with dispatch threads, see publish_().
+        When a rate limit or the dispatcher rejects a message
+        (policy 'reject'), the messages before it are published and
+        RateLimitExceeded or queue.Full is raised : its unpublished
+        attribute is the list of (message, priority) not published.
         """
-        super().__init__()
-        self.parent = parent
-        self.name = channel
 
-    def listen(self, block=True, timeout=None):
-        """
-        Called by a subscriber when he wants to get messages from
-        a channel.
-        This is an iterator that can be used to get messages sent by a
-        publisher in the queue.
+        self.check_batch_(channel, messages)
 
-        Iterator can be casted in Python list to get all messages in it
-        with : msgs = list(messageQueue.listen(block=False))
+        if self.dead_refs:
+            self.prune_()
 
-        Messages returned are of type dictionary with 2 keys registered by
-        by publish() method:
-            'data' : the message's payload that was put in the queue by
-                        publishers (see publish() method).
-            'id' : Number of this message on the current channel
+        subscriber_count = len(self.channels.get(channel, ()))
+        allowed, error = self.limit_batch_(channel, messages, rate_limiter,
+                                           subscriber_count)
+        unpublished = error.unpublished if error is not None else []
+        try:
+            result = self.send_batch_(channel, allowed, is_priority_queue,
+                                      lane, subscriber_count)
+        except Full as exc:
+            exc.unpublished = allowed + unpublished
+            raise
+        if error is not None:
+            raise error
+        if result is None:
+            return None
+        limited_count = len(messages) - len(allowed)
+        return DeliveryResult(result.delivered,
+                              result.dropped +
+                              limited_count * subscriber_count)
 
-        Parameters :
-        - block (default value: True) and timeout (default value: None)
-            and behaviours if no message is in the queue.
-            Documentation can be found in
-            Python official Queue documentation and especially in its get()
-            method : see https://docs.python.org/3/library/queue.html
-        - timeout : None : no timeout or positive integer see
-            Python official Queue documentation and especially in its get()
-            method : see https://docs.python.org/3/library/queue.html
+    def check_batch_(self, channel, messages):
         """
+        Raise ValueError if a message of a batch or its priority
+        is not valid, see publish_batch_().
+        """
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        for message, priority in messages:
+            if priority < 0:
+                raise ValueError('priority must be > 0')
+            if not message:
+                raise ValueError('message : None value not allowed')
+            if self.schemas:
+                self.check_schema_(channel, message)
 
-        while True:
+    def limit_batch_(self, channel, messages, rate_limiter,
+                     subscriber_count):
+        """
+        Apply rate limits to the messages of a batch, messages dropped
+        are recorded as dead letters.
+        Return (allowed, error) : list of (message, priority) allowed
+        and None or the RateLimitExceeded exception raised by a limit
+        with policy 'reject', its unpublished attribute is the list of
+        messages from the rejected one.
+        """
+        channel_limiter = self.rate_limits.get(channel)
+        allowed = []
+        for index, entry in enumerate(messages):
             try:
-                data = self.get(block=block, timeout=timeout)
-                assert isinstance(data, dict) and len(data) == 2,\
-                       "Bad data in chanel queue !"
-                yield data
-            except Empty:
-                return
+                is_allowed = ((rate_limiter is None or
+                               rate_limiter.acquire()) and
+                              (channel_limiter is None or
+                               channel_limiter.acquire()))
+            except RateLimitExceeded as exc:
+                exc.unpublished = messages[index:]
+                return allowed, exc
+            if is_allowed:
+                allowed.append(entry)
+            else:
+                self.forget_dedup_(channel,
+                                   getattr(entry, 'dedup_key', None))
+                self.dead_letter_(channel, entry[0], None, 'rate_limited',
+                                  subscriber_count)
+        return allowed, None
 
-    def unsubscribe(self):
+    def send_batch_(self, channel, messages, is_priority_queue, lane,
+                    subscriber_count):
         """
-        Used by a subscriber who doesn't want to receive messages
-        on a given this channel and on a this queue
+        Deliver messages allowed by limit_batch_() or give them to
+        dispatcher threads.
+        Return a DeliveryResult or None with dispatch threads.
         """
-        self.parent.unsubscribe(self.name, self)
+        if self.dispatcher is not None:
+            if messages and not self.dispatcher.submit(
+                    channel, self.deliver_batch_,
+                    (channel, messages, is_priority_queue, lane)):
+                for entry in messages:
+                    self.forget_dedup_(channel,
+                                       getattr(entry, 'dedup_key', None))
+                    self.dead_letter_(channel, entry[0], None, 'overload',
+                                      subscriber_count)
+            return None
+        if not messages:
+            return DeliveryResult(0, 0)
+        return self.deliver_batch_(channel, messages, is_priority_queue,
+                                   lane)
+
+    def deliver_batch_(self, channel, messages, is_priority_queue,
+                       lane=None):
+        """
+        Same as deliver_() for a batch of messages checked
+        by publish_batch_().
+        """
+        if not self.keep_channel_ids and channel not in self.channels:
+            for message, _ in messages:
+                self.check_delivery_(channel, message, None,
+                                     DeliveryResult(0, 0))
+            return DeliveryResult(0, 0)
 
+        with self.publish_lock_(channel):
+            first_id = self.next_ids_(channel, len(messages))
 
-class ChanelPriorityQueue(PriorityQueue):
-    """
-    A FIFO priority queue for a channel.
-    """
+            subscriber_refs = ()
+            if first_id is not None:
+                subscriber_refs = self.channels.get(channel, ())
+            result, lost = self.fan_out_batch_(channel, subscriber_refs,
+                                               messages, first_id,
+                                               is_priority_queue, lane)
+        if self.watermarks:
+            self.check_watermark_(channel)
+        if self.dead_letters is not None:
+            self.check_batch_delivery_(channel, messages, first_id,
+                                       len(subscriber_refs), lost)
+        return result
 
-    def __init__(self, parent, channel):
+    def fan_out_batch_(self, channel, subscriber_refs, messages, first_id,
+                       is_priority_queue, lane):
         """
-        See : ChanelQueue.__init__() method
+        Put a batch of messages with consecutive ids from first_id
+        in the queues of subscriber_refs.
+        Return (DeliveryResult, lost) : lost is the number of
+        subscribers that didn't get each message.
         """
-        super().__init__()
-        self.parent = parent
-        self.name = channel
+        profiler = self.profiler
+        if profiler is not None:
+            start_time, start_cpu = perf_counter(), thread_time()
+        delivered = dropped = 0
+        lost = [0] * len(messages)
+        sizes = [None] * len(messages)
+        if self.bytes_limited:
+            sizes = [self.size_estimator(message) for message, _ in messages]
+        for subscriber_ref in subscriber_refs:
+            channel_queue = subscriber_ref()
+            if channel_queue is None:
+                continue
+            put_count, lost_indexes = self.put_batch_items_(
+                channel_queue, messages, first_id, sizes,
+                is_priority_queue, lane)
+            delivered += put_count
+            if lost_indexes:
+                dropped += len(lost_indexes)
+                for index in lost_indexes:
+                    lost[index] += 1
+                warnings.warn((
+                    f"Queue overflow for channel {channel}, "
+                    f"> {self.max_queue_in_a_channel} "
+                    "(self.max_queue_in_a_channel parameter)"))
+        if profiler is not None:
+            profiler.fan_out_(channel, len(messages),
+                              perf_counter() - start_time,
+                              thread_time() - start_cpu)
+        return DeliveryResult(delivered, dropped), lost
 
-    def listen(self, block=True, timeout=None):
+    def put_batch_items_(self, channel_queue, messages, first_id, sizes,
+                         is_priority_queue, lane):
         """
-        See : ChanelQueue.listen() method
+        Put the messages of a batch sampled by a subscriber queue in it.
+        Return (number of messages put, indexes of messages dropped
+        by overflow).
         """
+        indexes = range(len(messages))
+        if channel_queue.sampled:
+            indexes = [index for index in indexes
+                       if channel_queue.sample_()]
+        items = [channel_queue.build_item_(
+                     messages[index][0],
+                     (first_id + index) % self.max_id_4_a_channel,
+                     is_priority_queue, messages[index][1], sizes[index])
+                 for index in indexes]
+        put_count = channel_queue.put_batch(
+            items, self.max_queue_in_a_channel, lane)
+        return put_count, indexes[put_count:]
 
-        while True:
-            try:
-                priority_data = self.get(block=block, timeout=timeout)
-                assert isinstance(priority_data, tuple) and \
-                       len(priority_data) == 2 and \
-                       isinstance(priority_data[1], dict) and \
-                       len(priority_data[1]) == 2, "Bad data in chanel queue !"
-                yield priority_data[1]
-            except Empty:
-                return
+    def check_batch_delivery_(self, channel, messages, first_id, received,
+                              lost):
+        """
+        Same as check_delivery_() for the messages of a batch,
+        see fan_out_batch_() for lost.
+        """
+        for index, (message, _) in enumerate(messages):
+            self.check_delivery_(
+                channel, message,
+                (None if first_id is None else
+                 (first_id + index) % self.max_id_4_a_channel),
+                DeliveryResult(received - lost[index], lost[index]))
 
-    def unsubscribe(self):
+    def publisher_(self, channel, is_priority_queue, batch_size=1,
+                   linger=None, rate_limiter=None, lane=None):
         """
-        Used by a subscriber who doesn't want to receive messages
-        on a given this channel and on a this queue
+        Return a Publisher object to publish messages on a channel.
+        Parameters :
+        - channel : channel where messages are published
+        - is_priority_queue : see publish_()
+        - batch_size : messages are kept by the publisher and
+            published when batch_size messages are waiting.
+            Default value : 1, messages are published immediately.
+        - linger : None or maximum time in seconds a message is kept
+            by the publisher before being published.
+        - rate_limiter : None or TokenBucket object limiting
+            this publisher, see publish_().
+        - lane : None or lane of all messages of this publisher,
+            see publish_().
         """
-        self.parent.unsubscribe(self.name, self)
+        if not channel:
+            raise ValueError('channel : None value not allowed')
+        if batch_size < 1:
+            raise ValueError('batch_size must be >= 1')
+        if linger is not None and linger <= 0:
+            raise ValueError('linger must be > 0')
+        return Publisher(self, channel, is_priority_queue,
+                         batch_size, linger, rate_limiter, lane)
 
 
-class PubSub(PubSubBase):
+class SubscriberRef(weakref.ref):
     """
-    Implement communication Design Pattern : Publish-subscribe
-    Ref : https://en.wikipedia.org/wiki/Publish–subscribe_pattern
-    Publishers write messages on channels and subscribers get them
+    Weak reference to a subscriber queue that remembers its channel.
+    """
+
+    __slots__ = ('channel',)
+
+
+class ChanelQueueMixin():
+    """
+    Behaviours shared by all subscriber queues of a channel.
+    Must be placed before the Python Queue class in the bases list
+    of a channel queue class.
+    """
+
+    def __init__(self, parent, channel, ack_timeout=None):
+        """
+        Create a new queue for the channel
+        Parameters :
+        - parent : communicator parent
+        - channel : string for the name of the channel
+        - ack_timeout : None or visibility timeout in seconds
+            for at-least-once delivery mode,
+            see PubSubBase.subscribe_()
+        """
+        super().__init__()
+        self.parent = parent
+        self.name = channel
+        self.ack_timeout = ack_timeout
+        # Leases not acknowledged yet : token -> Lease and
+        # heap of (deadline, token), acknowledged leases are
+        # removed lazily from the heap.
+        self.in_flight = {}
+        self.in_flight_heap = []
+        self.lease_count = 0
+        # WheelTimer requeuing the next lease to expire, so that
+        # selectors and fileno() are woken up for redeliveries
+        self.lease_timer = None
+        # ChanelSelector objects waiting on this queue
+        self.selectors = []
+        # Readiness file descriptors, see open_fd()
+        self.read_fd = None
+        self.write_fd = None
+        self.fd_signaled = False
+        self.fd_finalizer = None
+        # None or ByteBudget of this queue, see max_bytes option
+        # of PubSubBase.subscribe_()
+        self.byte_budget = None
+        # ByteBudget -> bytes of the messages waiting in this queue,
+        # released by bytes_finalizer if the queue is garbage collected
+        self.charges = {}
+        self.bytes_finalizer = None
+        # Sampling, see set_sampling()
+        self.sampled = False
+        self.sample_every = None
+        self.sample_count = 0
+        self.sample_limiter = None
+        # perf_counter() value when the subscriber got its last
+        # messages, see Profiler
+        self.taken_at = None
+
+    def set_sampling(self, sample_every=None, max_rate_hz=None):
+        """
+        Receive only a sample of the messages of the channel,
+        see sample_every and max_rate_hz options of
+        PubSubBase.subscribe_(). None values stop sampling.
+        """
+        self.sample_every = sample_every
+        self.sample_count = 0
+        self.sample_limiter = None
+        if max_rate_hz is not None:
+            self.sample_limiter = TokenBucket(max_rate_hz, 1, 'drop')
+        self.sampled = sample_every is not None or max_rate_hz is not None
+
+    # Item put in this queue for a message, see PubSubBase.build_item_()
+    build_item_ = staticmethod(PubSubBase.build_item_)
+
+    def sample_(self):
+        """
+        Return True if a message published must be put in this queue.
+        Called by publishers with the publish lock of the channel held.
+        """
+        if self.sample_every is not None:
+            kept = self.sample_count == 0
+            self.sample_count = (self.sample_count + 1) % self.sample_every
+            if not kept:
+                return False
+        return self.sample_limiter is None or self.sample_limiter.acquire()
+
+    def offer(self, item, maxsize, lane=None):
+        """
+        Put an item if there are less than maxsize messages in queue,
+        with one lock acquisition.
+        Return False if queue is full or if a byte budget is exceeded.
+        lane is used only by ChanelFairQueue.
+        """
+        with self.mutex:
+            if self.room_(lane, maxsize) <= 0:
+                return False
+            if self.parent.bytes_limited and not self.charge_(item):
+                return False
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        return True
+
+    def put_batch(self, items, maxsize, lane=None):
+        """
+        Put many items at once : one lock acquisition and
+        one wake up of listeners and selectors.
+        Items beyond maxsize messages in the queue are ignored.
+        Return the number of items put in queue.
+        lane is used only by ChanelFairQueue.
+        """
+        with self.mutex:
+            items = items[:max(self.room_(lane, maxsize), 0)]
+            if self.parent.bytes_limited:
+                for index, item in enumerate(items):
+                    if not self.charge_(item):
+                        items = items[:index]
+                        break
+            if items:
+                for item in items:
+                    super()._put(item)
+                self.unfinished_tasks += len(items)
+                self.signal_()
+                self.not_empty.notify(len(items))
+        return len(items)
+
+    def snapshot_(self):
+        """
+        Return (options, items) : subscribe() options to create this
+        queue again and a copy of its items, messages not acknowledged
+        yet included, see PubSubBase.snapshot().
+        """
+        with self.mutex:
+            items = self.items_()
+            items.extend(lease.item for lease in self.in_flight.values())
+        return self.options_(), items
+
+    def items_(self):
+        """
+        Return the list of items in the queue, self.mutex must be held.
+        """
+        return list(self.queue)
+
+    def options_(self):
+        """
+        Return the subscribe() options of this queue.
+        """
+        options = {}
+        if self.ack_timeout is not None:
+            options['ack_timeout'] = self.ack_timeout
+        if self.read_fd is not None:
+            options['pollable'] = True
+        if self.byte_budget is not None:
+            options['max_bytes'] = self.byte_budget.max_bytes
+        if self.sample_every is not None:
+            options['sample_every'] = self.sample_every
+        if self.sample_limiter is not None:
+            options['max_rate_hz'] = self.sample_limiter.rate
+        return options
+
+    def restore_items_(self, items):
+        """
+        Put back items saved by snapshot_(), limits are not checked.
+        """
+        with self.mutex:
+            for item in items:
+                if self.parent.bytes_limited:
+                    self.charge_(item)
+                self._put(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify(len(items))
+
+    def charge_(self, item):
+        """
+        Count the size of a message in the byte budgets of this queue,
+        of its channel and of the communicator, self.mutex must be held.
+        Return False, without counting it, if a budget is exceeded.
+        The budgets counted are recorded in the message to be released
+        when it leaves the queue, see release_().
+        """
+        message = self.unwrap(item)
+        size = getattr(message, 'size', None)
+        if size is None:
+            return True
+        parent = self.parent
+        budgets = tuple(budget for budget in (self.byte_budget,
+                                              parent.byte_budgets.get(
+                                                  self.name),
+                                              parent.byte_budget)
+                        if budget is not None)
+        for index, budget in enumerate(budgets):
+            if not budget.charge(size):
+                for charged_budget in budgets[:index]:
+                    charged_budget.release(size)
+                return False
+        message.budgets = budgets
+        for budget in budgets:
+            self.charges[budget] = self.charges.get(budget, 0) + size
+        if self.bytes_finalizer is None:
+            # Captures the charges, not the queue
+            self.bytes_finalizer = weakref.finalize(self, _release_charges,
+                                                    self.charges)
+        return True
+
+    def release_(self, item):
+        """
+        Release the byte budgets counted for an item leaving the queue.
+        A message delivered again after a lease expiration is not
+        counted anymore.
+        """
+        message = self.unwrap(item)
+        budgets = getattr(message, 'budgets', None)
+        if budgets:
+            for budget in budgets:
+                budget.release(message.size)
+                self.charges[budget] -= message.size
+            message.budgets = None
+
+    def release_bytes_(self):
+        """
+        Release the byte budgets of all messages waiting in this queue :
+        called when it leaves its channel, its messages can still be
+        taken by its subscriber.
+        """
+        with self.mutex:
+            for item in self.items_():
+                self.release_(item)
+
+    def room_(self, lane, maxsize):
+        """
+        Return the number of messages that can be added to the queue
+        (or to a lane of ChanelFairQueue), self.mutex must be held.
+        """
+        return maxsize - self._qsize()
+
+    def _put(self, item):
+        """
+        Called by Queue.put() with self.mutex held :
+        store item and wake up selectors waiting on this queue.
+        """
+        super()._put(item)
+        if self.selectors or self.write_fd is not None:
+            self.signal_()
+
+    def signal_(self):
+        """
+        Wake up selectors and file descriptor waiting on this queue,
+        self.mutex must be held.
+        """
+        for selector in self.selectors:
+            selector.wakeup()
+        # Edge coalesced : only the first message of a burst
+        # costs a system call.
+        if self.write_fd is not None and not self.fd_signaled:
+            self.fd_signaled = True
+            _signal_fd(self.write_fd, self.read_fd)
+
+    def _get(self):
+        """
+        Called by Queue.get() with self.mutex held :
+        reset readiness file descriptor when queue becomes empty.
+        """
+        item = super()._get()
+        if self.fd_signaled and not self._qsize():
+            self.fd_signaled = False
+            _clear_fd(self.read_fd)
+        if self.parent.bytes_limited:
+            self.release_(item)
+        return item
+
+    def open_fd(self):
+        """
+        Make this queue usable with select, poll, epoll, selectors
+        module or any event loop : fileno() becomes readable when
+        messages are waiting and is reset when the queue is emptied
+        by listen().
+        An eventfd is used on Linux, else a pipe.
+        Call close() to release the file descriptors.
+        """
+        with self.mutex:
+            if self.read_fd is not None:
+                return
+            if hasattr(os, 'eventfd'):
+                self.read_fd = os.eventfd(0, os.EFD_NONBLOCK |
+                                          os.EFD_CLOEXEC)
+                self.write_fd = self.read_fd
+            else:
+                self.read_fd, self.write_fd = os.pipe()
+                os.set_blocking(self.read_fd, False)
+                os.set_blocking(self.write_fd, False)
+            self.fd_finalizer = weakref.finalize(
+                self, _close_fds, self.read_fd, self.write_fd)
+            if self._qsize():
+                self.fd_signaled = True
+                _signal_fd(self.write_fd, self.read_fd)
+
+    def fileno(self):
+        """
+        Return the file descriptor readable when messages are waiting
+        in this queue. Do not read it : use listen() to get messages.
+        Raise ValueError if queue was not subscribed with pollable=True
+        or if open_fd() was not called.
+        """
+        if self.read_fd is None:
+            raise ValueError('fileno : queue not pollable, '
+                             'subscribe with pollable=True')
+        return self.read_fd
+
+    def close(self):
+        """
+        Release readiness file descriptors opened by open_fd().
+        """
+        with self.mutex:
+            if self.fd_finalizer is not None:
+                self.fd_finalizer()
+            self.read_fd = None
+            self.write_fd = None
+            self.fd_signaled = False
+            self.fd_finalizer = None
+
+    def is_ready(self):
+        """
+        Return True if at least one message is waiting in this queue.
+        Lock free : used by ChanelSelector, result may be obsolete
+        as soon as it is returned.
+        """
+        return self._qsize() > 0
+
+    def listen(self, block=True, timeout=None, deadline=None,
+               max_items=None):
+        """
+        Called by a subscriber when he wants to get messages from
+        a channel.
+        Return an iterator that can be used to get messages sent by a
+        publisher in the queue.
+
+        Iterator can be casted in Python list to get all messages in it
+        with : msgs = list(messageQueue.listen(block=False))
+
+        Messages returned are of type dictionary with 2 keys registered by
+        by publish() method:
+            'data' : the message's payload that was put in the queue by
+                        publishers (see publish() method).
+            'id' : Number of this message on the current channel
+        In at-least-once delivery mode (see ack_timeout parameter of
+        PubSubBase.subscribe_()), Lease objects are returned instead :
+        lease['data'] and lease['id'] give the same values and
+        lease.ack() must be called when the message is processed.
+
+        Parameters :
+        - block (default value: True) and timeout (default value: None)
+            and behaviours if no message is in the queue.
+            Documentation can be found in
+            Python official Queue documentation and especially in its get()
+            method : see https://docs.python.org/3/library/queue.html
+        - timeout : None : no timeout or positive integer see
+            Python official Queue documentation and especially in its get()
+            method : see https://docs.python.org/3/library/queue.html
+            timeout applies to each message waited.
+        - deadline : None or time in seconds from the call of listen()
+            after which the iterator stops, even if messages keep coming
+            or are still waiting : each wait is limited by the remaining
+            time, no polling is needed for time sliced loops.
+            Once the deadline is passed (at once with deadline=0),
+            one message already waiting is still returned.
+        - max_items : None or maximum number of messages returned
+            before the iterator stops.
+        Raise ValueError if deadline < 0 or max_items < 1, when listen()
+        is called and not when the iterator starts.
+        """
+
+        end_time = self.end_time_(deadline, max_items)
+        return self.listen_(block, timeout, end_time, max_items)
+
+    def listen_(self, block, timeout, end_time, max_items):
+        """
+        Generator behind listen() : end_time is None or the monotonic()
+        time computed by listen() from its deadline.
+        """
+        parent = self.parent
+        count = 0
+        while max_items is None or count < max_items:
+            if parent.profiler is not None:
+                parent.profiler.consumed_(self)
+            wait = timeout
+            if end_time is not None:
+                remaining = end_time - monotonic()
+                if remaining <= 0:
+                    # Deadline passed : a message already waiting is
+                    # still taken, then the iterator stops
+                    block, max_items = False, count + 1
+                elif wait is None or remaining < wait:
+                    wait = remaining
+            # Hot path : helpers are only called when needed
+            try:
+                item = (self.get(block, wait) if self.ack_timeout is None
+                        else self.get_leased(block, wait))
+            except Empty:
+                return
+            count += 1
+            if parent.watermarks or parent.profiler is not None:
+                self.took_(1)
+            message = self.unwrap(item)
+            yield (message if self.ack_timeout is None
+                   else self.lease(item, message))
+
+    def get_batch(self, max_items=None, block=True, timeout=None):
+        """
+        Wait for a message like listen() then take it with the messages
+        waiting behind it, with one lock acquisition : a consumer waiting
+        in a loop wakes up once per batch and not once per message.
+        Parameters :
+        - max_items : None or maximum number of messages returned
+        - block, timeout : see listen(), timeout limits the wait for the
+            first message
+        Return a list of messages (Lease objects in at-least-once
+        delivery mode), empty if no message came in time.
+        Raise ValueError if max_items < 1.
+        """
+        self.end_time_(None, max_items)
+        profiler = self.parent.profiler
+        if profiler is not None:
+            profiler.consumed_(self)
+        try:
+            items = [self.get_item_(block, timeout)]
+        except Empty:
+            return []
+        with self.mutex:
+            count = self._qsize()
+            if max_items is not None:
+                count = min(count, max_items - 1)
+            items.extend(self._get() for _ in range(count))
+            if count:
+                self.not_full.notify(count)
+        self.took_(len(items))
+        return [self.message_(item) for item in items]
+
+    def get_item_(self, block, timeout):
+        """
+        Same as Queue.get(), expired leases are put back in the queue
+        before in at-least-once delivery mode, see get_leased().
+        """
+        if self.ack_timeout is None:
+            return self.get(block=block, timeout=timeout)
+        return self.get_leased(block, timeout)
+
+    def took_(self, count):
+        """
+        Update watermark and profiler after count messages were taken
+        by listen() or get_batch().
+        """
+        if self.parent.watermarks:
+            self.taken_()
+        profiler = self.parent.profiler
+        if profiler is not None:
+            self.taken_at = perf_counter()
+            profiler.taken_(self, count)
+
+    def message_(self, item):
+        """
+        Return the message of an item taken from the queue,
+        or its Lease object in at-least-once delivery mode.
+        """
+        message = self.unwrap(item)
+        if self.ack_timeout is None:
+            return message
+        return self.lease(item, message)
+
+    @staticmethod
+    def end_time_(deadline, max_items):
+        """
+        Check deadline and max_items parameters of listen() and
+        get_batch(), return None or the monotonic() time of the deadline.
+        """
+        if max_items is not None and max_items < 1:
+            raise ValueError('max_items must be >= 1')
+        if deadline is None:
+            return None
+        if deadline < 0:
+            raise ValueError('deadline must be >= 0')
+        return monotonic() + deadline
+
+    def taken_(self):
+        """
+        Called when messages were taken from this queue :
+        the channel may be writable again, see PubSubBase.set_watermarks()
+        """
+        self.parent.check_low_watermark_(self.name)
+
+    def get_leased(self, block, timeout):
+        """
+        Same as Queue.get() but messages not acknowledged in time
+        are put back in the queue before, and waiting is limited
+        by the next lease expiration.
+        """
+        end_time = None
+        if block and timeout is not None:
+            end_time = monotonic() + timeout
+        while True:
+            next_deadline = self.requeue_expired()
+            if not block:
+                return self.get(block=False)
+            wait = None if end_time is None else end_time - monotonic()
+            if next_deadline is not None:
+                until_deadline = next_deadline - monotonic()
+                if wait is None or until_deadline < wait:
+                    wait = until_deadline
+            if wait is not None:
+                wait = max(wait, 0)
+            try:
+                return self.get(timeout=wait)
+            except Empty:
+                if end_time is not None and monotonic() >= end_time:
+                    raise
+
+    def lease(self, item, message):
+        """
+        Register a message delivered in at-least-once delivery mode
+        and return its Lease object.
+        """
+        with self.mutex:
+            self.lease_count += 1
+            lease = Lease(self, self.lease_count, item, message)
+            self.in_flight[lease.token] = lease
+            heapq.heappush(self.in_flight_heap,
+                           (monotonic() + self.ack_timeout, lease.token))
+            self.arm_lease_timer_()
+        return lease
+
+    def arm_lease_timer_(self):
+        """
+        Schedule expire_leases_() at the next lease expiration if
+        no timer is pending, self.mutex must be held.
+        """
+        if self.lease_timer is None and self.in_flight_heap:
+            self.lease_timer = \
+                self.parent.get_scheduler_().call_later(
+                    self.in_flight_heap[0][0] - monotonic(),
+                    _expire_leases, weakref.ref(self))
+
+    def expire_leases_(self):
+        """
+        Called by scheduler, see _expire_leases(), when a lease
+        expires : put back
+        the messages not acknowledged in the queue, which signals
+        selectors and readiness file descriptor.
+        """
+        self.requeue_expired()
+        with self.mutex:
+            self.lease_timer = None
+            self.arm_lease_timer_()
+
+    def ack(self, leases):
+        """
+        Acknowledge processed messages : they won't be delivered again.
+        Parameter :
+        - leases : a Lease object returned by listen() or an iterable
+            of Lease objects to acknowledge a batch with one lock
+            acquisition.
+        Return the number of leases acknowledged, leases already
+        acknowledged or expired are ignored.
+        """
+        if isinstance(leases, Lease):
+            leases = (leases,)
+        acknowledged = 0
+        with self.mutex:
+            for lease in leases:
+                if self.in_flight.pop(lease.token, None) is not None:
+                    acknowledged += 1
+            # Purge heap from acknowledged leases when they are
+            # the majority
+            if len(self.in_flight_heap) > 2 * len(self.in_flight) + 64:
+                self.in_flight_heap = [
+                    entry for entry in self.in_flight_heap
+                    if entry[1] in self.in_flight]
+                heapq.heapify(self.in_flight_heap)
+        return acknowledged
+
+    def requeue_expired(self):
+        """
+        Put back in the queue messages whose lease expired.
+        Return the deadline of the next lease to expire or None.
+        """
+        expired = []
+        now = monotonic()
+        with self.mutex:
+            while self.in_flight_heap and self.in_flight_heap[0][0] <= now:
+                _, token = heapq.heappop(self.in_flight_heap)
+                lease = self.in_flight.pop(token, None)
+                if lease is not None:
+                    expired.append(lease)
+            next_deadline = (self.in_flight_heap[0][0]
+                             if self.in_flight_heap else None)
+        for lease in expired:
+            self.put(lease.item)
+        return next_deadline
+
+    def in_flight_count(self):
+        """
+        Return the number of delivered messages not acknowledged yet.
+        """
+        return len(self.in_flight)
+
+    def unsubscribe(self):
+        """
+        Used by a subscriber who doesn't want to receive messages
+        on a given this channel and on a this queue
+        """
+        self.parent.unsubscribe(self.name, self)
+
+
+class ChanelQueue(ChanelQueueMixin, Queue):
+    """
+    A FIFO queue for a channel.
+    """
+
+    def unwrap(self, item):
+        """
+        Return the message dictionary stored in a queue item.
+        """
+        assert isinstance(item, dict) and len(item) == 2,\
+               "Bad data in chanel queue !"
+        return item
+
+
+class ChanelPriorityQueue(ChanelQueueMixin, PriorityQueue):
+    """
+    A FIFO priority queue for a channel.
+    """
+
+    def unwrap(self, item):
+        """
+        See : ChanelQueue.unwrap() method
+        """
+        assert isinstance(item, tuple) and \
+               len(item) == 2 and \
+               isinstance(item[1], dict) and \
+               len(item[1]) == 2, "Bad data in chanel queue !"
+        return item[1]
+
+
+class AgingPriorityQueue(Queue):
+    """
+    Priority queue where waiting messages gain one priority level
+    every aging_interval seconds.
+    Items are (priority, message) tuples like in PriorityQueue,
+    stored in one FIFO lane per priority : the oldest message of a lane
+    is its head, so getting a message only compares lane heads effective
+    priorities, no heap to reorganize when time goes by.
+    """
+
+    aging_interval = 1.0
+
+    def _init(self, maxsize):
+        # priority -> deque of (put time, item)
+        self.lanes = {}
+        # sorted priorities of lanes
+        self.priorities = []
+        self.size = 0
+
+    def _qsize(self):
+        return self.size
+
+    def _put(self, item):
+        priority = item[0]
+        lane = self.lanes.get(priority)
+        if lane is None:
+            lane = self.lanes[priority] = collections.deque()
+            bisect.insort(self.priorities, priority)
+        lane.append((monotonic(), item))
+        self.size += 1
+
+    def _get(self):
+        now = monotonic()
+        best_key = None
+        best_lane = None
+        for priority in self.priorities:
+            lane = self.lanes[priority]
+            put_time, item = lane[0]
+            effective = max(priority -
+                            int((now - put_time) / self.aging_interval), 0)
+            # Same effective priority : oldest message first
+            key = (effective, put_time)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_lane = priority
+        lane = self.lanes[best_lane]
+        _, item = lane.popleft()
+        if not lane:
+            del self.lanes[best_lane]
+            self.priorities.remove(best_lane)
+        self.size -= 1
+        return item
+
+
+class ChanelAgingPriorityQueue(ChanelQueueMixin, AgingPriorityQueue):
+    """
+    A priority queue for a channel with priority aging,
+    see AgingPriorityQueue.
+    """
+
+    def __init__(self, parent, channel, ack_timeout=None,
+                 aging_interval=1.0):
+        """
+        See : ChanelQueueMixin.__init__() method
+        - aging_interval : seconds to gain one priority level
+        """
+        self.aging_interval = aging_interval
+        super().__init__(parent, channel, ack_timeout)
+
+    def unwrap(self, item):
+        """
+        See : ChanelQueue.unwrap() method
+        """
+        return ChanelPriorityQueue.unwrap(self, item)
+
+    def items_(self):
+        """
+        See : ChanelQueueMixin.items_() method,
+        time spent waiting is not kept.
+        """
+        return [item for lane in self.lanes.values() for _, item in lane]
+
+    def options_(self):
+        """
+        See : ChanelQueueMixin.options_() method
+        """
+        options = super().options_()
+        options['aging_interval'] = self.aging_interval
+        return options
+
+
+class FairQueue(Queue):
+    """
+    Queue with one FIFO per lane, served by deficit round robin :
+    at each round, a lane receives its weight in credit and gives one
+    message per credit unit. Items are (lane, message) tuples.
+    """
+
+    weights = {}
+
+    def _init(self, maxsize):
+        # lane -> deque of items
+        self.lanes = {}
+        # Lanes with messages in round robin order
+        self.active_lanes = collections.deque()
+        # lane -> credit left in current round
+        self.deficits = {}
+        self.size = 0
+
+    def _qsize(self):
+        return self.size
+
+    def lane_qsize(self, lane):
+        """
+        Return the number of messages waiting in a lane.
+        """
+        return len(self.lanes.get(lane, ()))
+
+    def _put(self, item):
+        lane = item[0]
+        fifo = self.lanes.get(lane)
+        if fifo is None:
+            fifo = self.lanes[lane] = collections.deque()
+            self.active_lanes.append(lane)
+            self.deficits[lane] = 0
+        fifo.append(item)
+        self.size += 1
+
+    def _get(self):
+        while True:
+            lane = self.active_lanes[0]
+            if self.deficits[lane] < 1:
+                # New round for this lane
+                self.deficits[lane] += self.weights.get(lane, 1)
+                if self.deficits[lane] < 1:
+                    self.active_lanes.rotate(-1)
+                    continue
+            fifo = self.lanes[lane]
+            item = fifo.popleft()
+            self.size -= 1
+            self.deficits[lane] -= 1
+            if not fifo:
+                # An idle lane keeps no credit
+                self.active_lanes.popleft()
+                del self.lanes[lane]
+                del self.deficits[lane]
+            elif self.deficits[lane] < 1:
+                self.active_lanes.rotate(-1)
+            return item
+
+
+class ChanelFairQueue(ChanelQueueMixin, FairQueue):
+    """
+    A queue for a channel with weighted fair queuing between lanes
+    (tenants, traffic classes...), see FairQueue and lanes parameter
+    of PubSubBase.subscribe_().
+    Each lane has its own size limit so that a lane can't fill
+    the queue of other lanes.
+    """
+
+    def __init__(self, parent, channel, ack_timeout=None, lanes=None,
+                 lane_size=100):
+        """
+        See : ChanelQueueMixin.__init__() method
+        - lanes : dictionary lane name -> weight
+        - lane_size : maximum number of messages waiting in a lane
+        """
+        self.weights = dict(lanes or {})
+        self.lane_size = lane_size
+        super().__init__(parent, channel, ack_timeout)
+
+    def offer(self, item, maxsize, lane=None):
+        """
+        See : ChanelQueueMixin.offer() method,
+        lane_size is used in addition to maxsize.
+        """
+        return super().offer((lane, item), maxsize, lane)
+
+    def put_batch(self, items, maxsize, lane=None):
+        """
+        See : ChanelQueueMixin.put_batch() method,
+        lane_size is used in addition to maxsize.
+        """
+        return super().put_batch([(lane, item) for item in items],
+                                 maxsize, lane)
+
+    def room_(self, lane, maxsize):
+        """
+        See : ChanelQueueMixin.room_() method, the limit is per lane
+        and maxsize still bounds the whole queue.
+        """
+        return min(self.lane_size - self.lane_qsize(lane),
+                   maxsize - self._qsize())
+
+    def items_(self):
+        """
+        See : ChanelQueueMixin.items_() method
+        """
+        return [item for fifo in self.lanes.values() for item in fifo]
+
+    def options_(self):
+        """
+        See : ChanelQueueMixin.options_() method
+        """
+        options = super().options_()
+        options['lanes'] = self.weights
+        options['lane_size'] = self.lane_size
+        return options
+
+    def unwrap(self, item):
+        """
+        See : ChanelQueue.unwrap() method
+        """
+        return ChanelQueue.unwrap(self, item[1])
+
+
+class ChanelArrayQueue(ChanelQueueMixin, Queue):
+    """
+    A queue for a typed channel whose messages can be taken
+    in one call in a numpy structured array, see drain().
+    Messages are stored as (id, timestamp, data) rows,
+    timestamp is the time.time() value when they are put.
+    listen() still returns dictionaries.
+    """
+
+    def __init__(self, parent, channel, dtype):
+        """
+        See : ChanelQueueMixin.__init__() method
+        - dtype : numpy dtype of the messages, see PubSubBase.set_schema()
+        """
+        # dtype of the arrays returned by drain()
+        self.dtype = _array_dtype(numpy.dtype(dtype))
+        super().__init__(parent, channel)
+
+    @staticmethod
+    def build_item_(message, _id, is_priority_queue, priority, size=None):
+        """
+        Return the (id, timestamp, data) row of a message :
+        no dictionary is built for typed channels.
+        """
+        return (_id, time(), message)
+
+    def unwrap(self, item):
+        """
+        Return the message dictionary of a row.
+        """
+        return {'data': item[2], 'id': item[0]}
+
+    def options_(self):
+        """
+        See : ChanelQueueMixin.options_() method
+        """
+        options = super().options_()
+        options['columnar'] = True
+        return options
+
+    def drain(self, out=None, max_items=None):
+        """
+        Take waiting messages without blocking.
+        Parameters :
+        - out : None or a preallocated numpy array of dtype self.dtype
+            filled from its start : at most len(out) messages are taken.
+        - max_items : None or maximum number of messages taken.
+        Return a new numpy array of messages if out is None,
+        else the number of messages written in out.
+        """
+        with self.mutex:
+            count = self._qsize()
+            if max_items is not None:
+                count = min(count, max_items)
+            if out is not None:
+                count = min(count, len(out))
+            # Converted before rows are removed : if a row doesn't fit
+            # (schema changed), messages stay in the queue.
+            array = numpy.array(list(itertools.islice(self.queue, count)),
+                                dtype=self.dtype)
+            if count == self._qsize():
+                self.queue.clear()
+            else:
+                for _ in range(count):
+                    self.queue.popleft()
+            if self.fd_signaled and not self._qsize():
+                self.fd_signaled = False
+                _clear_fd(self.read_fd)
+            if count:
+                self.not_full.notify(count)
+        if self.parent.watermarks:
+            self.taken_()
+        if out is None:
+            return array
+        out[:count] = array
+        return count
+
+
+class Publisher():
+    """
+    Publisher handle returned by communicator publisher() method.
+    Messages can be grouped in batches to save lock acquisitions and
+    thread wake ups : a batch is published when batch_size messages
+    are waiting, when linger time expires or when flush() is called.
+    Subscribers still get messages one by one with listen().
+    Can be used in a with statement to flush and close it at the end.
+    """
+
+    def __init__(self, communicator, channel, is_priority_queue,
+                 batch_size=1, linger=None, rate_limiter=None, lane=None):
+        """
+        See PubSubBase.publisher_() for parameters
+        """
+        self.communicator = communicator
+        self.channel = channel
+        self.is_priority_queue = is_priority_queue
+        self.batch_size = batch_size
+        self.linger = linger
+        self.rate_limiter = rate_limiter
+        self.lane = lane
+        self.batch = []
+        self.linger_timer = None
+        self.lock = Lock()
+        # Channel rate limit cached by bind_()
+        self.channels_version = None
+        self.channel_limiter = None
+
+    def bind_(self):
+        """
+        Cache the rate limit of the channel : it is looked up
+        again only when communicator channels_version changes.
+        """
+        communicator = self.communicator
+        with communicator.channels_lock:
+            self.channels_version = communicator.channels_version
+            self.channel_limiter = communicator.rate_limits.get(
+                self.channel)
+
+    def publish(self, message, priority=100, dedup_key=None):
+        """
+        Publish a message on the publisher channel, priority is used
+        only by PubSubPriority communicators, for dedup_key see
+        PubSubBase.publish_().
+        See PubSubBase.publish_()
+        Channel was checked when publisher was created and its
+        subscribers are cached : only message id and queues are updated.
+        Return a DeliveryResult when the message is published
+        immediately, else None (batch or dispatch threads).
+        """
+        if priority < 0:
+            raise ValueError('priority must be > 0')
+        if not message:
+            raise ValueError('message : None value not allowed')
+        if self.communicator.schemas:
+            self.communicator.check_schema_(self.channel, message)
+        if dedup_key is not None and \
+                self.communicator.is_duplicate_(self.channel, dedup_key):
+            return DeliveryResult(0, 0)
+        if self.batch_size == 1:
+            return self.publish_now_(message, priority, dedup_key)
+        entry = (message, priority)
+        if dedup_key is not None:
+            entry = BatchEntry(entry)
+            entry.dedup_key = dedup_key
+        with self.lock:
+            self.batch.append(entry)
+            if len(self.batch) >= self.batch_size:
+                return self.flush_()
+            self.arm_linger_()
+        return None
+
+    def arm_linger_(self):
+        """
+        Flush waiting messages after linger seconds if no flush
+        is planned yet, self.lock must be held.
+        """
+        if self.linger is not None and self.linger_timer is None and \
+                self.batch:
+            # Flushed by the thread of delayed publications :
+            # a blocking rate limit must not stop the scheduler
+            self.linger_timer = self.communicator.publish_later_(
+                self.linger, self.channel, self.flush)
+
+    def publish_now_(self, message, priority, dedup_key):
+        """
+        Publish a message immediately through PubSubBase.send_(),
+        like PubSubBase.publish_() without channel checks and lookups.
+        """
+        communicator = self.communicator
+        if communicator.dead_refs:
+            communicator.prune_()
+        if self.channels_version != communicator.channels_version:
+            self.bind_()
+        return communicator.send_(self.channel, message,
+                                  self.is_priority_queue, priority,
+                                  self.rate_limiter, self.channel_limiter,
+                                  self.lane, dedup_key)
+
+    def flush(self):
+        """
+        Publish messages waiting in this publisher.
+        Return a DeliveryResult or None, see PubSubBase.publish_batch_().
+        """
+        with self.lock:
+            return self.flush_()
+
+    def flush_(self):
+        """
+        Publish waiting messages, self.lock must be held.
+        Messages rejected by a rate limit or by dispatcher threads
+        with policy 'reject' are kept for the next flush, planned
+        after linger seconds, and the exception is raised again.
+        """
+        if self.linger_timer is not None:
+            self.linger_timer.cancel()
+            self.linger_timer = None
+        batch, self.batch = self.batch, []
+        if not batch:
+            return DeliveryResult(0, 0)
+        try:
+            return self.communicator.publish_batch_(
+                self.channel, batch, self.is_priority_queue,
+                rate_limiter=self.rate_limiter, lane=self.lane)
+        except (RateLimitExceeded, Full) as exc:
+            self.batch = list(exc.unpublished)
+            self.arm_linger_()
+            raise
+
+    def close(self):
+        """
+        Publish waiting messages.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BatchEntry(tuple):
+    """
+    (message, priority) tuple of a Publisher batch keeping the
+    dedup_key of its message : the key is forgotten if the message
+    is dropped when the batch is published.
+    """
+
+
+class Lease():
+    """
+    A message delivered by listen() in at-least-once delivery mode.
+    It behaves like the message dictionary for reading : lease['data'],
+    lease['id'] and must be acknowledged with ack() once processed,
+    else the message is delivered again after the queue ack_timeout.
+    """
+
+    __slots__ = ('queue', 'token', 'item', 'message')
+
+    def __init__(self, queue, token, item, message):
+        """
+        Parameters :
+        - queue : channel queue that delivered the message
+        - token : unique number of this delivery in the queue
+        - item : queue item to put back if not acknowledged
+        - message : message dictionary
+        """
+        self.queue = queue
+        self.token = token
+        self.item = item
+        self.message = message
+
+    def __getitem__(self, key):
+        return self.message[key]
+
+    def ack(self):
+        """
+        Acknowledge this message, see ChanelQueueMixin.ack().
+        Return True if lease was still in flight.
+        """
+        return self.queue.ack(self) == 1
+
+
+class Request():
+    """
+    Payload of a message published by request() : responders read
+    the request payload and answer with reply() or fail().
+    """
+
+    __slots__ = ('communicator', 'correlation_id', 'payload')
+
+    def __init__(self, communicator, correlation_id, payload):
+        """
+        Parameters :
+        - communicator : communicator holding the reply inbox
+        - correlation_id : number identifying the request
+        - payload : message given to request()
+        """
+        self.communicator = communicator
+        self.correlation_id = correlation_id
+        self.payload = payload
+
+    def reply(self, result):
+        """
+        Send result to the requester.
+        Return False if another responder already replied
+        or if the request timed out.
+        """
+        return self.communicator.resolve_request_(self.correlation_id,
+                                                  result=result)
+
+    def fail(self, exception):
+        """
+        Make the requester future raise exception.
+        Return False like reply().
+        """
+        return self.communicator.resolve_request_(self.correlation_id,
+                                                  exception=exception)
+
+
+class ChanelSelector():
+    """
+    Wait on many channel queues at once.
+
+    A subscriber listening to several channels registers its queues
+    (obtained by subscribe()) in a selector and blocks in select()
+    until at least one of them holds messages : no need for one
+    thread per channel or for a busy loop on listen(block=False).
+
+    Usage :
+        selector = ChanelSelector([queue_1, queue_2])
+        for message_queue in selector.select(timeout=1.0):
+            for message in message_queue.listen(block=False):
+                ...
+    """
+
+    def __init__(self, message_queues=None):
+        """
+        Create a selector
+        Optional parameter :
+        - message_queues : iterable of queues returned by subscribe()
+            to register now, see register() method.
+        """
+        self.message_queues = []
+        self.condition = Condition(Lock())
+        for message_queue in message_queues or ():
+            self.register(message_queue)
+
+    def register(self, message_queue):
+        """
+        Add a queue returned by subscribe() to the queues watched
+        by this selector.
+        """
+        if not message_queue:
+            raise ValueError('message_queue : None value not allowed')
+        with self.condition:
+            if message_queue in self.message_queues:
+                return
+            self.message_queues.append(message_queue)
+        with message_queue.mutex:
+            message_queue.selectors.append(self)
+
+    def unregister(self, message_queue):
+        """
+        Stop watching a queue registered previously.
+        """
+        if not message_queue:
+            raise ValueError('message_queue : None value not allowed')
+        with message_queue.mutex:
+            if self in message_queue.selectors:
+                message_queue.selectors.remove(self)
+        with self.condition:
+            if message_queue in self.message_queues:
+                self.message_queues.remove(message_queue)
+
+    def close(self):
+        """
+        Unregister all queues watched by this selector.
+        """
+        for message_queue in list(self.message_queues):
+            self.unregister(message_queue)
+
+    def wakeup(self):
+        """
+        Called by a watched queue when a message is put in it.
+        """
+        with self.condition:
+            self.condition.notify_all()
+
+    def select(self, timeout=None):
+        """
+        Block until at least one registered queue holds messages
+        and return the list of all ready queues in one wakeup.
+
+        Parameter :
+        - timeout : None (default value) : wait until a queue is ready,
+            else maximum number of seconds to wait.
+            Return an empty list if the timeout expires.
+        """
+        end_time = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            while True:
+                # Queue mutexes are never taken here : publishers
+                # call wakeup() with their queue mutex held.
+                ready_queues = [message_queue
+                                for message_queue in self.message_queues
+                                if message_queue.is_ready()]
+                if ready_queues:
+                    return ready_queues
+                if end_time is None:
+                    self.condition.wait()
+                else:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0:
+                        return ready_queues
+                    self.condition.wait(remaining)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PubSub(PubSubBase):
+    """
+    Implement communication Design Pattern : Publish-subscribe
+    Ref : https://en.wikipedia.org/wiki/Publish–subscribe_pattern
+    Publishers write messages on channels and subscribers get them
     in an asynchronous way.
 
-    For limitations, see  PubSubBase.__init__() constructor
-    parameters and default values.
+    For limitations, see  PubSubBase.__init__() constructor
+    parameters and default values.
+
+    This class is based on thread-safe FIFO queue standard Python
+    implementation and was designed thread-safe by Zhen Wang.
+    """
+
+    def subscribe(self, channel, **options):
+        """
+        Return a synchronised normal FIFO queue object
+        used by a subscriber to listen at messages sent
+        by publishers on a given channel.
+
+        No problem if channel doesn't exists yet.
+        See  PubSubBase.subscribe_() for more details
+        Parameter:
+        - channel : the channel to listen to.
+        - options : pollable, ack_timeout, lanes, lane_size, columnar,
+            max_bytes, sample_every, max_rate_hz,
+            see PubSubBase.subscribe_()
+        """
+        return self.subscribe_(channel, False, **options)
+
+    def publish(self, channel, message, **options):
+        """
+        See  PubSubBase.publish_() for more details
+        Options : rate_limiter, lane, dedup_key, see PubSubBase.publish_()
+        Return a DeliveryResult or None, see PubSubBase.publish_()
+        """
+        return self.publish_(channel, message, False, priority=100,
+                             **options)
+
+    def publish_after(self, channel, message, delay, **options):
+        """
+        Publish a message in delay seconds.
+        Return a WheelTimer object, call its cancel() method to cancel
+        the publication.
+        See PubSubBase.publish_after_() for more details
+        """
+        return self.publish_after_(delay, channel, message, False,
+                                   100, **options)
+
+    def publish_at(self, channel, message, when, **options):
+        """
+        Publish a message at time when (seconds since the Epoch
+        like time.time()).
+        See publish_after() for more details
+        """
+        return self.publish_after(channel, message, when - time(),
+                                  **options)
+
+    def request(self, channel, message, timeout=None, **options):
+        """
+        Publish a request and return a concurrent.futures.Future
+        for its reply :
+            reply = communicator.request('service', 'question',
+                                         timeout=5).result()
+        Responder side :
+            for msg in message_queue.listen():
+                msg['data'].reply(answer(msg['data'].payload))
+        See PubSubBase.request_() for more details
+        """
+        return self.request_(channel, message, timeout, False, 100,
+                             **options)
+
+    def publisher(self, channel, **options):
+        """
+        Return a Publisher object to publish messages on a channel :
+            with communicator.publisher('test', batch_size=100,
+                                        linger=0.01) as publisher:
+                publisher.publish('Hello World !')
+        Options : batch_size, linger, rate_limiter, lane,
+            see PubSubBase.publisher_()
+        """
+        return self.publisher_(channel, False, **options)
+
+    def set_dead_letter_channel(self, channel, **options):
+        """
+        Publish lost messages on channel, None to stop.
+        Options : rate, burst, batch_size, linger, undeliverable,
+            see PubSubBase.set_dead_letter_channel_()
+        """
+        return self.set_dead_letter_channel_(channel, False, **options)
+
+
+class PubSubPriority(PubSubBase):
+    """
+    Same as PubSub class but deal with messages priorities.
+    Send registred messages in priority order (lowest first)
+    For limitations, see  PubSub __init__() constructor parameters and
+    default values.
+
+    This class is based on thread-safe FIFO PriorityQueue Python
+    implementation.
+    """
+
+    is_priority_queue = True
+
+    def subscribe(self, channel, **options):
+        """
+        Return a synchronised FIFO priority queue object
+        used by a subscriber to listen at messages sent
+        by publishers on a given channel.
+
+        No problem if channel doesn't exists yet.
+        See  PubSubBase.subscribe_() for more details
+        Parameter:
+        - channel : the channel to listen to.
+        - options : pollable, ack_timeout, aging_interval,
+            see PubSubBase.subscribe_()
+        """
+
+        return self.subscribe_(channel, True, **options)
+
+    def publish(self, channel, message, priority=100, **options):
+        """
+        See PubSubBase.publish_() for more details
+        Options : rate_limiter, lane, dedup_key, see PubSubBase.publish_()
+        Return a DeliveryResult or None, see PubSubBase.publish_()
+        """
+        return self.publish_(channel, message, True, priority, **options)
+
+    def publish_after(self, channel, message, delay, priority=100,
+                      **options):
+        """
+        See PubSub.publish_after() for more details
+        """
+        return self.publish_after_(delay, channel, message, True,
+                                   priority, **options)
+
+    def publish_at(self, channel, message, when, priority=100, **options):
+        """
+        See PubSub.publish_at() for more details
+        """
+        return self.publish_after(channel, message, when - time(),
+                                  priority, **options)
+
+    def request(self, channel, message, timeout=None, priority=100,
+                **options):
+        """
+        See PubSub.request() for more details
+        """
+        return self.request_(channel, message, timeout, True, priority,
+                             **options)
+
+    def publisher(self, channel, **options):
+        """
+        See PubSub.publisher() for more details,
+        use publisher.publish(message, priority) to publish.
+        """
+        return self.publisher_(channel, True, **options)
+
+    def set_dead_letter_channel(self, channel, **options):
+        """
+        See PubSub.set_dead_letter_channel() for more details.
+        """
+        return self.set_dead_letter_channel_(channel, True, **options)
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised by publish() when a rate limit with policy 'reject'
+    is exceeded.
+    """
+
+
+DeliveryResult = collections.namedtuple('DeliveryResult',
+                                        ('delivered', 'dropped'))
+DeliveryResult.__doc__ = """
+Returned by publish() : number of subscriber queues where messages
+were put and number of messages lost by subscribers
+(queue overflow or rate limit).
+"""
+
+
+def estimate_size(message):
+    """
+    Default size estimator of byte budgets : length of bytes-like
+    objects and strings, else sys.getsizeof() (objects referenced
+    by containers are not counted).
+    """
+    if isinstance(message, (bytes, bytearray, str)):
+        return len(message)
+    if isinstance(message, memoryview):
+        return message.nbytes
+    return sys.getsizeof(message)
+
+
+class ByteBudget():
+    """
+    Count the size in bytes of messages waiting in subscriber queues
+    and limit it, see max_bytes parameters.
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        - max_bytes : None (no limit) or maximum number of bytes
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.rejected = 0
+        self.lock = Lock()
+
+    def charge(self, size):
+        """
+        Count size bytes, return False if it exceeds the limit.
+        """
+        with self.lock:
+            if self.max_bytes is not None and \
+                    self.bytes + size > self.max_bytes:
+                self.rejected += 1
+                return False
+            self.bytes += size
+            return True
+
+    def release(self, size):
+        """
+        Forget size bytes of a message leaving a queue.
+        """
+        with self.lock:
+            self.bytes -= size
+
+    def stats(self):
+        """
+        Return a dictionary with limit, bytes counted and number of
+        messages rejected.
+        """
+        return {'max_bytes': self.max_bytes, 'bytes': self.bytes,
+                'rejected': self.rejected}
+
+
+class DeadLetterChannel():
+    """
+    Dead letter channel of a communicator, see
+    PubSubBase.set_dead_letter_channel_() : lost messages are
+    rate limited and published in batches.
+    """
+
+    def __init__(self, communicator, channel, is_priority_queue, limiter,
+                 batch_size=100, linger=0.1, undeliverable=False):
+        """
+        See PubSubBase.set_dead_letter_channel_() for parameters,
+        limiter is a TokenBucket object with policy 'drop'.
+        """
+        self.communicator = communicator
+        self.channel = channel
+        self.is_priority_queue = is_priority_queue
+        self.limiter = limiter
+        self.batch_size = batch_size
+        self.linger = linger
+        self.undeliverable = undeliverable
+        self.batch = []
+        self.linger_timer = None
+        self.recorded = 0
+        self.lock = Lock()
 
-    This class is based on thread-safe FIFO queue standard Python
-    implementation and was designed thread-safe by Zhen Wang.
+    def add(self, channel, message, _id, reason, dropped=0):
+        """
+        Record a lost message, see PubSubBase.dead_letter_().
+        """
+        if not self.limiter.acquire():
+            return
+        record = {'channel': channel, 'id': _id, 'reason': reason,
+                  'timestamp': time(), 'data': message, 'dropped': dropped}
+        with self.lock:
+            self.recorded += 1
+            self.batch.append((record, 100))
+            if len(self.batch) < self.batch_size:
+                if self.linger is not None and self.linger_timer is None:
+                    self.linger_timer = \
+                        self.communicator.get_scheduler_().call_later(
+                            self.linger, self.flush)
+                return
+            batch = self.take_()
+        self.publish_(batch)
+
+    def flush(self):
+        """
+        Publish dead letters waiting.
+        """
+        with self.lock:
+            batch = self.take_()
+        self.publish_(batch)
+
+    def take_(self):
+        """
+        Return waiting dead letters, self.lock must be held.
+        """
+        if self.linger_timer is not None:
+            self.linger_timer.cancel()
+            self.linger_timer = None
+        batch, self.batch = self.batch, []
+        return batch
+
+    def publish_(self, batch):
+        """
+        Publish dead letters without dispatcher nor channel rate limit :
+        they are already limited and a dispatcher thread may be the
+        one recording them.
+        """
+        if batch:
+            self.communicator.deliver_batch_(self.channel, batch,
+                                             self.is_priority_queue)
+
+    def stats(self):
+        """
+        Return a dictionary with dead letter channel name, number of
+        dead letters recorded and number ignored by the rate limit.
+        """
+        return {'channel': self.channel, 'recorded': self.recorded,
+                'dropped': self.limiter.stats()['dropped']}
+
+
+class DedupWindow():
+    """
+    Recent dedup keys of a channel : bounded LRU with optional time
+    to live, see PubSubBase.set_dedup_window().
     """
 
-    def subscribe(self, channel):
+    def __init__(self, size=1000, ttl=None):
         """
-        Return a synchronised normal FIFO queue object
-        used by a subscriber to listen at messages sent
-        by publishers on a given channel.
+        See PubSubBase.set_dedup_window() for parameters
+        """
+        self.size = size
+        self.ttl = ttl
+        # key -> time when it was first published, oldest first
+        self.keys = collections.OrderedDict()
+        self.hits = 0
+        self.lock = Lock()
+        # True if created by PubSubBase.default_dedup_window_()
+        self.is_default = False
 
-        No problem if channel doesn't exists yet.
-        See  PubSubBase.subscribe() for more details
-        Parameter:
-        - channel : the channel to listen to.
+    def seen(self, key):
+        """
+        Return True if key is in the window, else add it.
+        """
+        now = monotonic()
+        with self.lock:
+            if self.ttl is not None:
+                while self.keys:
+                    oldest_key, first_time = next(iter(self.keys.items()))
+                    if now - first_time < self.ttl:
+                        break
+                    del self.keys[oldest_key]
+            if key in self.keys:
+                self.hits += 1
+                return True
+            self.keys[key] = now
+            if len(self.keys) > self.size:
+                self.keys.popitem(last=False)
+            return False
+
+    def forget(self, key):
         """
-        return self.subscribe_(channel, False)
+        Remove key from the window.
+        """
+        with self.lock:
+            self.keys.pop(key, None)
 
-    def publish(self, channel, message):
+    def stats(self):
         """
-        See  PubSubBase.publish() for more details
+        Return a dictionary with window parameters, number of keys
+        remembered and number of duplicates ignored.
         """
-        self.publish_(channel, message, False, priority=100)
+        return {'size': self.size, 'ttl': self.ttl, 'keys': len(self.keys),
+                'hits': self.hits}
 
 
-class PubSubPriority(PubSubBase):
+class Watermark():
+    """
+    High and low watermarks of a channel, see PubSubBase.set_watermarks().
+    The level of a channel is the number of messages waiting in its
+    slowest subscriber queue.
     """
-    Same as PubSub class but deal with messages priorities.
-    Send registred messages in priority order (lowest first)
-    For limitations, see  PubSub __init__() constructor parameters and
-    default values.
 
-    This class is based on thread-safe FIFO PriorityQueue Python
-    implementation.
+    def __init__(self, communicator, channel, high, low, on_high=None,
+                 on_low=None):
+        """
+        See PubSubBase.set_watermarks() for parameters
+        """
+        self.communicator = communicator
+        self.channel = channel
+        self.high = high
+        self.low = low
+        self.on_high = on_high
+        self.on_low = on_low
+        # Set when publishers can publish
+        self.writable = Event()
+        self.writable.set()
+        self.lock = Lock()
+
+    def level(self, subscriber_refs=None):
+        """
+        Return the number of messages waiting in the slowest
+        subscriber queue of the channel.
+        """
+        if subscriber_refs is None:
+            subscriber_refs = self.communicator.channels.get(self.channel,
+                                                             ())
+        level = 0
+        for subscriber_ref in subscriber_refs:
+            channel_queue = subscriber_ref()
+            if channel_queue is not None:
+                level = max(level, channel_queue.qsize())
+        return level
+
+    def wait_writable(self, timeout=None):
+        """
+        Wait until the channel is writable.
+        Return False if timeout expired before.
+        """
+        return self.writable.wait(timeout)
+
+    def stats(self):
+        """
+        Return a dictionary with watermarks, current level
+        and writable state.
+        """
+        return {'high': self.high, 'low': self.low, 'level': self.level(),
+                'writable': self.writable.is_set()}
+
+    def check_high_(self, subscriber_refs=None):
+        """
+        Called after a publication : block channel if high is reached.
+        No publish lock must be held, see PubSubBase.check_watermark_().
+        """
+        if not self.writable.is_set():
+            return
+        level = self.level(subscriber_refs)
+        if level < self.high:
+            return
+        with self.lock:
+            if not self.writable.is_set():
+                return
+            self.writable.clear()
+            # A subscriber may have emptied its queue before clear() :
+            # its check_low_() saw the channel writable and did nothing.
+            if self.level() <= self.low:
+                self.writable.set()
+                return
+        if self.on_high is not None:
+            self.on_high(self.channel, level)
+
+    def check_low_(self):
+        """
+        Called after messages are taken by a subscriber :
+        unblock channel if level is low again.
+        """
+        if self.writable.is_set():
+            return
+        level = self.level()
+        if level > self.low:
+            return
+        with self.lock:
+            if self.writable.is_set():
+                return
+            self.writable.set()
+        if self.on_low is not None:
+            self.on_low(self.channel, level)
+
+
+class Profiler():
+    """
+    Time measures of a communicator, see PubSubBase.set_profiler() :
+    - fan out : time spent by publishers putting messages in the
+        subscriber queues of each channel, wall clock and CPU time of
+        the publisher thread (time waiting for locks is not CPU time).
+    - consumers : time spent by each subscriber between taking
+        messages with listen() or get_batch() and asking for the next
+        ones. A subscriber calling next(listen()) once per message is
+        measured between its calls, the time after its last message
+        is counted when it asks for messages again.
     """
 
-    def subscribe(self, channel):
+    def __init__(self):
         """
-        Return a synchronised FIFO priority queue object
-        used by a subscriber to listen at messages sent
-        by publishers on a given channel.
+        Create an empty profiler.
+        """
+        # channel -> [publications, messages, wall time, CPU time]
+        self.channels = {}
+        # subscriber queue -> [messages, processing time]
+        self.consumers = weakref.WeakKeyDictionary()
+        self.lock = Lock()
 
-        No problem if channel doesn't exists yet.
-        See  PubSubBase.subscribe_() for more details
-        Parameter:
-        - channel : the channel to listen to.
+    def fan_out_(self, channel, messages, wall_time, cpu_time):
+        """
+        Count a publication of messages on channel.
+        """
+        with self.lock:
+            measures = self.channels.get(channel)
+            if measures is None:
+                measures = self.channels[channel] = [0, 0, 0., 0.]
+            measures[0] += 1
+            measures[1] += messages
+            measures[2] += wall_time
+            measures[3] += cpu_time
+
+    def taken_(self, message_queue, messages=1):
+        """
+        Count messages taken by the subscriber of message_queue.
+        """
+        with self.lock:
+            measures = self.consumers.get(message_queue)
+            if measures is None:
+                measures = self.consumers[message_queue] = [0, 0.]
+            measures[0] += messages
+
+    def consumed_(self, message_queue):
+        """
+        Called when the subscriber of message_queue asks for messages :
+        count the time spent since it got the previous ones.
+        """
+        taken_at = message_queue.taken_at
+        if taken_at is None:
+            return
+        message_queue.taken_at = None
+        processing_time = perf_counter() - taken_at
+        with self.lock:
+            measures = self.consumers.get(message_queue)
+            if measures is None:
+                measures = self.consumers[message_queue] = [0, 0.]
+            measures[1] += processing_time
+
+    def report(self, top=10):
+        """
+        Return a dictionary with the most expensive channels and
+        subscribers, slowest first :
+        - 'channels' : list of at most top dictionaries
+            {'channel', 'publications', 'messages', 'wall_time',
+            'cpu_time'} sorted by wall_time.
+        - 'consumers' : list of at most top dictionaries
+            {'channel', 'queue', 'messages', 'processing_time',
+            'mean_time'} sorted by processing_time, queue is the
+            subscriber queue object.
+        Times are in seconds. top : None for all entries.
+        """
+        with self.lock:
+            channels = [{'channel': channel, 'publications': measures[0],
+                         'messages': measures[1], 'wall_time': measures[2],
+                         'cpu_time': measures[3]}
+                        for channel, measures in self.channels.items()]
+            consumers = [{'channel': message_queue.name,
+                          'queue': message_queue, 'messages': measures[0],
+                          'processing_time': measures[1],
+                          'mean_time': measures[1] / max(measures[0], 1)}
+                         for message_queue, measures
+                         in self.consumers.items()]
+        channels.sort(key=lambda entry: entry['wall_time'], reverse=True)
+        consumers.sort(key=lambda entry: entry['processing_time'],
+                       reverse=True)
+        return {'channels': channels[:top], 'consumers': consumers[:top]}
+
+    def reset(self):
+        """
+        Forget all measures.
+        """
+        with self.lock:
+            self.channels.clear()
+            self.consumers.clear()
+
+
+class Codec():
+    """
+    Compression of message batches, see PubSubBase.set_codec() :
+    a batch is pickled then compressed as one frame, so that
+    compressors find what is repeated between messages.
+    Can be shared by many threads.
+    Warning : decode() unpickles frames, never decode a frame
+    from an untrusted source.
+    """
+
+    METHODS = ('zlib', 'lzma')
+
+    def __init__(self, method='zlib', level=None, zdict=None):
+        """
+        See PubSubBase.set_codec() for parameters
+        """
+        if method not in Codec.METHODS:
+            raise ValueError(f'method must be one of {Codec.METHODS}')
+        if method == 'lzma' and lzma is None:
+            raise ImportError('lzma : module not available')
+        if zdict is not None and method != 'zlib':
+            raise ValueError('zdict : only for zlib')
+        if level is not None and not 0 <= level <= 9:
+            raise ValueError('level must be between 0 and 9')
+        self.method = method
+        self.level = level
+        self.zdict = zdict
+        self.frames = 0
+        self.messages = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.encode_time = 0.
+        self.decode_time = 0.
+        self.lock = Lock()
+
+    @staticmethod
+    def train(samples, size=32768):
+        """
+        Return a zlib dictionary (zdict parameter) of at most size bytes
+        made of the pickled sample messages : identical samples are
+        kept once, last ones are preferred by zlib.
+        """
+        if size < 1:
+            raise ValueError('size must be >= 1')
+        pickled_samples = dict.fromkeys(
+            pickle.dumps(sample, pickle.HIGHEST_PROTOCOL)
+            for sample in samples)
+        return b''.join(pickled_samples)[-size:]
+
+    def config_(self):
+        """
+        Return (method, level, zdict) to create this codec again.
+        """
+        return (self.method, self.level, self.zdict)
+
+    def encode(self, messages):
+        """
+        Return a frame : bytes of the list of messages compressed.
+        """
+        messages = list(messages)
+        data = pickle.dumps(messages, pickle.HIGHEST_PROTOCOL)
+        start_cpu = thread_time()
+        if self.method == 'lzma':
+            frame = lzma.compress(data, preset=self.level)
+        else:
+            level = -1 if self.level is None else self.level
+            if self.zdict is None:
+                frame = zlib.compress(data, level)
+            else:
+                compressor = zlib.compressobj(level, zdict=self.zdict)
+                frame = compressor.compress(data) + compressor.flush()
+        cpu_time = thread_time() - start_cpu
+        with self.lock:
+            self.frames += 1
+            self.messages += len(messages)
+            self.raw_bytes += len(data)
+            self.compressed_bytes += len(frame)
+            self.encode_time += cpu_time
+        return frame
+
+    def decode(self, frame):
+        """
+        Return the list of messages of a frame made by encode().
+        Frames are unpickled : frame must come from a trusted source,
+        see PubSubBase.set_codec().
+        """
+        start_cpu = thread_time()
+        if self.method == 'lzma':
+            data = lzma.decompress(frame)
+        elif self.zdict is None:
+            data = zlib.decompress(frame)
+        else:
+            decompressor = zlib.decompressobj(zdict=self.zdict)
+            data = decompressor.decompress(frame) + decompressor.flush()
+        cpu_time = thread_time() - start_cpu
+        with self.lock:
+            self.decode_time += cpu_time
+        return pickle.loads(data)
+
+    def stats(self):
+        """
+        Return a dictionary comparing bytes saved and CPU time spent :
+        method, frames and messages encoded, raw_bytes (pickled) and
+        compressed_bytes sizes, ratio raw_bytes / compressed_bytes,
+        encode_time and decode_time CPU seconds spent compressing and
+        decompressing.
+        """
+        with self.lock:
+            return {'method': self.method, 'frames': self.frames,
+                    'messages': self.messages, 'raw_bytes': self.raw_bytes,
+                    'compressed_bytes': self.compressed_bytes,
+                    'ratio': (self.raw_bytes / self.compressed_bytes
+                              if self.compressed_bytes else None),
+                    'encode_time': self.encode_time,
+                    'decode_time': self.decode_time}
+
+
+class TokenBucket():
+    """
+    Token bucket rate limiter : tokens are added at rate per second
+    up to burst tokens, each message consumes one token.
+    Can be shared by many threads.
+
+    Used for channel limits (see PubSubBase.set_rate_limit()) or given
+    to publish() with rate_limiter option to limit a publisher.
+    """
+
+    POLICIES = ('block', 'reject', 'drop')
+
+    def __init__(self, rate, burst=None, policy='block'):
+        """
+        Parameters :
+        - rate : number of tokens added per second, > 0
+        - burst : maximum number of tokens, default value : max(rate, 1)
+        - policy : 'block', 'reject' or 'drop',
+            see PubSubBase.set_rate_limit()
+        """
+        if rate <= 0:
+            raise ValueError('rate must be > 0')
+        if burst is None:
+            burst = max(rate, 1)
+        if burst < 1:
+            raise ValueError('burst must be >= 1')
+        if policy not in self.POLICIES:
+            raise ValueError(f'policy must be one of {self.POLICIES}')
+        self.rate = rate
+        self.burst = burst
+        self.policy = policy
+        self.tokens = burst
+        self.last_time = monotonic()
+        self.lock = Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.blocked_time = 0.0
+
+    def refill_(self):
+        """
+        Add tokens earned since last call, self.lock must be held.
         """
+        now = monotonic()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
 
-        return self.subscribe_(channel, True)
+    def acquire(self):
+        """
+        Consume one token.
+        Return True if the message can be published,
+        False if it must be dropped.
+        Raise RateLimitExceeded with policy 'reject'.
+        Wait for a token with policy 'block'.
+        """
+        with self.lock:
+            self.refill_()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.accepted += 1
+                return True
+            if self.policy == 'drop':
+                self.dropped += 1
+                return False
+            if self.policy == 'reject':
+                self.rejected += 1
+                raise RateLimitExceeded(
+                    f'Rate limit exceeded : {self.rate} messages/s')
+            # Reserve the next token : tokens become negative
+            # so that concurrent publishers wait their turn.
+            self.tokens -= 1
+            self.accepted += 1
+            wait = -self.tokens / self.rate
+            self.blocked_time += wait
+        sleep(wait)
+        return True
+
+    def stats(self):
+        """
+        Return a dictionary with limiter parameters, current tokens
+        and counters of accepted, rejected and dropped messages
+        and total time publishers were blocked.
+        """
+        with self.lock:
+            self.refill_()
+            return {'rate': self.rate, 'burst': self.burst,
+                    'policy': self.policy, 'tokens': self.tokens,
+                    'accepted': self.accepted, 'rejected': self.rejected,
+                    'dropped': self.dropped,
+                    'blocked_time': self.blocked_time}
+
+
+class Dispatcher():
+    """
+    Threads putting published messages in subscriber queues
+    for communicators created with dispatch_threads > 0 :
+    publish() only puts a task in the inbox of the thread serving
+    the channel.
+    """
+
+    def __init__(self, threads, queue_size, policy,
+                 name='pubsub-dispatcher'):
+        """
+        See PubSubBase.__init__() dispatch_* parameters
+        - name : prefix of the thread names
+        """
+        if policy not in TokenBucket.POLICIES:
+            raise ValueError(
+                f'dispatch_policy must be one of {TokenBucket.POLICIES}')
+        self.policy = policy
+        self.dropped = 0
+        self.dropped_lock = Lock()
+        self.closed = False
+        self.inboxes = [Queue(maxsize=queue_size) for _ in range(threads)]
+        # Held while a task is put in the inbox of same index :
+        # close() takes them all, no task is put after its sentinel
+        self.inbox_locks = [Lock() for _ in range(threads)]
+        self.threads = [Thread(target=self.run, args=(inbox,),
+                               name=f'{name}-{index}',
+                               daemon=True)
+                        for index, inbox in enumerate(self.inboxes)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, channel, function, args):
+        """
+        Call function(*args) in the thread serving channel.
+        Return False if task was dropped because inbox is full.
+        """
+        index = hash(channel) % len(self.inboxes)
+        inbox = self.inboxes[index]
+        with self.inbox_locks[index]:
+            if self.closed:
+                raise RuntimeError('dispatcher closed')
+            if self.policy == 'block':
+                inbox.put((function, args))
+                return True
+            try:
+                inbox.put_nowait((function, args))
+                return True
+            except Full:
+                if self.policy == 'reject':
+                    raise
+        with self.dropped_lock:
+            self.dropped += 1
+        warnings.warn(f"Dispatcher overload for channel {channel}, "
+                      "message dropped")
+        return False
+
+    @staticmethod
+    def run(inbox):
+        """
+        Dispatcher thread main loop, stops on a None task.
+        """
+        while True:
+            task = inbox.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                try:
+                    function(*args)
+                except Exception as exc:  # pylint: disable=broad-except
+                    warnings.warn(f'Dispatch failed : {exc!r}')
+            finally:
+                inbox.task_done()
+
+    def join(self):
+        """
+        Wait until all submitted tasks are done.
+        """
+        for inbox in self.inboxes:
+            inbox.join()
+
+    def close(self, wait=True):
+        """
+        Stop threads when they have done submitted tasks.
+        Parameter :
+        - wait : True to wait for threads end.
+        """
+        for lock in self.inbox_locks:
+            lock.acquire()
+        try:
+            if self.closed:
+                return
+            self.closed = True
+            for inbox in self.inboxes:
+                inbox.put(None)
+        finally:
+            for lock in self.inbox_locks:
+                lock.release()
+        if wait:
+            for thread in self.threads:
+                if thread is not current_thread():
+                    thread.join()
+
+    def stats(self):
+        """
+        Return a dictionary with the number of tasks waiting
+        in inboxes and the number of dropped tasks.
+        """
+        return {'threads': len(self.threads),
+                'backlog': sum(inbox.qsize() for inbox in self.inboxes),
+                'dropped': self.dropped}
+
+
+class WheelTimer():
+    """
+    A callback registered in a TimerWheel.
+    """
+
+    __slots__ = ('expires', 'callback', 'args', 'kwargs', 'slot',
+                 'scheduler')
+
+    def __init__(self, expires, callback, args, kwargs):
+        """
+        Parameters :
+        - expires : tick number when callback must be called
+        - callback, args, kwargs : function called with its arguments
+        """
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        # Set of the wheel slot containing this timer
+        self.slot = None
+        # TimerScheduler owning this timer
+        self.scheduler = None
+
+    def cancel(self):
+        """
+        Cancel this timer in O(1).
+        Return True if it was pending, False if it was already
+        called or canceled.
+        """
+        if self.scheduler is None:
+            return False
+        return self.scheduler.cancel(self)
+
+
+class TimerWheel():
+    """
+    Hierarchical timing wheel (like Linux kernel timers) :
+    levels of slots, level 0 slots contain timers expiring
+    in the next slots ticks, level 1 slots contain timers
+    expiring in the next slots**2 ticks...
+    When level 0 completes a turn, the next level 1 slot is cascaded
+    in level 0, and so on.
+    Adding or removing a timer is O(1) whatever the number of timers.
+    Not thread-safe, see TimerScheduler.
+    """
+
+    def __init__(self, slot_bits=6, levels=4):
+        """
+        Parameters :
+        - slot_bits : log2 of the number of slots per level
+        - levels : number of levels, timers beyond
+            2**(slot_bits * levels) ticks are cascaded again
+        """
+        self.slot_bits = slot_bits
+        self.slot_mask = (1 << slot_bits) - 1
+        self.max_delta = 1 << (slot_bits * levels)
+        self.wheels = [[set() for _ in range(1 << slot_bits)]
+                       for _ in range(levels)]
+        self.current_tick = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, timer):
+        """
+        Add a timer, it expires at the next tick at least.
+        """
+        self.place_(timer, max(timer.expires, self.current_tick + 1))
+
+    def place_(self, timer, expires):
+        """
+        Put a timer in the slot of tick expires.
+        """
+        delta = min(expires - self.current_tick, self.max_delta - 1)
+        expires = self.current_tick + delta
+        level = 0
+        while delta >> (self.slot_bits * (level + 1)):
+            level += 1
+        index = (expires >> (self.slot_bits * level)) & self.slot_mask
+        timer.slot = self.wheels[level][index]
+        timer.slot.add(timer)
+        self.count += 1
+
+    def remove(self, timer):
+        """
+        Remove a timer added before.
+        Return False if timer was not in the wheel.
+        """
+        if timer.slot is None:
+            return False
+        timer.slot.discard(timer)
+        timer.slot = None
+        self.count -= 1
+        return True
+
+    def advance(self):
+        """
+        Go to next tick and return the list of timers expiring.
+        """
+        self.current_tick += 1
+        level = 1
+        # Cascade higher levels when lower level completed a turn
+        while (level < len(self.wheels) and
+               not (self.current_tick >>
+                    (self.slot_bits * (level - 1))) & self.slot_mask):
+            index = ((self.current_tick >> (self.slot_bits * level)) &
+                     self.slot_mask)
+            cascaded = self.wheels[level][index]
+            self.wheels[level][index] = set()
+            for timer in cascaded:
+                self.count -= 1
+                # Timers expiring now go to current slot
+                self.place_(timer, max(timer.expires, self.current_tick))
+            level += 1
+        slot = self.wheels[0][self.current_tick & self.slot_mask]
+        expired = list(slot)
+        slot.clear()
+        for timer in expired:
+            timer.slot = None
+        self.count -= len(expired)
+        return expired
 
-    def publish(self, channel, message, priority=100):
+    def next_event_tick(self):
         """
-        See PubSubBase.publish() for more details
+        Return the next tick when a timer may expire or a cascade
+        occurs : no need to advance the wheel before it.
         """
-        self.publish_(channel, message, True, priority)
+        level_0 = self.wheels[0]
+        next_boundary = ((self.current_tick >> self.slot_bits) + 1) << \
+            self.slot_bits
+        for tick in range(self.current_tick + 1, next_boundary):
+            if level_0[tick & self.slot_mask]:
+                return tick
+        return next_boundary
+
+
+class TimerScheduler():
+    """
+    Call functions after a delay with a single thread for all of them.
+    Timers are stored in a TimerWheel, the thread sleeps until
+    the next tick where something must be done.
+    """
+
+    def __init__(self, tick=0.01):
+        """
+        Parameter :
+        - tick : resolution in seconds
+        """
+        self.tick = tick
+        self.wheel = TimerWheel()
+        self.start_time = monotonic()
+        self.condition = Condition(Lock())
+        self.thread = None
+        self.closed = False
+
+    def __len__(self):
+        return len(self.wheel)
+
+    def tick_of_(self, when):
+        """
+        Return the tick number of monotonic time when.
+        """
+        return int((when - self.start_time) / self.tick)
+
+    def call_later(self, delay, callback, *args, **kwargs):
+        """
+        Call callback(*args, **kwargs) in the scheduler thread after
+        delay seconds (rounded up to the next tick).
+        Return a WheelTimer object to cancel the call.
+        """
+        expires = self.tick_of_(monotonic() + max(delay, 0)) + 1
+        timer = WheelTimer(expires, callback, args, kwargs)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('scheduler closed')
+            if not self.wheel.count:
+                # Wheel is idle : no need to advance it tick by tick
+                self.wheel.current_tick = self.tick_of_(monotonic())
+            timer.scheduler = self
+            self.wheel.add(timer)
+            if self.thread is None:
+                self.thread = Thread(target=self.run, name='pubsub-timers',
+                                     daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel a timer returned by call_later().
+        """
+        with self.condition:
+            timer.scheduler = None
+            return self.wheel.remove(timer)
+
+    def close(self):
+        """
+        Stop scheduler thread, pending timers are canceled.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def run(self):
+        """
+        Scheduler thread main loop.
+        """
+        while True:
+            with self.condition:
+                expired = self.wait_expired_()
+                if expired is None:
+                    return
+            for timer in expired:
+                try:
+                    timer.callback(*timer.args, **timer.kwargs)
+                except Exception as exc:  # pylint: disable=broad-except
+                    warnings.warn(f'Scheduled call failed : {exc!r}')
+
+    def wait_expired_(self):
+        """
+        Wait for expired timers, self.condition must be held.
+        Return the list of expired timers or None if scheduler closed.
+        """
+        while not self.closed:
+            if not self.wheel.count:
+                self.condition.wait()
+                continue
+            next_tick = self.wheel.next_event_tick()
+            wait = (self.start_time + next_tick * self.tick -
+                    monotonic())
+            if wait > 0:
+                self.condition.wait(wait)
+                continue
+            expired = []
+            now_tick = self.tick_of_(monotonic())
+            while self.wheel.current_tick < now_tick and self.wheel.count:
+                expired.extend(self.wheel.advance())
+            for timer in expired:
+                timer.scheduler = None
+            if expired:
+                return expired
+        return None
+
+
+def _signal_fd(write_fd, read_fd):
+    """
+    Make a readiness file descriptor readable.
+    """
+    if write_fd == read_fd:
+        os.eventfd_write(write_fd, 1)
+    else:
+        os.write(write_fd, b'\x01')
+
+
+def _clear_fd(read_fd):
+    """
+    Consume the signal written by _signal_fd().
+    """
+    try:
+        os.read(read_fd, 8)
+    except BlockingIOError:
+        pass
+
+
+def _close_fds(read_fd, write_fd):
+    """
+    Close readiness file descriptors of a queue.
+    """
+    os.close(read_fd)
+    if write_fd != read_fd:
+        os.close(write_fd)
+
+
+@functools.lru_cache(maxsize=None)
+def _array_dtype(dtype):
+    """
+    Return the numpy dtype of the (id, timestamp, data) rows
+    of a typed channel whose messages are of type dtype.
+    """
+    return numpy.dtype([('id', numpy.int64), ('timestamp', numpy.float64),
+                        ('data', dtype)])
+
+
+def _release_charges(charges):
+    """
+    Release the bytes still counted in byte budgets for the messages
+    of a subscriber queue garbage collected, see ChanelQueueMixin.charge_()
+    """
+    for budget, size in charges.items():
+        if size:
+            budget.release(size)
+    charges.clear()
+
+
+def _expire_leases(queue_ref):
+    """
+    Timer callback of ChanelQueueMixin.arm_lease_timer_() : the queue
+    is weakly referenced so that an abandoned queue is still collected.
+    """
+    channel_queue = queue_ref()
+    if channel_queue is not None:
+        channel_queue.expire_leases_()
+
+
+def _write_record(snapshot_file, record):
+    """
+    Write a length prefixed pickle record in a snapshot file.
+    """
+    data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+    snapshot_file.write(struct.pack('>I', len(data)))
+    snapshot_file.write(data)
+
+
+def _read_records(path):
+    """
+    Generator of the records of a snapshot file, read one by one.
+    """
+    with open(path, 'rb') as snapshot_file:
+        if snapshot_file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} : not a snapshot file')
+        while True:
+            header = snapshot_file.read(4)
+            if not header:
+                return
+            if len(header) < 4:
+                raise ValueError(f'{path} : truncated snapshot file')
+            size, = struct.unpack('>I', header)
+            data = snapshot_file.read(size)
+            if len(data) < size:
+                raise ValueError(f'{path} : truncated snapshot file')
+            yield pickle.loads(data)
 
 
 class OrderedDict(dict):
@@ -447,3 +4183,11 @@ class OrderedDict(dict):
         given in parameter.
         """
         return self['id'] < other['id']
+
+    def __getstate__(self):
+        """
+        For pickle : byte budgets counted are not saved.
+        """
+        state = dict(self.__dict__)
+        state.pop('budgets', None)
+        return state
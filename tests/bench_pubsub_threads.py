@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    bench_pubsub_threads.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Benchmark of publish and listen throughput with 1 to N threads,
+          each thread publishing on its own channel and draining its
+          subscriber queue with get_batch().
+          On free-threaded Python builds (python3.13t and later, GIL
+          disabled) throughput should grow with the number of threads,
+          with the GIL it stays flat.
+          Not a test case : run it with
+          python tests/bench_pubsub_threads.py [--messages N] [--threads N]
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import os
+import sys
+import argparse
+import threading
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pubsub import PubSub, PubSubPriority  # noqa: E402 pylint: disable=C0413
+
+# Messages published before the subscriber queue is drained
+BATCH = 500
+
+
+def worker(communicator, channel, nb_messages, barrier, errors):
+    """
+    Publish nb_messages on channel and check that its subscriber
+    gets them all, in id order.
+    """
+    message_queue = communicator.subscribe(channel)
+    publisher = communicator.publisher(channel)
+    next_id = 0
+    barrier.wait()
+    for counter in range(nb_messages):
+        publisher.publish(counter + 1)
+        if (counter + 1) % BATCH == 0 or counter + 1 == nb_messages:
+            for msg in message_queue.get_batch(block=False):
+                if msg['id'] != next_id:
+                    errors.append(f"{channel} : id {msg['id']} "
+                                  f"instead of {next_id}")
+                next_id += 1
+    if next_id != nb_messages:
+        errors.append(f"{channel} : {next_id} messages "
+                      f"instead of {nb_messages}")
+    message_queue.unsubscribe()
+
+
+def run(class_2_test, nb_threads, nb_messages):
+    """
+    Return the number of messages per second published and received
+    by nb_threads threads.
+    """
+    communicator = class_2_test(max_queue_in_a_channel=BATCH)
+    barrier = threading.Barrier(nb_threads + 1)
+    errors = []
+    threads = [threading.Thread(target=worker,
+                                args=(communicator, f'channel {index}',
+                                      nb_messages, barrier, errors))
+               for index in range(nb_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    if errors:
+        raise AssertionError('\n'.join(errors[:10]))
+    return nb_threads * nb_messages / elapsed
+
+
+def main():
+    """
+    Run the benchmark for both communicator classes.
+    """
+    parser = argparse.ArgumentParser(
+        description='Publish and listen throughput by number of threads')
+    parser.add_argument('--messages', type=int, default=50000,
+                        help='messages published by each thread')
+    parser.add_argument('--threads', type=int,
+                        default=min(os.cpu_count() or 1, 8),
+                        help='maximum number of threads')
+    args = parser.parse_args()
+
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]}, "
+          f"GIL {'enabled' if is_gil_enabled else 'disabled'}, "
+          f"{os.cpu_count()} CPU")
+    thread_counts = [1]
+    while thread_counts[-1] * 2 <= args.threads:
+        thread_counts.append(thread_counts[-1] * 2)
+    if thread_counts[-1] != args.threads:
+        thread_counts.append(args.threads)
+
+    for class_2_test in (PubSub, PubSubPriority):
+        print(class_2_test.__name__)
+        reference = None
+        for nb_threads in thread_counts:
+            throughput = run(class_2_test, nb_threads, args.messages)
+            reference = reference or throughput
+            print(f"  {nb_threads:3d} threads : {throughput:12,.0f} msg/s"
+                  f"  speedup x{throughput / reference:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_ack.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for at-least-once delivery mode with pytest
+          Messages not acknowledged in time are delivered again.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import time
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, Lease
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_ack_lease(class_2_test):
+    """
+    Test that listen() returns leases and acknowledged
+    messages are not delivered again
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test', ack_timeout=0.05)
+    communicator.publish('test', 'hello world')
+
+    lease = next(message_queue.listen(block=False))
+    assert isinstance(lease, Lease)
+    assert lease['data'] == 'hello world'
+    assert lease['id'] == 0
+    assert message_queue.in_flight_count() == 1
+
+    assert lease.ack()
+    assert message_queue.in_flight_count() == 0
+    # Second ack is ignored
+    assert not lease.ack()
+
+    time.sleep(0.1)
+    assert not list(message_queue.listen(block=False))
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_ack_redelivery(class_2_test):
+    """
+    Test that a message not acknowledged is delivered again
+    after ack_timeout
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test', ack_timeout=0.05)
+    communicator.publish('test', 'hello world 1')
+    communicator.publish('test', 'hello world 2')
+
+    leases = list(message_queue.listen(block=False))
+    assert [lease['data'] for lease in leases] == ['hello world 1',
+                                                   'hello world 2']
+    leases[1].ack()
+
+    # Crash simulation : first message is never acknowledged
+    # Blocking listen waits for lease expiration
+    lease = next(message_queue.listen(timeout=1.0))
+    assert lease['data'] == 'hello world 1'
+    assert lease['id'] == 0
+    assert lease.token != leases[0].token
+    lease.ack()
+    assert not list(message_queue.listen(timeout=0.1))
+
+
+def test_ack_batch():
+    """
+    Test acknowledgement of many leases at once
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test', ack_timeout=60)
+    for counter in range(10):
+        communicator.publish('test', 'hello world ' + str(counter))
+
+    leases = list(message_queue.listen(block=False))
+    assert len(leases) == 10
+    assert message_queue.ack(leases[:8]) == 8
+    assert message_queue.ack(leases) == 2
+    assert message_queue.in_flight_count() == 0
+
+
+def test_ack_heap_purge():
+    """
+    Test that acknowledged leases don't stay in expiration heap
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=1000)
+    message_queue = communicator.subscribe('test', ack_timeout=60)
+    for counter in range(500):
+        communicator.publish('test', 'hello world ' + str(counter))
+    for lease in message_queue.listen(block=False):
+        lease.ack()
+    assert len(message_queue.in_flight_heap) <= 64
+
+
+def test_exception_ack_timeout():
+    """
+    Test exceptions and messages for ack_timeout parameter
+    """
+
+    communicator = PubSub()
+    with pytest.raises(ValueError, match='ack_timeout must be > 0'):
+        communicator.subscribe('test', ack_timeout=0)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_backpressure.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for delivery results returned by publish()
+          and channel watermarks
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import gc
+import threading
+import warnings
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, DeliveryResult
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_delivery_result(class_2_test):
+    """
+    Test delivered and dropped counts returned by publish()
+    """
+
+    communicator = class_2_test(max_queue_in_a_channel=1)
+
+    channel = "test"
+
+    assert communicator.publish(channel, 'nobody') == (0, 0)
+
+    message_queue1 = communicator.subscribe(channel)
+    message_queue2 = communicator.subscribe(channel)
+    assert communicator.publish(channel, 'hello 1') == \
+        DeliveryResult(delivered=2, dropped=0)
+
+    list(message_queue1.listen(block=False))
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        result = communicator.publish(channel, 'hello 2')
+    assert result.delivered == 1
+    assert result.dropped == 1
+    assert len(list(message_queue2.listen(block=False))) == 1
+
+
+def test_delivery_result_publisher_and_rate_limit():
+    """
+    Test delivery results of Publisher handles and rate limits
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=3)
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel)
+    publisher = communicator.publisher(channel)
+    assert publisher.publish('hello 1') == (1, 0)
+
+    batch_publisher = communicator.publisher(channel, batch_size=3)
+    assert batch_publisher.publish('hello 2') is None
+    assert batch_publisher.publish('hello 3') is None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        assert batch_publisher.publish('hello 4') == (2, 1)
+    assert batch_publisher.flush() == (0, 0)
+
+    list(message_queue.listen(block=False))
+    communicator.set_rate_limit(channel, 1, policy='drop')
+    assert communicator.publish(channel, 'hello 5') == (1, 0)
+    assert communicator.publish(channel, 'hello 6') == (0, 1)
+
+
+def test_watermarks():
+    """
+    Test watermark callbacks and writable event
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    events = []
+    watermark = communicator.set_watermarks(
+        channel, high=3, low=1,
+        on_high=lambda channel, level: events.append(('high', level)),
+        on_low=lambda channel, level: events.append(('low', level)))
+
+    fast_queue = communicator.subscribe(channel)
+    slow_queue = communicator.subscribe(channel)
+
+    for index in range(2):
+        communicator.publish(channel, f'hello {index}')
+    assert watermark.writable.is_set()
+    list(fast_queue.listen(block=False))
+
+    # Slowest subscriber reaches high watermark
+    communicator.publish(channel, 'hello 2')
+    assert events == [('high', 3)]
+    assert not watermark.wait_writable(timeout=0.01)
+    assert communicator.stats()['watermarks'][channel] == {
+        'high': 3, 'low': 1, 'level': 3, 'writable': False}
+
+    # Fast subscriber doesn't make channel writable
+    list(fast_queue.listen(block=False))
+    assert not watermark.writable.is_set()
+
+    next(slow_queue.listen(block=False))
+    assert events == [('high', 3)]
+    next(slow_queue.listen(block=False))
+    assert events == [('high', 3), ('low', 1)]
+    assert watermark.wait_writable(timeout=0)
+
+    assert communicator.set_watermarks(channel, None) is None
+    assert not communicator.stats()['watermarks']
+
+
+def test_watermarks_wait_writable():
+    """
+    Test a publisher waiting for a slow consumer in another thread
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=10)
+
+    channel = "test"
+
+    watermark = communicator.set_watermarks(channel, high=10, low=5)
+    message_queue = communicator.subscribe(channel)
+    received = []
+
+    def consumer():
+        for msg in message_queue.listen(timeout=5):
+            received.append(msg['id'])
+            if len(received) == 100:
+                return
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    for index in range(100):
+        assert watermark.wait_writable(timeout=5)
+        assert communicator.publish(channel, f'hello {index}') == (1, 0)
+    thread.join()
+    assert received == list(range(100))
+
+
+@pytest.mark.parametrize("batch_size, expected", [
+    (1, ['hello 1', 'hello 2', 'high 2', 'hello 3']),
+    (2, ['hello 1', 'hello 2', 'hello 3', 'high 3'])])
+def test_watermarks_callback_publish(batch_size, expected):
+    """
+    Test that on_high callback can publish on its channel :
+    publish locks are released before it is called
+    """
+
+    communicator = PubSub()
+    channel = "test"
+    message_queue = communicator.subscribe(channel)
+    communicator.set_watermarks(
+        channel, 2, on_high=lambda name, level: communicator.publish(
+            name, f'high {level}'))
+
+    def publisher():
+        communicator.publish(channel, 'hello 1')
+        with communicator.publisher(channel,
+                                    batch_size=batch_size) as handle:
+            handle.publish('hello 2')
+            handle.publish('hello 3')
+
+    thread = threading.Thread(target=publisher, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive(), 'publisher deadlocked in on_high'
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        expected
+
+
+def test_watermarks_drained_during_high():
+    """
+    Test that a queue emptied while the channel becomes not writable
+    doesn't leave it not writable forever
+    """
+
+    communicator = PubSub()
+    channel = "test"
+    events = []
+    watermark = communicator.set_watermarks(
+        channel, high=2, low=1,
+        on_high=lambda channel, level: events.append(('high', level)))
+    message_queue = communicator.subscribe(channel)
+    clear = watermark.writable.clear
+
+    def drain_then_clear():
+        # Subscriber takes the messages just before clear()
+        list(message_queue.listen(block=False))
+        clear()
+
+    watermark.writable.clear = drain_then_clear
+    communicator.publish(channel, 'hello 1')
+    communicator.publish(channel, 'hello 2')
+    assert message_queue.qsize() == 0
+    assert watermark.wait_writable(timeout=0)
+    assert not events
+
+
+@pytest.mark.parametrize("is_collected", [False, True])
+def test_watermarks_slow_subscriber_leaves(is_collected):
+    """
+    Test that a channel is writable again when its slowest subscriber
+    unsubscribes or is garbage collected
+    """
+
+    communicator = PubSub()
+    channel = "test"
+    events = []
+    watermark = communicator.set_watermarks(
+        channel, high=2, low=1,
+        on_low=lambda channel, level: events.append(('low', level)))
+    fast_queue = communicator.subscribe(channel)
+    slow_queue = communicator.subscribe(channel)
+    communicator.publish(channel, 'hello 1')
+    communicator.publish(channel, 'hello 2')
+    assert not watermark.writable.is_set()
+    list(fast_queue.listen(block=False))
+
+    if is_collected:
+        del slow_queue
+        gc.collect()
+        communicator.publish(channel, 'hello 3')
+    else:
+        slow_queue.unsubscribe()
+    assert watermark.wait_writable(timeout=0)
+    assert events and events[0][0] == 'low'
+
+
+def test_exception_watermarks():
+    """
+    Test exceptions and messages for set_watermarks()
+    """
+
+    communicator = PubSub()
+
+    with pytest.raises(ValueError, match='channel : None value not allowed'):
+        communicator.set_watermarks(None, 10)
+    with pytest.raises(ValueError,
+                       match='watermarks : 0 <= low < high required'):
+        communicator.set_watermarks('test', 10, low=10)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_bytes.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for byte budgets of subscriptions, channels
+          and communicators
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import gc
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, estimate_size
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_subscription_byte_budget(class_2_test):
+    """
+    Test that a subscription stops receiving messages when the size
+    of its waiting messages reaches max_bytes
+    """
+
+    communicator = class_2_test()
+
+    channel = "test"
+
+    small_queue = communicator.subscribe(channel, max_bytes=10)
+    other_queue = communicator.subscribe(channel)
+
+    assert communicator.publish(channel, b'12345678') == (2, 0)
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        assert communicator.publish(channel, b'abc') == (1, 1)
+    assert communicator.publish(channel, b'ab') == (2, 0)
+
+    assert small_queue.byte_budget.stats() == {'max_bytes': 10, 'bytes': 10,
+                                               'rejected': 1}
+    msgs = list(small_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == [b'12345678', b'ab']
+    assert msgs[0] == {'data': b'12345678', 'id': 0}
+    assert small_queue.byte_budget.bytes == 0
+    assert len(list(other_queue.listen(block=False))) == 3
+
+
+def test_channel_and_communicator_byte_budgets():
+    """
+    Test budgets shared by subscribers of a channel and by
+    all channels
+    """
+
+    communicator = PubSub(max_bytes=20)
+    budget = communicator.set_byte_budget('C1', 8)
+
+    queue_1a = communicator.subscribe('C1')
+    queue_1b = communicator.subscribe('C1')
+    queue_2 = communicator.subscribe('C2')
+
+    # 2 subscribers : 8 bytes for the channel
+    assert communicator.publish('C1', 'abcd') == (2, 0)
+    with pytest.warns(UserWarning, match='Queue overflow for channel C1'):
+        assert communicator.publish('C1', 'e') == (0, 2)
+    assert budget.bytes == 8
+
+    with pytest.warns(UserWarning, match='Queue overflow for channel C2'):
+        with communicator.publisher('C2', batch_size=3) as publisher:
+            for message in ('12345', '12345', '12345'):
+                publisher.publish(message)
+    assert queue_2.qsize() == 2
+    assert communicator.stats()['bytes'] == {'max_bytes': 20, 'bytes': 18,
+                                             'rejected': 1}
+
+    list(queue_1a.listen(block=False))
+    assert communicator.stats()['bytes_by_channel']['C1']['bytes'] == 4
+    list(queue_1b.listen(block=False))
+    list(queue_2.listen(block=False))
+    assert communicator.stats()['bytes']['bytes'] == 0
+
+    # Limit can be removed, sizes are still counted
+    communicator.set_byte_budget('C1', None)
+    communicator.publish('C1', 'abcdefgh')
+    assert budget.bytes == 16
+
+
+@pytest.mark.parametrize("leave", ['unsubscribe', 'drop'])
+def test_bytes_released_when_queue_leaves(leave):
+    """
+    Test that messages waiting in a queue unsubscribed or dropped
+    by its subscriber don't stay counted in byte budgets
+    """
+
+    communicator = PubSub(max_bytes=100)
+    budget = communicator.set_byte_budget('test', 100)
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', b'x' * 80)
+    assert communicator.stats()['bytes']['bytes'] == 80
+    if leave == 'unsubscribe':
+        message_queue.unsubscribe()
+        assert communicator.stats()['bytes']['bytes'] == 0
+        # Messages can still be taken, without releasing twice
+        assert len(message_queue.get_batch(block=False)) == 1
+    del message_queue
+    gc.collect()
+    assert communicator.stats()['bytes']['bytes'] == 0
+    assert budget.bytes == 0
+
+    message_queue = communicator.subscribe('test')
+    assert communicator.publish('test', b'x' * 80) == (1, 0)
+    assert message_queue.qsize() == 1
+
+
+def test_size_estimator():
+    """
+    Test default and custom size estimators
+    """
+
+    assert estimate_size(b'1234') == 4
+    assert estimate_size(bytearray(3)) == 3
+    assert estimate_size(memoryview(b'12345678').cast('I')) == 8
+    assert estimate_size('hello') == 5
+    assert estimate_size(12) > 0
+
+    communicator = PubSub(max_bytes=2, size_estimator=lambda message: 1)
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', {'big': 'x' * 1000})
+    communicator.publish('test', [1, 2, 3])
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        communicator.publish('test', 'three')
+    assert message_queue.qsize() == 2
+
+
+def test_exception_byte_budgets():
+    """
+    Test exceptions and messages for byte budgets
+    """
+
+    communicator = PubSub()
+    with pytest.raises(ValueError, match='max_bytes must be >= 0'):
+        communicator.subscribe('test', max_bytes=-1)
+    with pytest.raises(ValueError, match='max_bytes must be >= 0'):
+        communicator.set_byte_budget('test', -1)
+    with pytest.raises(ValueError, match='channel : None value not allowed'):
+        communicator.set_byte_budget(None, 10)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_channels.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for channels table management with pytest
+          Empty channels are removed and message counters
+          can be limited.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import threading
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_empty_channel_removed(class_2_test):
+    """
+    Test that a channel without subscriber is removed and that
+    its message ids continue by default
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello world 1')
+    message_queue.unsubscribe()
+    assert 'test' not in communicator.channels
+
+    communicator.publish('test', 'hello world 2')
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello world 3')
+    assert next(message_queue.listen(block=False))['id'] == 2
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_keep_channel_ids_false(class_2_test):
+    """
+    Test that channel counters are forgotten with its last subscriber
+    """
+
+    communicator = class_2_test(keep_channel_ids=False)
+    communicator.publish('nobody', 'hello world')
+    assert 'nobody' not in communicator.count
+
+    message_queue1 = communicator.subscribe('test')
+    message_queue2 = communicator.subscribe('test')
+    communicator.publish('test', 'hello world 1')
+    message_queue1.unsubscribe()
+    assert 'test' in communicator.count
+    message_queue2.unsubscribe()
+    assert not communicator.channels
+    assert not communicator.count
+
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello world 2')
+    assert next(message_queue.listen(block=False))['id'] == 0
+
+
+def test_no_counter_after_last_unsubscribe():
+    """
+    Test that a publication racing with the last unsubscribe()
+    doesn't create again the counter of the removed channel
+    """
+
+    communicator = PubSub(keep_channel_ids=False)
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello world')
+    message_queue.unsubscribe()
+
+    # Publisher checked the channel before unsubscribe()
+    assert communicator.next_ids_('test') is None
+    assert communicator.deliver_('test', 'hello world', False, 100) == \
+        (0, 0)
+    assert not communicator.count
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_max_channels(class_2_test):
+    """
+    Test LRU eviction of message counters of channels without subscriber
+    """
+
+    communicator = class_2_test(max_channels=3)
+    message_queue = communicator.subscribe('listened')
+    communicator.publish('listened', 'hello world')
+    for counter in range(10):
+        communicator.publish('session ' + str(counter), 'hello world')
+        assert len(communicator.count) <= 3
+
+    # Counter of channel with subscriber is never evicted
+    communicator.publish('listened', 'hello world')
+    assert [msg['id'] for msg in message_queue.listen(block=False)] == [0, 1]
+    assert list(communicator.count) == ['session 8', 'session 9',
+                                        'listened']
+
+
+class CountingLock():
+    """
+    Lock counting its acquisitions
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acquired = 0
+
+    def __enter__(self):
+        self.acquired += 1
+        return self.lock.__enter__()
+
+    def __exit__(self, *args):
+        return self.lock.__exit__(*args)
+
+
+@pytest.mark.parametrize("max_channels, expected", [(None, 1), (10, 3)])
+def test_counter_without_count_lock(max_channels, expected):
+    """
+    Test that count_lock is only taken to create a counter,
+    or for every message with max_channels
+    """
+
+    communicator = PubSub(max_channels=max_channels)
+    message_queue = communicator.subscribe('test')
+    communicator.count_lock = CountingLock()
+    for index in range(3):
+        communicator.publish('test', f'hello {index}')
+    assert communicator.count_lock.acquired == expected
+    assert [msg['id'] for msg in message_queue.listen(block=False)] == \
+        [0, 1, 2]
+
+
+def test_exception_max_channels():
+    """
+    Test exceptions and messages for max_channels parameter
+    """
+
+    with pytest.raises(ValueError, match='max_channels must be > 0'):
+        PubSub(max_channels=0)
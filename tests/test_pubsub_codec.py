@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_codec.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for set_codec() and Codec class
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import pytest
+
+import pubsub
+from pubsub import PubSub, PubSubPriority, Codec
+
+
+def sample_messages(count, start=0):
+    """
+    Return repetitive JSON like messages
+    """
+    return [{'sensor': f'temperature-{index % 4}', 'unit': 'celsius',
+             'site': 'north building', 'value': 20 + index % 7,
+             'status': 'ok'}
+            for index in range(start, start + count)]
+
+
+@pytest.mark.parametrize("method", ['zlib', 'lzma'])
+def test_codec_round_trip(method):
+    """
+    Test that a batch is encoded in one frame and decoded
+    """
+
+    if method == 'lzma' and pubsub.lzma is None:
+        pytest.skip('lzma module not available')
+    codec = Codec(method, level=6)
+    messages = sample_messages(100)
+    frame = codec.encode(messages)
+    assert isinstance(frame, bytes)
+    assert codec.decode(frame) == messages
+
+    stats = codec.stats()
+    assert stats['method'] == method
+    assert stats['frames'] == 1
+    assert stats['messages'] == 100
+    assert stats['compressed_bytes'] == len(frame)
+    assert stats['ratio'] > 3
+    assert stats['encode_time'] >= 0
+    assert stats['decode_time'] >= 0
+
+
+def test_codec_trained_dictionary():
+    """
+    Test that a trained dictionary compresses small batches better
+    """
+
+    zdict = Codec.train(sample_messages(50), size=4096)
+    assert 0 < len(zdict) <= 4096
+    plain_codec = Codec('zlib')
+    trained_codec = Codec('zlib', zdict=zdict)
+    batch = sample_messages(5, start=1000)
+    plain_frame = plain_codec.encode(batch)
+    trained_frame = trained_codec.encode(batch)
+    assert len(trained_frame) < len(plain_frame)
+    assert trained_codec.decode(trained_frame) == batch
+    with pytest.raises(Exception):
+        plain_codec.decode(trained_frame)
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_codec_snapshot(class_2_test, tmp_path):
+    """
+    Test that snapshot chunks of a channel with codec are compressed
+    and restored with the saved codec
+    """
+
+    path = tmp_path / 'state.snapshot'
+    plain_path = tmp_path / 'plain.snapshot'
+
+    communicator = class_2_test(max_queue_in_a_channel=1000)
+    message_queue = communicator.subscribe('sensors')
+    for message in sample_messages(500):
+        communicator.publish('sensors', message)
+    communicator.snapshot(plain_path, chunk_size=100)
+    zdict = Codec.train(sample_messages(20))
+    codec = communicator.set_codec('sensors', zdict=zdict)
+    assert communicator.snapshot(path, chunk_size=100) == 500
+    assert path.stat().st_size * 3 < plain_path.stat().st_size
+    assert codec.stats()['frames'] == 5
+    assert communicator.stats()['codecs']['sensors']['messages'] == 500
+    assert message_queue.qsize() == 500
+
+    restarted = class_2_test(max_queue_in_a_channel=1000)
+    queues = restarted.restore(path)
+    assert restarted.codecs['sensors'].config_() == ('zlib', None, zdict)
+    assert [msg['data'] for msg in queues[0].listen(block=False)] == \
+        sample_messages(500)
+
+    assert communicator.set_codec('sensors', None) is None
+    assert not communicator.codecs
+
+
+def test_exception_codec():
+    """
+    Test exceptions and messages for set_codec() and Codec class
+    """
+
+    communicator = PubSub()
+    with pytest.raises(ValueError, match='channel : None value not allowed'):
+        communicator.set_codec(None)
+    with pytest.raises(ValueError, match='method must be one of'):
+        communicator.set_codec('test', 'gzip')
+    with pytest.raises(ValueError, match='zdict : only for zlib'):
+        communicator.set_codec('test', 'lzma', zdict=b'hello')
+    with pytest.raises(ValueError, match='level must be between 0 and 9'):
+        communicator.set_codec('test', level=10)
+    with pytest.raises(ValueError, match='size must be >= 1'):
+        Codec.train(['hello'], size=0)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_columnar.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for typed channels drained in numpy arrays
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+numpy = pytest.importorskip('numpy')
+
+
+def test_columnar_drain():
+    """
+    Test that messages of a typed channel are drained in a
+    structured array
+    """
+
+    communicator = PubSub()
+
+    channel = "sensor"
+
+    communicator.set_schema(channel, [('x', 'f8'), ('y', 'f8')])
+    message_queue = communicator.subscribe(channel, columnar=True)
+
+    communicator.publish(channel, (1.0, 2.0))
+    communicator.publish(channel, (3.0, 4.0))
+    with communicator.publisher(channel, batch_size=2) as publisher:
+        publisher.publish((5.0, 6.0))
+        publisher.publish((7.0, 8.0))
+
+    batch = message_queue.drain()
+    assert batch.dtype == message_queue.dtype
+    assert list(batch['id']) == [0, 1, 2, 3]
+    assert list(batch['data']['x']) == [1.0, 3.0, 5.0, 7.0]
+    assert batch['data']['y'].sum() == 20.0
+    assert (batch['timestamp'] > 0).all()
+    assert message_queue.empty()
+    assert len(message_queue.drain()) == 0
+
+
+def test_columnar_drain_preallocated():
+    """
+    Test drain in a preallocated array and listen() on a typed channel
+    """
+
+    communicator = PubSub()
+
+    channel = "sensor"
+
+    communicator.set_schema(channel, 'f8')
+    message_queue = communicator.subscribe(channel, columnar=True)
+
+    for index in range(5):
+        communicator.publish(channel, index + 0.5)
+
+    out = numpy.zeros(3, dtype=message_queue.dtype)
+    assert message_queue.drain(out) == 3
+    assert list(out['data']) == [0.5, 1.5, 2.5]
+    assert message_queue.drain(out, max_items=1) == 1
+    assert out['id'][0] == 3
+
+    msgs = list(message_queue.listen(block=False))
+    assert msgs == [{'data': 4.5, 'id': 4}]
+
+
+def test_columnar_bad_message():
+    """
+    Test that a message not matching the schema is rejected when
+    published and that drain() never loses the backlog
+    """
+
+    communicator = PubSub()
+
+    channel = "sensor"
+
+    communicator.set_schema(channel, [('x', 'f8'), ('y', 'f8')])
+    message_queue = communicator.subscribe(channel, columnar=True)
+    other_queue = communicator.subscribe(channel)
+    communicator.publish(channel, (1.0, 2.0))
+    with pytest.raises(ValueError,
+                       match='message : not compatible with schema'):
+        communicator.publish(channel, 'oops')
+    with pytest.raises(ValueError,
+                       match='message : not compatible with schema'):
+        communicator.publisher(channel).publish('oops')
+    assert message_queue.qsize() == 1
+    assert other_queue.qsize() == 1
+
+    # Row stored before its schema changed
+    message_queue.restore_items_([(1, 0., 'oops')])
+    with pytest.raises(ValueError):
+        message_queue.drain()
+    assert message_queue.qsize() == 2
+    assert len(message_queue.drain(max_items=1)) == 1
+
+
+def test_exception_columnar():
+    """
+    Test exceptions and messages for columnar subscriptions
+    """
+
+    communicator = PubSub()
+
+    with pytest.raises(ValueError,
+                       match='columnar : no schema for channel test'):
+        communicator.subscribe('test', columnar=True)
+    communicator.set_schema('test', 'i4')
+    with pytest.raises(ValueError, match='columnar : not compatible'):
+        communicator.subscribe('test', columnar=True, ack_timeout=1)
+    with pytest.raises(ValueError, match='columnar : only for PubSub'):
+        PubSubPriority().subscribe('test', columnar=True)
+    assert communicator.set_schema('test', None) is None
+    assert 'test' not in communicator.schemas
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_dead_letter.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for the dead letter channel
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import warnings
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_dead_letter_overflow(class_2_test):
+    """
+    Test that messages lost by a full queue are published on the
+    dead letter channel
+    """
+
+    communicator = class_2_test(max_queue_in_a_channel=1)
+    communicator.set_dead_letter_channel('dead', batch_size=1)
+    dead_queue = communicator.subscribe('dead')
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel)
+    communicator.publish(channel, 'hello 1')
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        communicator.publish(channel, 'hello 2')
+
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['hello 1']
+    letters = [msg['data'] for msg in dead_queue.listen(block=False)]
+    assert len(letters) == 1
+    assert letters[0]['channel'] == channel
+    assert letters[0]['id'] == 1
+    assert letters[0]['reason'] == 'overflow'
+    assert letters[0]['data'] == 'hello 2'
+    assert letters[0]['dropped'] == 1
+    assert letters[0]['timestamp'] > 0
+
+
+def test_dead_letter_reasons():
+    """
+    Test rate limited, undeliverable messages and batched publisher
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=5)
+    communicator.set_dead_letter_channel('dead', batch_size=10,
+                                         linger=None, undeliverable=True)
+    dead_queue = communicator.subscribe('dead')
+
+    communicator.publish('nobody', 'hello 1')
+    communicator.set_rate_limit('limited', 1, policy='drop')
+    communicator.publish('limited', 'hello 2')
+    communicator.publish('limited', 'hello 3')
+
+    message_queue = communicator.subscribe('test')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with communicator.publisher('test', batch_size=6) as publisher:
+            for index in range(6):
+                publisher.publish(f'batch {index}')
+
+    # Waiting for batch_size or flush
+    assert dead_queue.empty()
+    communicator.close()
+    letters = [msg['data'] for msg in dead_queue.listen(block=False)]
+    assert [(letter['channel'], letter['id'], letter['reason'],
+             letter['data']) for letter in letters] == [
+                 ('nobody', 0, 'undeliverable', 'hello 1'),
+                 ('limited', 0, 'undeliverable', 'hello 2'),
+                 ('limited', None, 'rate_limited', 'hello 3'),
+                 ('test', 5, 'overflow', 'batch 5')]
+    assert len(list(message_queue.listen(block=False))) == 5
+    assert communicator.stats()['dead_letters'] == {
+        'channel': 'dead', 'recorded': 4, 'dropped': 0}
+
+
+def test_dead_letter_rate_and_linger():
+    """
+    Test rate limit of dead letters and publication after linger
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=2)
+    communicator.set_dead_letter_channel('dead', rate=0.001, burst=2,
+                                         linger=0.01)
+    dead_queue = communicator.subscribe('dead')
+    message_queue = communicator.subscribe('test')
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for index in range(6):
+            communicator.publish('test', f'hello {index}')
+
+    # Published after linger time
+    letters = [next(dead_queue.listen(timeout=1))['data']['data']
+               for _ in range(2)]
+    assert letters == ['hello 2', 'hello 3']
+    assert message_queue.qsize() == 2
+    assert communicator.stats()['dead_letters']['dropped'] == 2
+    communicator.close()
+
+
+def test_dead_letter_expired_request():
+    """
+    Test requests without reply before their timeout
+    """
+
+    communicator = PubSub()
+    communicator.set_dead_letter_channel('dead', batch_size=1)
+    dead_queue = communicator.subscribe('dead')
+    communicator.subscribe('service')
+
+    future = communicator.request('service', 'question', timeout=0.01)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=1)
+    letter = next(dead_queue.listen(timeout=1))['data']
+    assert letter['reason'] == 'expired'
+    assert letter['channel'] == 'service'
+    assert letter['data'] == 'question'
+
+    assert communicator.set_dead_letter_channel(None) is None
+    assert communicator.stats()['dead_letters'] is None
+    communicator.close()
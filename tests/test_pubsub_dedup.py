@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_dedup.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for deduplicating publications
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import pytest
+
+import pubsub
+from pubsub import PubSub, PubSubPriority, RateLimitExceeded
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_dedup_key(class_2_test):
+    """
+    Test that a message published again with the same key is
+    received once by all subscribers
+    """
+
+    communicator = class_2_test()
+
+    channel = "test"
+
+    message_queue1 = communicator.subscribe(channel)
+    message_queue2 = communicator.subscribe(channel)
+
+    assert communicator.publish(channel, 'order 1', dedup_key=1) == (2, 0)
+    assert communicator.publish(channel, 'order 1', dedup_key=1) == (0, 0)
+    communicator.publish(channel, 'order 2', dedup_key=2)
+    # Same key on another channel is not a duplicate
+    communicator.publish('other', 'order 1', dedup_key=1)
+    # Messages without key are never duplicates
+    communicator.publish(channel, 'order 2')
+
+    for message_queue in (message_queue1, message_queue2):
+        msgs = list(message_queue.listen(block=False))
+        assert [(msg['id'], msg['data']) for msg in msgs] == \
+            [(0, 'order 1'), (1, 'order 2'), (2, 'order 2')]
+    assert communicator.stats()['dedup'][channel] == {
+        'size': 1000, 'ttl': None, 'keys': 2, 'hits': 1}
+
+
+def test_dedup_window_size_and_ttl(monkeypatch):
+    """
+    Test that keys are forgotten when window is full or too old
+    """
+
+    clock = [1000.0]
+    monkeypatch.setattr(pubsub, 'monotonic', lambda: clock[0])
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    window = communicator.set_dedup_window(channel, size=2, ttl=10)
+    message_queue = communicator.subscribe(channel)
+
+    for key in ('a', 'b', 'c', 'a', 'c'):
+        communicator.publish(channel, key, dedup_key=key)
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['a', 'b', 'c', 'a']
+    assert window.hits == 1
+
+    clock[0] += 10
+    communicator.publish(channel, 'c', dedup_key='c')
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['c']
+
+    assert communicator.set_dedup_window(channel, None) is None
+    assert channel not in communicator.stats()['dedup']
+
+
+def test_dedup_publisher():
+    """
+    Test dedup_key with Publisher handles
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel)
+    with communicator.publisher(channel, batch_size=10) as publisher:
+        for key in (1, 2, 1, 3, 2):
+            publisher.publish(f'order {key}', dedup_key=key)
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['order 1', 'order 2', 'order 3']
+
+
+def test_dedup_default_window_removed():
+    """
+    Test that default dedup windows don't outlive their channel
+    and that windows set by set_dedup_window() are kept
+    """
+
+    communicator = PubSub()
+
+    for index in range(10):
+        channel = f'session {index}'
+        message_queue = communicator.subscribe(channel)
+        communicator.publish(channel, 'hello', dedup_key=1)
+        assert channel in communicator.dedup_windows
+        message_queue.unsubscribe()
+    assert not communicator.dedup_windows
+
+    # Nobody listens : no window, no key remembered
+    assert communicator.publish('nobody', 'hello', dedup_key=1) == (0, 0)
+    assert not communicator.dedup_windows
+
+    window = communicator.set_dedup_window('kept', size=10)
+    message_queue = communicator.subscribe('kept')
+    communicator.publish('kept', 'hello', dedup_key=1)
+    message_queue.unsubscribe()
+    assert communicator.dedup_windows == {'kept': window}
+
+
+def publish_function(communicator, batch_size):
+    """
+    Return (publish function, publisher) : communicator publish()
+    method if batch_size is None, else the publish() method of a
+    Publisher with batch_size on channel test.
+    """
+    if batch_size is None:
+        return communicator.publish, None
+    publisher = communicator.publisher('test', batch_size=batch_size)
+
+    def publish(_, message, **options):
+        return publisher.publish(message, **options)
+    return publish, publisher
+
+
+@pytest.mark.parametrize("batch_size", [None, 1, 2])
+def test_dedup_retry_after_reject(batch_size):
+    """
+    Test that a message rejected by a rate limit can be published
+    again with the same key
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.set_rate_limit('test', 0.001, burst=1, policy='reject')
+    publish, publisher = publish_function(communicator, batch_size)
+    publish('test', 'first', dedup_key='first')
+    if batch_size == 2:
+        # Rejected message is kept in batch : retry is a duplicate
+        with pytest.raises(RateLimitExceeded):
+            publish('test', 'retried', dedup_key='retried')
+        assert publish('test', 'retried', dedup_key='retried') == (0, 0)
+        communicator.set_rate_limit('test', None)
+        publisher.flush()
+    else:
+        with pytest.raises(RateLimitExceeded):
+            publish('test', 'retried', dedup_key='retried')
+        communicator.set_rate_limit('test', None)
+        assert publish('test', 'retried', dedup_key='retried') == (1, 0)
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['first', 'retried']
+
+
+@pytest.mark.parametrize("batch_size", [None, 1, 3])
+def test_dedup_retry_after_drop(batch_size):
+    """
+    Test that a message dropped by a rate limit can be published
+    again with the same key
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.set_rate_limit('test', 0.001, burst=1, policy='drop')
+    publish, publisher = publish_function(communicator, batch_size)
+    publish('test', 'first', dedup_key='first')
+    publish('test', 'dropped', dedup_key='dropped')
+    if batch_size == 3:
+        assert publish('test', 'other') == (1, 2)
+    assert communicator.stats()['dedup']['test']['keys'] == 1
+    communicator.set_rate_limit('test', None)
+    publish('test', 'dropped', dedup_key='dropped')
+    if batch_size == 3:
+        publisher.flush()
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['first', 'dropped']
+
+
+def test_exception_dedup():
+    """
+    Test exceptions and messages for set_dedup_window()
+    """
+
+    communicator = PubSub()
+
+    with pytest.raises(ValueError, match='size must be >= 1'):
+        communicator.set_dedup_window('test', size=0)
+    with pytest.raises(ValueError, match='ttl must be > 0'):
+        communicator.set_dedup_window('test', ttl=0)
+    with pytest.raises(ValueError, match='channel : None value not allowed'):
+        communicator.set_dedup_window(None)
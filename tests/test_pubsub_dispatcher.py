@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_dispatcher.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for asynchronous dispatch with pytest
+          publish() returns before messages are put in
+          subscriber queues by dispatcher threads.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import threading
+from queue import Full
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_dispatch_order(class_2_test):
+    """
+    Test that dispatched messages keep their order on each channel
+    """
+
+    communicator = class_2_test(max_queue_in_a_channel=1000,
+                                dispatch_threads=3)
+    message_queues = {channel: communicator.subscribe(channel)
+                      for channel in ('test1', 'test2', 'test3')}
+    publisher = communicator.publisher('test3', batch_size=10)
+    for counter in range(100):
+        communicator.publish('test1', 'hello world ' + str(counter))
+        communicator.publish('test2', 'hello world ' + str(counter))
+        publisher.publish('hello world ' + str(counter))
+    communicator.join()
+
+    for message_queue in message_queues.values():
+        msgs = list(message_queue.listen(block=False))
+        assert [msg['id'] for msg in msgs] == list(range(100))
+        assert msgs[-1]['data'] == 'hello world 99'
+    assert communicator.stats()['dispatcher'] == {'threads': 3,
+                                                  'backlog': 0,
+                                                  'dropped': 0}
+    communicator.close()
+    with pytest.raises(RuntimeError, match='dispatcher closed'):
+        communicator.publish('test1', 'hello world')
+
+
+def block_dispatcher(communicator):
+    """
+    Make the single dispatcher thread of communicator wait
+    and return the event releasing it.
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def wait_release():
+        started.set()
+        release.wait(5.0)
+
+    communicator.dispatcher.submit('any', wait_release, ())
+    started.wait(5.0)
+    return release
+
+
+def test_dispatch_policy_drop():
+    """
+    Test that messages are dropped when dispatcher inbox is full
+    """
+
+    communicator = PubSub(dispatch_threads=1, dispatch_queue_size=2,
+                          dispatch_policy='drop')
+    message_queue = communicator.subscribe('test')
+    release = block_dispatcher(communicator)
+    communicator.publish('test', 'hello world 1')
+    communicator.publish('test', 'hello world 2')
+    with pytest.warns(UserWarning, match='Dispatcher overload'):
+        communicator.publish('test', 'hello world 3')
+    release.set()
+    communicator.join()
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['hello world 1',
+                                             'hello world 2']
+    assert communicator.stats()['dispatcher']['dropped'] == 1
+    communicator.close()
+
+
+def test_dispatch_policy_reject():
+    """
+    Test that queue.Full is raised when dispatcher inbox is full
+    """
+
+    communicator = PubSub(dispatch_threads=1, dispatch_queue_size=1,
+                          dispatch_policy='reject')
+    release = block_dispatcher(communicator)
+    communicator.publish('test', 'hello world 1')
+    with pytest.raises(Full):
+        communicator.publish('test', 'hello world 2')
+    release.set()
+    communicator.close()
+
+
+def test_dispatch_submit_during_close():
+    """
+    Test that a message submitted while the dispatcher closes is
+    dispatched before the dispatcher threads stop
+    """
+
+    communicator = PubSub(dispatch_threads=1)
+    message_queue = communicator.subscribe('test')
+    inbox = communicator.dispatcher.inboxes[0]
+    put = inbox.put
+    closer = threading.Thread(target=communicator.close, daemon=True)
+
+    def put_during_close(task, *args, **kwargs):
+        # close() starts between the closed check and the put
+        closer.start()
+        closer.join(0.1)
+        put(task, *args, **kwargs)
+
+    inbox.put = put_during_close
+    communicator.publish('test', 'hello world')
+    inbox.put = put
+    closer.join(5.0)
+    assert not closer.is_alive()
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['hello world']
+    joiner = threading.Thread(target=communicator.join, daemon=True)
+    joiner.start()
+    joiner.join(5.0)
+    assert not joiner.is_alive(), 'join() waits for a lost message'
+
+
+def test_exception_dispatch():
+    """
+    Test exceptions and messages for dispatch parameters
+    """
+
+    with pytest.raises(ValueError, match='dispatch_threads must be >= 0'):
+        PubSub(dispatch_threads=-1)
+    with pytest.raises(ValueError, match='dispatch_policy must be one of'):
+        PubSub(dispatch_threads=1, dispatch_policy='wait')
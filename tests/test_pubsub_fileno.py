@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_fileno.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for pollable channel queues with pytest
+          Queues subscribed with pollable=True can be watched
+          with the selectors module.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import os
+import selectors
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_fileno_readiness(class_2_test):
+    """
+    Test that fileno() is readable only when messages are waiting
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test', pollable=True)
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(message_queue, selectors.EVENT_READ)
+        assert not selector.select(timeout=0)
+
+        communicator.publish('test', 'hello world 1')
+        communicator.publish('test', 'hello world 2')
+        events = selector.select(timeout=1.0)
+        assert len(events) == 1
+        assert events[0][0].fileobj is message_queue
+
+        # Still readable while messages remain
+        assert next(message_queue.listen())['data'] == 'hello world 1'
+        assert selector.select(timeout=0)
+
+        # Empty queue : not readable anymore
+        assert next(message_queue.listen())['data'] == 'hello world 2'
+        assert not selector.select(timeout=0)
+
+    message_queue.close()
+
+
+def test_fileno_edge_coalesced():
+    """
+    Test that a burst of messages writes only one signal
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test', pollable=True)
+    for counter in range(10):
+        communicator.publish('test', 'hello world ' + str(counter))
+    assert message_queue.fd_signaled
+
+    msgs = list(message_queue.listen(block=False))
+    assert len(msgs) == 10
+    assert not message_queue.fd_signaled
+    # Signal was consumed by listen()
+    with pytest.raises(BlockingIOError):
+        os.read(message_queue.fileno(), 8)
+    message_queue.close()
+
+
+def test_fileno_not_pollable():
+    """
+    Test exceptions for fileno() and close() without file descriptor
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    with pytest.raises(ValueError, match='fileno : queue not pollable'):
+        message_queue.fileno()
+
+    # Messages waiting before open_fd() make fd readable
+    communicator.publish('test', 'hello world')
+    message_queue.open_fd()
+    assert message_queue.fd_signaled
+    message_queue.close()
+    with pytest.raises(ValueError, match='fileno : queue not pollable'):
+        message_queue.fileno()
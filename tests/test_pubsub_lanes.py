@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_lanes.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for weighted fair queuing lanes of a PubSub
+          subscription
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+def test_lanes_weighted_round_robin():
+    """
+    Test that lanes are served in proportion of their weights
+    and that order is kept inside a lane
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel,
+                                           lanes={'gold': 3, 'bronze': 1})
+
+    # A noisy tenant publishes first
+    for index in range(6):
+        communicator.publish(channel, f'b{index}', lane='bronze')
+    for index in range(6):
+        communicator.publish(channel, f'g{index}', lane='gold')
+
+    msgs = [msg['data'] for msg in message_queue.listen(block=False)]
+    assert msgs == ['b0', 'g0', 'g1', 'g2', 'b1', 'g3', 'g4', 'g5',
+                    'b2', 'b3', 'b4', 'b5']
+
+
+def test_lanes_default_lane():
+    """
+    Test messages without lane and lanes without weight
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel, lanes={})
+    other_queue = communicator.subscribe(channel)
+
+    communicator.publish(channel, 'a1', lane='a')
+    communicator.publish(channel, 'a2', lane='a')
+    communicator.publish(channel, 'none 1')
+    communicator.publish(channel, 'none 2')
+
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['a1', 'none 1', 'a2', 'none 2']
+    assert [msg['id'] for msg in msgs] == [0, 2, 1, 3]
+
+    # Lane is ignored by subscribers without lanes
+    msgs = list(other_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['a1', 'a2', 'none 1', 'none 2']
+
+
+def test_lanes_size():
+    """
+    Test that a full lane doesn't prevent other lanes to receive messages
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel, lanes={'a': 1, 'b': 1},
+                                           lane_size=2)
+
+    communicator.publish(channel, 'a1', lane='a')
+    communicator.publish(channel, 'a2', lane='a')
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        communicator.publish(channel, 'a3', lane='a')
+    communicator.publish(channel, 'b1', lane='b')
+
+    assert message_queue.lane_qsize('a') == 2
+    assert message_queue.qsize() == 3
+    msgs = [msg['data'] for msg in message_queue.listen(block=False)]
+    assert msgs == ['a1', 'b1', 'a2']
+
+
+def test_lanes_size_channel_limit():
+    """
+    Test that lanes together can't hold more than max_queue_in_a_channel
+    messages
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=3)
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel, lanes={'a': 1, 'b': 1},
+                                           lane_size=2)
+
+    communicator.publish(channel, 'a1', lane='a')
+    communicator.publish(channel, 'a2', lane='a')
+    communicator.publish(channel, 'b1', lane='b')
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        communicator.publish(channel, 'b2', lane='b')
+    with communicator.publisher(channel, lane='b', batch_size=2) as pub_b:
+        with pytest.warns(UserWarning,
+                          match='Queue overflow for channel test'):
+            pub_b.publish('b3')
+            pub_b.publish('b4')
+
+    assert message_queue.lane_qsize('b') == 1
+    assert message_queue.qsize() == 3
+
+
+def test_lanes_publisher():
+    """
+    Test lane option of publisher handles with batches
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel, lanes={'a': 2, 'b': 1})
+
+    with communicator.publisher(channel, lane='b', batch_size=3) as pub_b:
+        for index in range(3):
+            pub_b.publish(f'b{index}')
+    pub_a = communicator.publisher(channel, lane='a')
+    for index in range(3):
+        pub_a.publish(f'a{index}')
+
+    msgs = [msg['data'] for msg in message_queue.listen(block=False)]
+    assert msgs == ['b0', 'a0', 'a1', 'b1', 'a2', 'b2']
+
+
+def test_exception_lanes():
+    """
+    Test exceptions and messages for lanes parameter
+    """
+
+    with pytest.raises(ValueError, match='lanes : only for PubSub'):
+        PubSubPriority().subscribe('test', lanes={'a': 1})
+    with pytest.raises(ValueError, match='lanes : weights must be > 0'):
+        PubSub().subscribe('test', lanes={'a': 0})
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_listen.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for listen() deadline and max_items parameters
+          and for get_batch()
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import threading
+from time import monotonic, sleep
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_listen_max_items(class_2_test):
+    """
+    Test that listen() stops after max_items messages
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    for index in range(5):
+        communicator.publish('test', f'hello world {index}')
+
+    msgs = list(message_queue.listen(max_items=2))
+    assert [msg['id'] for msg in msgs] == [0, 1]
+    msgs = list(message_queue.listen(block=False, max_items=10))
+    assert [msg['id'] for msg in msgs] == [2, 3, 4]
+
+
+def test_listen_deadline_trickle():
+    """
+    Test that a trickle of messages does not keep a consumer
+    in listen() after its deadline
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    is_running = threading.Event()
+    is_running.set()
+
+    def trickle():
+        while is_running.is_set():
+            communicator.publish('test', 'tick')
+            sleep(0.01)
+
+    sender = threading.Thread(target=trickle)
+    sender.start()
+    try:
+        start = monotonic()
+        msgs = list(message_queue.listen(timeout=1, deadline=0.2))
+        elapsed = monotonic() - start
+    finally:
+        is_running.clear()
+        sender.join()
+    assert msgs
+    assert 0.15 < elapsed < 0.6
+
+
+def test_listen_deadline_no_message():
+    """
+    Test that listen() waits only until its deadline
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    start = monotonic()
+    assert not list(message_queue.listen(deadline=0.1))
+    assert 0.05 < monotonic() - start < 0.5
+
+    communicator.publish('test', 'hello world 1')
+    communicator.publish('test', 'hello world 2')
+    # Deadline expired : only one waiting message is taken
+    assert [msg['data'] for msg in message_queue.listen(deadline=0)] == \
+        ['hello world 1']
+    assert next(message_queue.listen(deadline=1, max_items=1))['data'] == \
+        'hello world 2'
+    assert not list(message_queue.listen(deadline=0))
+
+
+def test_listen_deadline_from_call():
+    """
+    Test that the deadline counts from the call of listen() and not
+    from the first iteration
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello world 1')
+    communicator.publish('test', 'hello world 2')
+    msgs = message_queue.listen(deadline=0.05)
+    sleep(0.1)
+    # Deadline expired : only one waiting message is taken
+    assert [msg['data'] for msg in msgs] == ['hello world 1']
+
+
+def test_listen_deadline_ack():
+    """
+    Test deadline and max_items with leases
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test', ack_timeout=30)
+    for index in range(3):
+        communicator.publish('test', f'hello world {index}')
+    leases = list(message_queue.listen(deadline=0.1, max_items=2))
+    assert [lease['id'] for lease in leases] == [0, 1]
+    assert message_queue.ack(leases) == 2
+    leases = list(message_queue.listen(deadline=0))
+    assert [lease['id'] for lease in leases] == [2]
+    assert message_queue.in_flight_count() == 1
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_get_batch(class_2_test):
+    """
+    Test that get_batch() waits for one message and takes
+    the messages waiting behind it
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    assert message_queue.get_batch(timeout=0.05) == []
+    assert message_queue.get_batch(block=False) == []
+
+    for index in range(5):
+        communicator.publish('test', f'hello world {index}')
+    msgs = message_queue.get_batch(max_items=3)
+    assert [msg['id'] for msg in msgs] == [0, 1, 2]
+    msgs = message_queue.get_batch()
+    assert [msg['id'] for msg in msgs] == [3, 4]
+    assert message_queue.qsize() == 0
+
+    timer = threading.Timer(0.05, communicator.publish,
+                            args=('test', 'later'))
+    timer.start()
+    msgs = message_queue.get_batch(timeout=5)
+    timer.join()
+    assert [msg['data'] for msg in msgs] == ['later']
+
+
+def test_get_batch_ack():
+    """
+    Test that get_batch() returns leases in at-least-once delivery mode
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test', ack_timeout=30)
+    communicator.publish('test', 'hello world 1')
+    communicator.publish('test', 'hello world 2')
+    leases = message_queue.get_batch()
+    assert [lease['data'] for lease in leases] == ['hello world 1',
+                                                   'hello world 2']
+    assert message_queue.in_flight_count() == 2
+    assert message_queue.ack(leases) == 2
+
+
+def test_exception_listen_deadline():
+    """
+    Test exceptions and messages for deadline and max_items parameters
+    """
+
+    message_queue = PubSub().subscribe('test')
+    # Raised by listen() itself, before any iteration
+    with pytest.raises(ValueError, match='max_items must be >= 1'):
+        message_queue.listen(max_items=0)
+    with pytest.raises(ValueError, match='deadline must be >= 0'):
+        message_queue.listen(deadline=-1)
+    with pytest.raises(ValueError, match='max_items must be >= 1'):
+        message_queue.get_batch(max_items=0)
@@ -36,7 +36,10 @@ SOFTWARE.
 ==============================================================================
 """
 
-from pubsub import PubSubPriority
+import pytest
+
+import pubsub
+from pubsub import PubSub, PubSubPriority
 
 
 def test_messages_explicit_equal_priority():
@@ -242,3 +245,51 @@ def test_messages_explicit_random_priority():
     assert msgs[2]['id'] == 1
     assert msgs[3]['id'] == 0
     assert msgs[4]['id'] == 3
+
+
+def test_messages_priority_aging(monkeypatch):
+    """
+    Test that a low priority message waiting long enough
+    is given before urgent messages when aging is enabled
+    """
+
+    clock = [1000.0]
+    monkeypatch.setattr(pubsub, 'monotonic', lambda: clock[0])
+
+    communicator = PubSubPriority()
+
+    channel = "test"
+
+    # listener subscribes to the channel with 1 level gained by second
+    message_queue = communicator.subscribe(channel, aging_interval=1.0)
+
+    communicator.publish(channel, 'low priority', priority=10)
+    communicator.publish(channel, 'urgent 1', priority=1)
+
+    # Without waiting, priority order
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['urgent 1', 'low priority']
+
+    communicator.publish(channel, 'low priority', priority=10)
+    # 9.5 seconds later : low priority message effective priority is 1
+    clock[0] += 9.5
+    communicator.publish(channel, 'urgent 2', priority=1)
+    communicator.publish(channel, 'urgent 3', priority=0)
+
+    # Same effective priority 1 than urgent 2 but older
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['urgent 3', 'low priority',
+                                             'urgent 2']
+    assert [msg['id'] for msg in msgs] == [4, 2, 3]
+
+
+def test_exception_priority_aging():
+    """
+    Test exceptions and messages for aging_interval parameter
+    """
+
+    with pytest.raises(ValueError, match='aging_interval must be > 0'):
+        PubSubPriority().subscribe('test', aging_interval=0)
+    with pytest.raises(ValueError,
+                       match='aging_interval : only for PubSubPriority'):
+        PubSub().subscribe('test', aging_interval=1)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_profiler.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for set_profiler() and Profiler class
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+from time import sleep
+
+import pytest
+
+import pubsub
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_profiler_fan_out(class_2_test):
+    """
+    Test that fan out time is measured per channel
+    """
+
+    communicator = class_2_test()
+    assert communicator.stats()['profiler'] is None
+    profiler = communicator.set_profiler()
+    message_queues = [communicator.subscribe('busy') for _ in range(20)]
+    message_queue = communicator.subscribe('quiet')
+    for index in range(50):
+        communicator.publish('busy', f'hello world {index}')
+    communicator.publish('quiet', 'hello world')
+    with communicator.publisher('busy', batch_size=10) as publisher:
+        for index in range(10):
+            publisher.publish(f'batched {index}')
+
+    report = profiler.report()
+    assert [entry['channel'] for entry in report['channels']] == \
+        ['busy', 'quiet']
+    busy = report['channels'][0]
+    assert busy['publications'] == 51
+    assert busy['messages'] == 60
+    assert busy['wall_time'] > 0
+    assert busy['cpu_time'] >= 0
+    assert profiler.report(top=1)['channels'] == [busy]
+    assert communicator.stats()['profiler']['channels'][0]['channel'] == \
+        'busy'
+    assert len(message_queues[0].get_batch()) == 60
+    assert message_queue.qsize() == 1
+
+
+def test_profiler_consumers(monkeypatch):
+    """
+    Test that time between messages taken by subscribers is measured
+    """
+
+    clock = [100.0]
+    monkeypatch.setattr(pubsub, 'perf_counter', lambda: clock[0])
+
+    communicator = PubSub()
+    profiler = communicator.set_profiler()
+    slow_queue = communicator.subscribe('test')
+    fast_queue = communicator.subscribe('test')
+    for index in range(3):
+        communicator.publish('test', f'hello world {index}')
+
+    for _ in slow_queue.listen(block=False):
+        clock[0] += 2.0
+    for _ in fast_queue.listen(block=False):
+        clock[0] += 0.5
+
+    consumers = profiler.report()['consumers']
+    assert [entry['queue'] for entry in consumers] == [slow_queue,
+                                                       fast_queue]
+    assert consumers[0]['messages'] == 3
+    assert consumers[0]['processing_time'] == pytest.approx(6.0)
+    assert consumers[0]['mean_time'] == pytest.approx(2.0)
+    assert consumers[1]['processing_time'] == pytest.approx(1.5)
+
+    # get_batch : time since previous messages counted at next call
+    communicator.publish('test', 'hello world')
+    assert len(fast_queue.get_batch()) == 1
+    clock[0] += 1.0
+    assert fast_queue.get_batch(block=False) == []
+    entry = profiler.report()['consumers'][1]
+    assert entry['messages'] == 4
+    assert entry['processing_time'] == pytest.approx(2.5)
+
+
+def test_profiler_disabled():
+    """
+    Test that set_profiler(False) stops and reset() forgets measures
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    profiler = communicator.set_profiler()
+    communicator.publish('test', 'hello world')
+    list(message_queue.listen(block=False))
+    sleep(0.01)
+    list(message_queue.listen(block=False))
+    assert profiler.report()['consumers'][0]['processing_time'] > 0
+    profiler.reset()
+    assert profiler.report() == {'channels': [], 'consumers': []}
+
+    assert communicator.set_profiler(False) is None
+    communicator.publish('test', 'hello world')
+    list(message_queue.listen(block=False))
+    assert profiler.report() == {'channels': [], 'consumers': []}
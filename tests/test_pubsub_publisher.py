@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_publisher.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for class Publisher with pytest
+          Messages published in batches by a publisher handle.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import time
+import queue
+import threading
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, TokenBucket, RateLimitExceeded
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_publisher_immediate(class_2_test):
+    """
+    Test a publisher without batch
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    publisher = communicator.publisher('test')
+    publisher.publish('hello world 1')
+    publisher.publish('hello world 2')
+    msgs = list(message_queue.listen(block=False))
+    assert [(msg['data'], msg['id']) for msg in msgs] == [
+        ('hello world 1', 0), ('hello world 2', 1)]
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_publisher_batch_size(class_2_test):
+    """
+    Test that a batch is published when batch_size messages wait
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello world')
+    assert next(message_queue.listen(block=False))['id'] == 0
+    with communicator.publisher('test', batch_size=3) as publisher:
+        publisher.publish('hello world 1')
+        publisher.publish('hello world 2')
+        assert not message_queue.is_ready()
+        publisher.publish('hello world 3')
+        msgs = list(message_queue.listen(block=False))
+        assert [(msg['data'], msg['id']) for msg in msgs] == [
+            ('hello world 1', 1), ('hello world 2', 2),
+            ('hello world 3', 3)]
+        publisher.publish('hello world 4')
+    # Leaving with block flushes publisher
+    msgs = list(message_queue.listen(block=False))
+    assert [(msg['data'], msg['id']) for msg in msgs] == [
+        ('hello world 4', 4)]
+
+
+def test_publisher_linger():
+    """
+    Test that a batch is published when linger time expires
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    publisher = communicator.publisher('test', batch_size=100, linger=0.05)
+    start_time = time.monotonic()
+    publisher.publish('hello world 1')
+    publisher.publish('hello world 2')
+    assert not list(message_queue.listen(block=False))
+    msgs = [next(message_queue.listen(timeout=2.0)) for _ in range(2)]
+    assert time.monotonic() - start_time >= 0.05
+    assert [msg['data'] for msg in msgs] == ['hello world 1',
+                                             'hello world 2']
+    communicator.close()
+
+
+def test_publisher_batch_priority():
+    """
+    Test priorities of messages published in a batch
+    """
+
+    communicator = PubSubPriority()
+    message_queue = communicator.subscribe('test')
+    publisher = communicator.publisher('test', batch_size=10)
+    publisher.publish('hello world 1', priority=200)
+    publisher.publish('hello world 2', priority=1)
+    publisher.flush()
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['hello world 2',
+                                             'hello world 1']
+
+
+def test_publisher_batch_overflow():
+    """
+    Test overflow warning and rate limit for a batch
+    """
+
+    communicator = PubSub(max_queue_in_a_channel=3)
+    message_queue = communicator.subscribe('test')
+    publisher = communicator.publisher(
+        'test', batch_size=5,
+        rate_limiter=TokenBucket(1, burst=4, policy='drop'))
+    with pytest.warns(UserWarning, match='Queue overflow for channel test'):
+        for counter in range(5):
+            publisher.publish('hello world ' + str(counter))
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['id'] for msg in msgs] == [0, 1, 2]
+    assert publisher.rate_limiter.stats()['dropped'] == 1
+
+
+def test_publisher_batch_rejected():
+    """
+    Test that messages of a batch rejected by a rate limit
+    are kept by the publisher
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.set_rate_limit('test', 0.001, burst=2, policy='reject')
+    publisher = communicator.publisher('test', batch_size=3)
+    publisher.publish('hello world 1')
+    publisher.publish('hello world 2')
+    with pytest.raises(RateLimitExceeded):
+        publisher.publish('hello world 3')
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['hello world 1', 'hello world 2']
+    assert publisher.batch == [('hello world 3', 100)]
+
+    communicator.set_rate_limit('test', None)
+    assert publisher.flush() == (1, 0)
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['hello world 3']
+
+
+def test_publisher_linger_rejected():
+    """
+    Test that messages of a linger flush rejected by a rate limit
+    are flushed again after linger seconds
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.set_rate_limit('test', 0.001, burst=1, policy='reject')
+    publisher = communicator.publisher('test', batch_size=10, linger=0.05)
+    publisher.publish('a')
+    assert next(message_queue.listen(timeout=1))['data'] == 'a'
+    with pytest.warns(UserWarning, match='RateLimitExceeded'):
+        publisher.publish('b')
+        time.sleep(0.2)
+    assert publisher.batch == [('b', 100)]
+    assert publisher.linger_timer is not None
+
+    communicator.set_rate_limit('test', None)
+    assert next(message_queue.listen(timeout=1))['data'] == 'b'
+    assert not publisher.batch
+
+
+def test_publisher_batch_dispatcher_rejected():
+    """
+    Test that a batch rejected by dispatcher threads is kept
+    by the publisher
+    """
+
+    communicator = PubSub(dispatch_threads=1, dispatch_queue_size=1,
+                          dispatch_policy='reject')
+    message_queue = communicator.subscribe('test')
+    is_started = threading.Event()
+    is_blocked = threading.Event()
+
+    def blocker():
+        is_started.set()
+        is_blocked.wait(5)
+
+    # Dispatcher thread busy and its inbox full
+    communicator.dispatcher.submit('test', blocker, ())
+    assert is_started.wait(5)
+    communicator.dispatcher.submit('test', time.sleep, (0,))
+    publisher = communicator.publisher('test', batch_size=2)
+    publisher.publish('hello world 1')
+    with pytest.raises(queue.Full):
+        publisher.publish('hello world 2')
+    assert publisher.batch == [('hello world 1', 100),
+                               ('hello world 2', 100)]
+    is_blocked.set()
+    communicator.join()
+    assert publisher.flush() is None
+    communicator.join()
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['hello world 1', 'hello world 2']
+    communicator.close()
+
+
+def test_exception_publisher():
+    """
+    Test exceptions and messages for publisher()
+    """
+
+    communicator = PubSubPriority()
+    with pytest.raises(ValueError,
+                       match='channel : None value not allowed'):
+        communicator.publisher(None)
+    with pytest.raises(ValueError, match='batch_size must be >= 1'):
+        communicator.publisher('test', batch_size=0)
+    with pytest.raises(ValueError, match='linger must be > 0'):
+        communicator.publisher('test', linger=0)
+    publisher = communicator.publisher('test', batch_size=2)
+    with pytest.raises(ValueError,
+                       match='message : None value not allowed'):
+        publisher.publish(None)
+    with pytest.raises(ValueError, match='priority must be > 0'):
+        publisher.publish('hello', priority=-1)
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_publisher_follows_subscribers(class_2_test):
+    """
+    Test that a publisher handle sees subscribers arriving and leaving
+    after its creation and rate limits set later
+    """
+
+    communicator = class_2_test()
+    publisher = communicator.publisher('test')
+    publisher.publish('hello world 1')
+
+    message_queue1 = communicator.subscribe('test')
+    publisher.publish('hello world 2')
+    message_queue2 = communicator.subscribe('test')
+    publisher.publish('hello world 3')
+    message_queue1.unsubscribe()
+    publisher.publish('hello world 4')
+
+    msgs = list(message_queue1.listen(block=False))
+    assert [(msg['data'], msg['id']) for msg in msgs] == [
+        ('hello world 2', 1), ('hello world 3', 2)]
+    msgs = list(message_queue2.listen(block=False))
+    assert [(msg['data'], msg['id']) for msg in msgs] == [
+        ('hello world 3', 2), ('hello world 4', 3)]
+
+    communicator.set_rate_limit('test', 1, burst=1, policy='drop')
+    publisher.publish('hello world 5')
+    publisher.publish('hello world 6')
+    assert len(list(message_queue2.listen(block=False))) == 1
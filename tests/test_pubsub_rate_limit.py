@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_rate_limit.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for rate limits with pytest
+          Token buckets limit publishers and channels.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import time
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, TokenBucket, RateLimitExceeded
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_channel_rate_limit_drop(class_2_test):
+    """
+    Test that messages over the burst are dropped with policy 'drop'
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    communicator.set_rate_limit('test', rate=1, burst=3, policy='drop')
+    for counter in range(5):
+        communicator.publish('test', 'hello world ' + str(counter))
+
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['hello world 0',
+                                             'hello world 1',
+                                             'hello world 2']
+    stats = communicator.stats()['rate_limits']['test']
+    assert stats['accepted'] == 3
+    assert stats['dropped'] == 2
+
+    # Other channels are not limited
+    for counter in range(5):
+        communicator.publish('other', 'hello world ' + str(counter))
+
+    # Limit removed
+    communicator.set_rate_limit('test', None)
+    communicator.publish('test', 'hello world 5')
+    assert len(list(message_queue.listen(block=False))) == 1
+    assert not communicator.stats()['rate_limits']
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_channel_rate_limit_reject(class_2_test):
+    """
+    Test that RateLimitExceeded is raised with policy 'reject'
+    """
+
+    communicator = class_2_test()
+    communicator.set_rate_limit('test', rate=1, burst=1, policy='reject')
+    communicator.publish('test', 'hello world 1')
+    with pytest.raises(RateLimitExceeded, match='Rate limit exceeded'):
+        communicator.publish('test', 'hello world 2')
+    assert communicator.stats()['rate_limits']['test']['rejected'] == 1
+
+
+def test_channel_rate_limit_block():
+    """
+    Test that publish() waits with policy 'block'
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.set_rate_limit('test', rate=50, burst=1)
+    start_time = time.monotonic()
+    for counter in range(6):
+        communicator.publish('test', 'hello world ' + str(counter))
+    assert time.monotonic() - start_time >= 0.09
+    assert len(list(message_queue.listen(block=False))) == 6
+    assert communicator.stats()['rate_limits']['test']['blocked_time'] > 0
+
+
+def test_publisher_rate_limit():
+    """
+    Test a token bucket shared by the messages of one publisher
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    rate_limiter = TokenBucket(rate=1, burst=2, policy='drop')
+    for counter in range(4):
+        communicator.publish('test', 'hello world ' + str(counter),
+                             rate_limiter=rate_limiter)
+    # Another publisher is not limited
+    communicator.publish('test', 'hello world')
+    assert len(list(message_queue.listen(block=False))) == 3
+    assert rate_limiter.stats()['dropped'] == 2
+
+
+def test_exception_token_bucket():
+    """
+    Test exceptions and messages for TokenBucket parameters
+    """
+
+    with pytest.raises(ValueError, match='rate must be > 0'):
+        TokenBucket(0)
+    with pytest.raises(ValueError, match='burst must be >= 1'):
+        TokenBucket(1, burst=0.5)
+    with pytest.raises(ValueError, match='policy must be one of'):
+        TokenBucket(1, policy='wait')
+    with pytest.raises(ValueError,
+                       match='channel : None value not allowed'):
+        PubSub().set_rate_limit(None, 1)
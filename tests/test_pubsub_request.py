@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_request.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for request and reply with pytest
+          Replies are routed to futures by correlation ids.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, Request
+
+
+def responder(message_queue, number_of_requests):
+    """
+    Answer requests received on message_queue
+    """
+    for message in message_queue.listen(timeout=5.0):
+        request = message['data']
+        assert isinstance(request, Request)
+        if request.payload == 'error':
+            request.fail(RuntimeError('bad request'))
+        else:
+            request.reply(request.payload.upper())
+        number_of_requests -= 1
+        if not number_of_requests:
+            return
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_request_reply(class_2_test):
+    """
+    Test replies given by a responder running in another thread
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('service')
+    responder_thread = threading.Thread(target=responder,
+                                        args=(message_queue, 3))
+    responder_thread.start()
+
+    futures = [communicator.request('service', 'hello'),
+               communicator.request('service', 'world', timeout=5.0),
+               communicator.request('service', 'error')]
+    assert futures[0].result(timeout=5.0) == 'HELLO'
+    assert futures[1].result(timeout=5.0) == 'WORLD'
+    with pytest.raises(RuntimeError, match='bad request'):
+        futures[2].result(timeout=5.0)
+    responder_thread.join()
+    assert communicator.stats()['pending_requests'] == 0
+    communicator.close()
+
+
+def test_request_first_reply_wins():
+    """
+    Test that only the first responder reply is used
+    """
+
+    communicator = PubSub()
+    message_queue1 = communicator.subscribe('service')
+    message_queue2 = communicator.subscribe('service')
+    future = communicator.request('service', 'hello')
+    assert next(message_queue1.listen())['data'].reply(1)
+    assert not next(message_queue2.listen())['data'].reply(2)
+    assert future.result() == 1
+
+
+def test_request_timeout():
+    """
+    Test that a request without reply fails with TimeoutError
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('service')
+    future = communicator.request('service', 'hello', timeout=0.05)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=5.0)
+    assert communicator.stats()['pending_requests'] == 0
+    # Late reply is ignored
+    assert not next(message_queue.listen())['data'].reply('late')
+    communicator.close()
+
+
+def test_request_canceled():
+    """
+    Test that a request canceled by requester is forgotten
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('service')
+    future = communicator.request('service', 'hello')
+    assert future.cancel()
+    assert communicator.stats()['pending_requests'] == 0
+    assert not next(message_queue.listen())['data'].reply('late')
+    with pytest.raises(CancelledError):
+        future.result()
+
+
+def test_exception_request():
+    """
+    Test exceptions and messages for request()
+    """
+
+    communicator = PubSubPriority()
+    with pytest.raises(ValueError,
+                       match='message : None value not allowed'):
+        communicator.request('service', None)
+    with pytest.raises(ValueError,
+                       match='channel : None value not allowed'):
+        communicator.request(None, 'hello')
+    with pytest.raises(ValueError, match='priority must be > 0'):
+        communicator.request('service', 'hello', priority=-1)
+    assert communicator.stats()['pending_requests'] == 0
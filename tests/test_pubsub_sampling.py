@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_sampling.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for sampling subscriptions
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import pytest
+
+import pubsub
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_sample_every(class_2_test):
+    """
+    Test that a subscriber with sample_every=3 receives one message of 3
+    """
+
+    communicator = class_2_test()
+
+    channel = "test"
+
+    sampled_queue = communicator.subscribe(channel, sample_every=3)
+    full_queue = communicator.subscribe(channel)
+
+    for index in range(7):
+        communicator.publish(channel, f'hello {index}')
+    with communicator.publisher(channel, batch_size=4) as publisher:
+        for index in range(7, 11):
+            publisher.publish(f'hello {index}')
+
+    assert [msg['id'] for msg in sampled_queue.listen(block=False)] == \
+        [0, 3, 6, 9]
+    assert len(list(full_queue.listen(block=False))) == 11
+
+
+def test_max_rate_hz(monkeypatch):
+    """
+    Test that a subscriber with max_rate_hz receives at most
+    max_rate_hz messages per second
+    """
+
+    clock = [1000.0]
+    monkeypatch.setattr(pubsub, 'monotonic', lambda: clock[0])
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel, max_rate_hz=2)
+    result = communicator.publish(channel, 'hello 0')
+    assert result == (1, 0)
+    # Skipped messages are not lost
+    assert communicator.publish(channel, 'hello 1') == (0, 0)
+    clock[0] += 0.25
+    communicator.publish(channel, 'hello 2')
+    clock[0] += 0.25
+    communicator.publish(channel, 'hello 3')
+    communicator.publish(channel, 'hello 4')
+
+    assert [msg['data'] for msg in message_queue.listen(block=False)] == \
+        ['hello 0', 'hello 3']
+
+
+def test_sampling_combined():
+    """
+    Test sample_every and max_rate_hz together and set_sampling()
+    """
+
+    communicator = PubSub()
+
+    channel = "test"
+
+    message_queue = communicator.subscribe(channel, sample_every=2,
+                                           max_rate_hz=0.001)
+    for index in range(6):
+        communicator.publish(channel, f'hello {index}')
+    assert [msg['id'] for msg in message_queue.listen(block=False)] == [0]
+
+    message_queue.set_sampling()
+    for index in range(3):
+        communicator.publish(channel, f'hello {index}')
+    assert len(list(message_queue.listen(block=False))) == 3
+
+
+def test_exception_sampling():
+    """
+    Test exceptions and messages for sampling options
+    """
+
+    communicator = PubSub()
+
+    with pytest.raises(ValueError, match='sample_every must be >= 1'):
+        communicator.subscribe('test', sample_every=0)
+    with pytest.raises(ValueError, match='max_rate_hz must be > 0'):
+        communicator.subscribe('test', max_rate_hz=0)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_scheduler.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for delayed messages with pytest
+          publish_after() and publish_at() use a timing wheel
+          served by a single thread.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import time
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, TimerWheel, WheelTimer
+
+
+def test_timer_wheel_order():
+    """
+    Test that timers expire at their tick, across wheel levels
+    """
+
+    wheel = TimerWheel(slot_bits=2, levels=3)
+    expires_list = [1, 3, 4, 5, 17, 63, 64, 100, 200]
+    for expires in expires_list:
+        wheel.add(WheelTimer(expires, None, (), {}))
+    assert len(wheel) == len(expires_list)
+
+    fired = []
+    for _ in range(300):
+        for timer in wheel.advance():
+            assert timer.expires == wheel.current_tick
+            fired.append(timer.expires)
+    # 200 is beyond the wheel (4**3 ticks) but is cascaded again
+    assert fired == expires_list
+    assert not wheel
+
+
+def test_timer_wheel_remove_and_next_event():
+    """
+    Test timer removal and next event computation
+    """
+
+    wheel = TimerWheel(slot_bits=2, levels=2)
+    timer1 = WheelTimer(2, None, (), {})
+    timer2 = WheelTimer(9, None, (), {})
+    wheel.add(timer1)
+    wheel.add(timer2)
+    assert wheel.next_event_tick() == 2
+    assert wheel.remove(timer1)
+    assert not wheel.remove(timer1)
+    # Nothing in level 0 : next cascade
+    assert wheel.next_event_tick() == 4
+    fired = [timer for _ in range(10) for timer in wheel.advance()]
+    assert fired == [timer2]
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_publish_after(class_2_test):
+    """
+    Test that a delayed message is received after its delay
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    start_time = time.monotonic()
+    communicator.publish_after('test', 'hello world 2', 0.1)
+    communicator.publish_after('test', 'hello world 1', 0.05)
+    assert communicator.stats()['scheduled'] == 2
+    assert not list(message_queue.listen(block=False))
+
+    msgs = [next(message_queue.listen(timeout=2.0)) for _ in range(2)]
+    assert time.monotonic() - start_time >= 0.1
+    assert [msg['data'] for msg in msgs] == ['hello world 1',
+                                             'hello world 2']
+    assert communicator.stats()['scheduled'] == 0
+    communicator.close()
+
+
+def test_publish_at_priority():
+    """
+    Test publish_at() with a priority
+    """
+
+    communicator = PubSubPriority()
+    message_queue = communicator.subscribe('test')
+    communicator.publish_at('test', 'hello world 1', time.time() + 0.05,
+                            priority=200)
+    communicator.publish_at('test', 'hello world 2', time.time() + 0.05,
+                            priority=1)
+    time.sleep(0.3)
+    msgs = list(message_queue.listen(block=False))
+    assert [msg['data'] for msg in msgs] == ['hello world 2',
+                                             'hello world 1']
+    communicator.close()
+
+
+def test_publish_after_cancel():
+    """
+    Test that a canceled delayed message is not published
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    timer = communicator.publish_after('test', 'hello world', 0.05)
+    assert timer.cancel()
+    assert not timer.cancel()
+    assert communicator.stats()['scheduled'] == 0
+    assert not list(message_queue.listen(timeout=0.2))
+    communicator.close()
+
+
+def test_exception_publish_after():
+    """
+    Test exceptions and messages for publish_after()
+    """
+
+    communicator = PubSubPriority()
+    with pytest.raises(ValueError,
+                       match='channel : None value not allowed'):
+        communicator.publish_after(None, 'message', 1)
+    with pytest.raises(ValueError,
+                       match='message : None value not allowed'):
+        communicator.publish_after('test', None, 1)
+    with pytest.raises(ValueError, match='priority must be > 0'):
+        communicator.publish_after('test', 'message', 1, priority=-1)
+
+
+def test_publish_after_blocked():
+    """
+    Test that a delayed message blocked by a rate limit doesn't delay
+    the other timers of the communicator
+    """
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('slow')
+    communicator.set_rate_limit('slow', rate=2, burst=1, policy='block')
+    communicator.publish_after('slow', 'hello 1', 0)
+    communicator.publish_after('slow', 'hello 2', 0)
+    with communicator.publisher('slow', batch_size=10,
+                                linger=0.01) as publisher:
+        publisher.publish('hello 3')
+
+        start = time.monotonic()
+        future = communicator.request('other', 'question', timeout=0.1)
+        assert isinstance(future.exception(timeout=1.5), TimeoutError)
+        assert time.monotonic() - start < 0.4
+        assert next(message_queue.listen(timeout=1))['data'] in (
+            'hello 1', 'hello 2')
+    communicator.close()
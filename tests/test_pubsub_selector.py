@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_selector.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for class ChanelSelector with pytest
+          Wait on many channel queues with a single thread.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import select
+import threading
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority, ChanelSelector
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_select_ready_queues(class_2_test):
+    """
+    Test that select() returns all queues holding messages
+    """
+
+    communicator = class_2_test()
+    message_queue1 = communicator.subscribe('test1')
+    message_queue2 = communicator.subscribe('test2')
+    message_queue3 = communicator.subscribe('test3')
+    selector = ChanelSelector([message_queue1, message_queue2,
+                               message_queue3])
+
+    communicator.publish('test1', 'hello world 1')
+    communicator.publish('test3', 'hello world 3')
+
+    ready_queues = selector.select(timeout=1.0)
+    assert ready_queues == [message_queue1, message_queue3]
+    msgs = list(message_queue3.listen(block=False))
+    assert len(msgs) == 1
+    assert msgs[0]['data'] == 'hello world 3'
+
+    # Queue 3 is empty now
+    assert selector.select(timeout=1.0) == [message_queue1]
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_select_timeout(class_2_test):
+    """
+    Test that select() returns an empty list when timeout expires
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test')
+    selector = ChanelSelector([message_queue])
+
+    assert selector.select(timeout=0.05) == []
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_select_wakeup_by_publisher(class_2_test):
+    """
+    Test that a publisher in another thread wakes up
+    a subscriber blocked in select()
+    """
+
+    communicator = class_2_test()
+    message_queue1 = communicator.subscribe('test1')
+    message_queue2 = communicator.subscribe('test2')
+    selector = ChanelSelector([message_queue1, message_queue2])
+
+    publisher = threading.Timer(0.05, communicator.publish,
+                                args=('test2', 'hello world'))
+    publisher.start()
+    ready_queues = selector.select(timeout=5.0)
+    publisher.join()
+
+    assert ready_queues == [message_queue2]
+    assert next(message_queue2.listen())['data'] == 'hello world'
+
+
+def test_select_unregister():
+    """
+    Test that an unregistered queue is no more watched
+    """
+
+    communicator = PubSub()
+    message_queue1 = communicator.subscribe('test1')
+    message_queue2 = communicator.subscribe('test2')
+
+    with ChanelSelector([message_queue1, message_queue2]) as selector:
+        selector.unregister(message_queue1)
+        assert not message_queue1.selectors
+        communicator.publish('test1', 'hello world')
+        assert selector.select(timeout=0.05) == []
+
+    # Leaving the with block closes the selector
+    assert not message_queue2.selectors
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_select_lease_expired(class_2_test):
+    """
+    Test that select() and fileno() are woken up when a message
+    not acknowledged in time is put back in its queue
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test', ack_timeout=0.05,
+                                           pollable=True)
+    selector = ChanelSelector([message_queue])
+    communicator.publish('test', 'hello world')
+    lease = next(message_queue.listen(block=False))
+    assert selector.select(timeout=0.01) == []
+
+    assert selector.select(timeout=1.0) == [message_queue]
+    readable, _, _ = select.select([message_queue], [], [], 1.0)
+    assert readable == [message_queue]
+    redelivered = next(message_queue.listen(block=False))
+    assert redelivered['data'] == 'hello world'
+    assert redelivered.token != lease.token
+    redelivered.ack()
+
+
+def test_exception_selector():
+    """
+    Test exceptions and messages for ChanelSelector
+    """
+
+    selector = ChanelSelector()
+    with pytest.raises(ValueError,
+                       match='message_queue : None value not allowed'):
+        selector.register(None)
+    with pytest.raises(ValueError,
+                       match='message_queue : None value not allowed'):
+        selector.unregister(None)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_snapshot.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for snapshot() and restore()
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import pytest
+
+import pubsub
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_snapshot_restore(class_2_test, tmp_path):
+    """
+    Test that waiting messages and ids are kept after a restart
+    """
+
+    path = tmp_path / 'state.snapshot'
+
+    communicator = class_2_test()
+    message_queue1 = communicator.subscribe('C1')
+    message_queue2 = communicator.subscribe('C1')
+    message_queue3 = communicator.subscribe('C2')
+    for index in range(5):
+        communicator.publish('C1', f'hello {index}')
+    communicator.publish('C2', 'world')
+    communicator.publish('C3', 'nobody')
+    assert message_queue3.qsize() == 1
+    list(message_queue1.listen(block=False))
+    next(message_queue2.listen(block=False))
+
+    assert communicator.snapshot(path, chunk_size=2) == 5
+    assert not (tmp_path / 'state.snapshot.tmp').exists()
+
+    restarted = class_2_test()
+    queues = restarted.restore(path)
+    assert [message_queue.name for message_queue in queues] == \
+        ['C1', 'C1', 'C2']
+    assert not list(queues[0].listen(block=False))
+    assert [msg['data'] for msg in queues[1].listen(block=False)] == \
+        [f'hello {index}' for index in range(1, 5)]
+
+    # Ids continue from saved counters
+    restarted.publish('C1', 'after restart')
+    restarted.publish('C3', 'after restart')
+    assert next(queues[0].listen(block=False))['id'] == 5
+    assert [msg['id'] for msg in queues[2].listen(block=False)] == [0]
+    assert restarted.count['C3'] == 1
+
+
+def test_snapshot_options(tmp_path):
+    """
+    Test that subscription options and messages not acknowledged
+    are restored
+    """
+
+    path = tmp_path / 'state.snapshot'
+
+    communicator = PubSub(max_bytes=1000)
+    ack_queue = communicator.subscribe('ack', ack_timeout=30)
+    lanes_queue = communicator.subscribe('lanes', lanes={'a': 2},
+                                         lane_size=5)
+    sampled_queue = communicator.subscribe('sampled', sample_every=2,
+                                           max_bytes=100, pollable=True)
+    communicator.publish('ack', 'to ack')
+    communicator.publish('ack', 'not acked')
+    communicator.publish('lanes', 'b1', lane='b')
+    communicator.publish('lanes', 'a1', lane='a')
+    communicator.publish('sampled', 'sample')
+    leases = list(ack_queue.listen(block=False))
+    leases[0].ack()
+
+    communicator.snapshot(path)
+    queues = PubSub(max_bytes=1000).restore(path)
+
+    assert [message_queue.options_() for message_queue in queues] == [
+        ack_queue.options_(), lanes_queue.options_(),
+        sampled_queue.options_()]
+    assert queues[0].options_() == {'ack_timeout': 30}
+    assert queues[2].options_() == {'pollable': True, 'max_bytes': 100,
+                                    'sample_every': 2}
+    assert [lease['data'] for lease in queues[0].listen(block=False)] == \
+        ['not acked']
+    assert [msg['data'] for msg in queues[1].listen(block=False)] == \
+        ['b1', 'a1']
+    assert queues[2].byte_budget.bytes == 6
+    assert queues[2].is_ready()
+    for message_queue in queues:
+        message_queue.close()
+
+
+def test_snapshot_bad_file(tmp_path):
+    """
+    Test exceptions and messages for restore() and snapshot()
+    """
+
+    path = tmp_path / 'bad.snapshot'
+    path.write_bytes(b'not a snapshot')
+    with pytest.raises(ValueError, match='not a snapshot file'):
+        PubSub().restore(path)
+
+    communicator = PubSub()
+    communicator.subscribe('test')
+    communicator.publish('test', 'hello')
+    communicator.snapshot(path)
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(ValueError, match='truncated snapshot file'):
+        PubSub().restore(path)
+    with pytest.raises(ValueError, match='chunk_size must be >= 1'):
+        communicator.snapshot(path, chunk_size=0)
+
+
+def test_snapshot_lazy_restore(tmp_path, monkeypatch):
+    """
+    Test that restore() reads records one by one
+    """
+
+    path = tmp_path / 'state.snapshot'
+
+    communicator = PubSub(max_queue_in_a_channel=1000)
+    message_queue = communicator.subscribe('test')
+    for index in range(1000):
+        communicator.publish('test', f'hello {index}')
+    communicator.snapshot(path, chunk_size=100)
+    assert message_queue.qsize() == 1000
+
+    loaded = []
+    loads = pubsub.pickle.loads
+
+    def counting_loads(data):
+        record = loads(data)
+        loaded.append(record[0])
+        return record
+
+    monkeypatch.setattr(pubsub.pickle, 'loads', counting_loads)
+    queues = PubSub(max_queue_in_a_channel=1000).restore(path)
+    assert loaded == ['schemas', 'codecs', 'queue'] + ['items'] * 10 + \
+        ['counts']
+    assert queues[0].qsize() == 1000
+
+
+def test_snapshot_error(tmp_path):
+    """
+    Test that a failed snapshot keeps the previous file, removes
+    the temporary one, and that requests are not saved
+    """
+
+    path = tmp_path / 'state.snapshot'
+
+    communicator = PubSub()
+    message_queue = communicator.subscribe('test')
+    communicator.publish('test', 'hello')
+    communicator.request('test', 'question')
+    assert message_queue.qsize() == 2
+    assert communicator.snapshot(path) == 1
+    previous = path.read_bytes()
+
+    communicator.publish('test', lambda: None)
+    with pytest.raises(Exception):
+        communicator.snapshot(path)
+    assert path.read_bytes() == previous
+    assert list(tmp_path.iterdir()) == [path]
+
+    queues = PubSub().restore(path)
+    messages = list(queues[0].listen(block=False))
+    assert [message['data'] for message in messages] == ['hello']
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_stress.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Concurrency stress tests for PubSub and PubSubPriority :
+          many publishers, subscribers and subscribe/unsubscribe threads
+          under randomized scheduling. Checks that each subscriber
+          receives the ids of a channel in order, without gap nor
+          duplicate, and prints throughput (pytest -s).
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import sys
+import time
+import random
+import threading
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+CHANNELS = ('C1', 'C2', 'C3', 'C4')
+NUMBER_OF_PUBLISHERS = 4
+MESSAGES_BY_PUBLISHER = 1500
+# Large enough to never overflow : no message may be lost
+CAPACITY = NUMBER_OF_PUBLISHERS * MESSAGES_BY_PUBLISHER
+
+COMMUNICATORS = {
+    'PubSub': lambda: PubSub(max_queue_in_a_channel=CAPACITY),
+    'PubSubPriority': lambda: PubSubPriority(
+        max_queue_in_a_channel=CAPACITY),
+    'PubSub_dispatcher': lambda: PubSub(max_queue_in_a_channel=CAPACITY,
+                                        dispatch_threads=2),
+}
+
+
+@pytest.fixture(name='fast_switch')
+def fixture_fast_switch():
+    """
+    Make threads switch very often to explore more interleavings.
+    """
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(switch_interval)
+
+
+def check_ids(ids, description):
+    """
+    Check that ids received on a channel follow each other
+    without gap nor duplicate.
+    """
+    for previous_id, next_id in zip(ids, ids[1:]):
+        assert next_id == previous_id + 1, \
+            f'{description} : id {next_id} received after {previous_id}'
+
+
+def publisher_thread(communicator, index, published, start):
+    """
+    Publish messages (index, sequence number) on random channels
+    with publish() for even index, else with Publisher handles
+    batching or not.
+    """
+    rng = random.Random(index)
+    handles = {channel: communicator.publisher(channel,
+                                               batch_size=rng.choice((1, 8)))
+               for channel in CHANNELS}
+    start.wait()
+    for sequence in range(MESSAGES_BY_PUBLISHER):
+        channel = rng.choice(CHANNELS)
+        if index % 2 == 0:
+            communicator.publish(channel, (index, sequence))
+        else:
+            handles[channel].publish((index, sequence))
+        published[channel].append((index, sequence))
+        if rng.random() < 0.05:
+            time.sleep(0)
+    for handle in handles.values():
+        handle.close()
+
+
+def consumer_thread(message_queue, received, stop):
+    """
+    Read messages of a queue until stop is set and queue is empty.
+    """
+    while not (stop.is_set() and message_queue.empty()):
+        for msg in message_queue.listen(block=False):
+            received.append((msg['id'], msg['data']))
+        time.sleep(0)
+
+
+def churn_thread(communicator, index, stop, errors, counter):
+    """
+    Subscribe and unsubscribe while messages are published :
+    a temporary subscriber must receive consecutive ids too.
+    """
+    rng = random.Random(1000 + index)
+    while not stop.is_set():
+        channel = rng.choice(CHANNELS)
+        message_queue = communicator.subscribe(channel)
+        ids = []
+        for _ in range(rng.randrange(1, 20)):
+            ids.extend(msg['id'] for msg in message_queue.listen(block=False))
+            time.sleep(0)
+        way = rng.randrange(3)
+        if way == 0:
+            message_queue.unsubscribe()
+        elif way == 1:
+            communicator.unsubscribe(channel, message_queue)
+        ids.extend(msg['id'] for msg in message_queue.listen(block=False))
+        try:
+            check_ids(ids, f'churn subscriber on {channel}')
+        except AssertionError as error:
+            errors.append(error)
+        counter[0] += 1
+        # way 2 : queue dropped without unsubscribe, removed by weakref
+
+
+@pytest.mark.usefixtures('fast_switch')
+@pytest.mark.parametrize('name', COMMUNICATORS)
+def test_stress_invariants(name):
+    """
+    Publishers, stable subscribers and churning subscribers run
+    concurrently on 4 channels.
+    """
+    communicator = COMMUNICATORS[name]()
+
+    start = threading.Barrier(NUMBER_OF_PUBLISHERS + 1)
+    stop_churn = threading.Event()
+    stop_consumers = threading.Event()
+    published = {channel: [] for channel in CHANNELS}
+    received = {}
+    errors = []
+    churn_count = [0]
+
+    consumers = []
+    for channel in CHANNELS:
+        for number in range(2):
+            received[channel, number] = []
+            consumers.append(threading.Thread(
+                target=consumer_thread,
+                args=(communicator.subscribe(channel),
+                      received[channel, number], stop_consumers)))
+    churners = [threading.Thread(target=churn_thread,
+                                 args=(communicator, index, stop_churn,
+                                       errors, churn_count))
+                for index in range(2)]
+    publishers = [threading.Thread(target=publisher_thread,
+                                   args=(communicator, index, published,
+                                         start))
+                  for index in range(NUMBER_OF_PUBLISHERS)]
+    for thread in consumers + churners + publishers:
+        thread.start()
+
+    start.wait()
+    start_time = time.perf_counter()
+    for thread in publishers:
+        thread.join()
+    communicator.join()
+    elapsed = time.perf_counter() - start_time
+    stop_churn.set()
+    stop_consumers.set()
+    for thread in consumers + churners:
+        thread.join()
+    communicator.close()
+
+    assert not errors, errors[0]
+    total = 0
+    for (channel, number), messages in received.items():
+        description = f'subscriber {number} on {channel}'
+        ids = [_id for _id, _ in messages]
+        # No loss below capacity, no duplicate, in order
+        check_ids(ids, description)
+        assert ids[:1] == [0] and len(ids) == len(published[channel]), \
+            description
+        payloads = [data for _, data in messages]
+        assert sorted(payloads) == sorted(published[channel]), description
+        # Messages of a publisher are received in their publication order
+        for index in range(NUMBER_OF_PUBLISHERS):
+            sequences = [sequence for publisher, sequence in payloads
+                         if publisher == index]
+            assert sequences == sorted(sequences), description
+        total += len(messages)
+
+    print(f'\n{name} : {NUMBER_OF_PUBLISHERS * MESSAGES_BY_PUBLISHER} '
+          f'messages published in {elapsed:.3f} s '
+          f'({NUMBER_OF_PUBLISHERS * MESSAGES_BY_PUBLISHER / elapsed:.0f} '
+          f'msg/s), {total} received, '
+          f'{churn_count[0]} temporary subscriptions')
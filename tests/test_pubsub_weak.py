@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+Name :    test_pubsub_weak.py
+Author :  Thierry Maillard (Thierry46)
+Date :    18 Oct. 2026
+
+Purpose : Unit tests for abandoned subscriptions with pytest
+          Queues dropped without unsubscribe() are removed
+          from their channel.
+
+==============================================================================
+The MIT License
+
+Copyright (c) 2012 Zhen Wang
+Copyright (c) 2020 Thierry Maillard
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+==============================================================================
+"""
+
+import gc
+
+import pytest
+
+from pubsub import PubSub, PubSubPriority
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_abandoned_queue_pruned(class_2_test):
+    """
+    Test that a queue dropped by its subscriber is removed
+    from the channel at next publish
+    """
+
+    communicator = class_2_test(max_queue_in_a_channel=2)
+    message_queue = communicator.subscribe('test')
+    communicator.subscribe('test')  # Dropped immediately
+    gc.collect()
+
+    # No overflow warning for the abandoned queue
+    for counter in range(2):
+        communicator.publish('test', 'hello world ' + str(counter))
+    assert len(communicator.channels['test']) == 1
+    assert len(list(message_queue.listen(block=False))) == 2
+
+
+@pytest.mark.parametrize("class_2_test", [PubSub, PubSubPriority])
+def test_abandoned_queue_with_cycles(class_2_test):
+    """
+    Test that a queue in a reference cycle (registered in a selector,
+    with leases in flight) is pruned after garbage collection
+    """
+
+    communicator = class_2_test()
+    message_queue = communicator.subscribe('test', ack_timeout=60)
+    communicator.publish('test', 'hello world')
+    lease = next(message_queue.listen(block=False))
+    assert lease['data'] == 'hello world'
+    del lease, message_queue
+    gc.collect()
+
+    communicator.subscribe('other')
+    assert 'test' not in communicator.channels
+
+
+def test_unsubscribe_keeps_other_subscribers():
+    """
+    Test that unsubscribe removes only the given queue
+    """
+
+    communicator = PubSub()
+    message_queue1 = communicator.subscribe('test')
+    message_queue2 = communicator.subscribe('test')
+    message_queue1.unsubscribe()
+    assert [subscriber_ref() for subscriber_ref in
+            communicator.channels['test']] == [message_queue2]